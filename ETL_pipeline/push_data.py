@@ -1,31 +1,55 @@
 import os
 import sys
+import time
+import argparse
 import certifi
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 
 import pymongo
+from pymongo import UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError, NetworkTimeout
 import pandas as pd
-import numpy as np 
+import numpy as np
 
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
 
-#Initialize env variables 
+#Initialize env variables
 load_dotenv()
 MONGO_DB_URL = os.getenv("MONGO_DB_URL")
 
 #Store path to a trusted root certificate bundle (a .pem file)
 ca = certifi.where()
 
+ROW_HASH_FIELD = 'row_hash' #unique key of a row: content hash plus how many identical rows came before it
+BATCH_SIZE = 10000 #rows read from the CSV and written per bulk_write
+N_WRITERS = 4 #concurrent bulk_write calls sharing one client
+MAX_RETRIES = 5 #retries of a batch after a transient network error
+DUPLICATE_KEY_ERROR = 11000
+
 class NetworkDataExtract():
-    def __init__(self):
+    def __init__(self, mongo_client=None, n_writers:int=N_WRITERS):
+        '''
+            mongo_client can be injected (e.g. a mongomock client), otherwise one pooled client
+            sized for n_writers is created on first use and shared by all writers.
+        '''
         try:
-            pass
+            self.mongo_client = mongo_client
+            self.n_writers = n_writers
+            #Rows per content hash seen so far in the current file, to number identical rows
+            self.row_hash_counts = defaultdict(int)
         except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
-        
+
+    def get_client(self):
+        if self.mongo_client is None:
+            self.mongo_client = pymongo.MongoClient(MONGO_DB_URL, tlsCAFile=ca, maxPoolSize=self.n_writers)
+        return self.mongo_client
+
     def csv_to_json(self, file_path: str):
         '''
             Reads a CSV file and returns it as a list of dictionaries,
@@ -41,10 +65,144 @@ class NetworkDataExtract():
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
-        
+
+    def add_row_hashes(self, chunk: pd.DataFrame)->pd.Series:
+        '''
+            Returns the row_hash of every row: a 64-bit hash of the row's values (numeric columns hashed as float
+            so a chunk with NaNs hashes like one without) and the number of identical rows before it in the file.
+            The dataset has many identical rows, numbering them keeps them as separate documents while a rerun
+            of the same file produces the same keys.
+        '''
+        numeric = chunk.select_dtypes(include='number').columns
+        hashes = pd.util.hash_pandas_object(chunk.astype({column: 'float64' for column in numeric}), index=False).to_numpy()
+        codes, unique_hashes = pd.factorize(hashes)
+        earlier = np.array([self.row_hash_counts[row_hash] for row_hash in unique_hashes.tolist()], dtype=np.int64)
+        ordinals = pd.Series(codes).groupby(codes).cumcount().to_numpy() + earlier[codes]
+        for row_hash, count in zip(unique_hashes.tolist(), np.bincount(codes).tolist()):
+            self.row_hash_counts[row_hash] += count
+        return pd.Series([f'{row_hash:016x}-{ordinal}' for row_hash, ordinal in zip(hashes.tolist(), ordinals.tolist())],
+                         index=chunk.index)
+
+    def prepare_collection(self, collection, batch_size:int=BATCH_SIZE)->int:
+        '''
+            Gives documents loaded before rows were keyed (plain insert_many) their row_hash, then creates the unique
+            row_hash index, so reloading the same file matches them instead of adding copies.
+            Backfilling first means the index never sees unhashed duplicates; it is also partial, so a legacy writer
+            still adding unhashed documents cannot break it. Returns the number of documents backfilled.
+        '''
+        query = {ROW_HASH_FIELD: {'$exists': False}}
+        backfilled = 0
+        if collection.find_one(query) is not None:
+            #Identical rows are numbered in _id (insertion) order, as add_row_hashes numbers them in file order
+            self.row_hash_counts.clear()
+            cursor = collection.find(query).sort('_id', pymongo.ASCENDING).batch_size(batch_size)
+            while True:
+                documents = [document for _, document in zip(range(batch_size), cursor)]
+                if not documents:
+                    break
+                chunk = pd.DataFrame(documents)
+                ids = chunk.pop('_id')
+                row_hashes = self.add_row_hashes(chunk)
+                collection.bulk_write([UpdateOne({'_id': document_id}, {'$set': {ROW_HASH_FIELD: row_hash}})
+                                       for document_id, row_hash in zip(ids.tolist(), row_hashes.tolist())], ordered=False)
+                backfilled += len(documents)
+            logging.info(f'Backfilled {ROW_HASH_FIELD} of {backfilled} documents in {collection.name}')
+        collection.create_index(ROW_HASH_FIELD, unique=True, partialFilterExpression={ROW_HASH_FIELD: {'$exists': True}})
+        return backfilled
+
+    def iter_csv_batches(self, file_path: str, batch_size:int=BATCH_SIZE):
+        '''
+            Reads the CSV in chunks of batch_size rows and yields each chunk as a list of documents with a row_hash.
+        '''
+        self.row_hash_counts.clear()
+        for chunk in pd.read_csv(file_path, chunksize=batch_size):
+            chunk[ROW_HASH_FIELD] = self.add_row_hashes(chunk)
+            yield chunk.to_dict(orient='records')
+
+    def upsert_batch(self, collection, records:list)->dict:
+        '''
+            Upserts the records keyed on row_hash with one unordered bulk_write, retrying transient errors.
+            Rows that already exist are left untouched, so a batch can be retried or a file reloaded safely.
+        '''
+        operations = [UpdateOne({ROW_HASH_FIELD: record[ROW_HASH_FIELD]},
+                                {'$setOnInsert': {key: value for key, value in record.items() if key != ROW_HASH_FIELD}},
+                                upsert=True)
+                      for record in records]
+        started = time.perf_counter()
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                result = collection.bulk_write(operations, ordered=False)
+                inserted, existing = result.upserted_count, result.matched_count
+                break
+            except BulkWriteError as e:
+                #Two writers upserting the same new key: one insert wins, the other hits the unique index
+                errors = [error for error in e.details.get('writeErrors', []) if error.get('code') != DUPLICATE_KEY_ERROR]
+                if errors:
+                    raise
+                inserted = e.details.get('nUpserted', 0)
+                existing = len(records) - inserted
+                break
+            except (AutoReconnect, NetworkTimeout) as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                logging.warning(f'Batch write failed ({e}), retry {attempt + 1} of {MAX_RETRIES}')
+                time.sleep(min(2 ** attempt * 0.5, 10))
+        seconds = max(time.perf_counter() - started, 1e-9)
+        return {'rows': len(records), 'inserted': inserted, 'existing': existing, 'retries': attempt,
+                'seconds': seconds, 'rows_per_second': len(records) / seconds}
+
+    def load_csv_to_mongoDB(self, file_path:str, database:str, collection:str, batch_size:int=BATCH_SIZE)->dict:
+        '''
+            Streams the CSV into the collection with n_writers concurrent unordered bulk upserts.
+            At most 2 * n_writers batches are held in memory. Logs every batch and returns a summary.
+        '''
+        try:
+            collection = self.get_client()[database][collection]
+            self.prepare_collection(collection, batch_size=batch_size)
+
+            started = time.perf_counter()
+            batches = []
+            def record(future):
+                batch = future.result()
+                batch['batch'] = len(batches)
+                batches.append(batch)
+                logging.info(f"Batch {batch['batch']}: {batch['rows']} rows ({batch['inserted']} new) in "
+                             f"{batch['seconds']:.2f}s, {batch['rows_per_second']:.0f} rows/s, {batch['retries']} retries")
+
+            with ThreadPoolExecutor(max_workers=self.n_writers) as writers:
+                pending = set()
+                for records in self.iter_csv_batches(file_path, batch_size=batch_size):
+                    if len(pending) >= 2 * self.n_writers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            record(future)
+                    pending.add(writers.submit(self.upsert_batch, collection, records))
+                for future in pending:
+                    future.result()
+                    record(future)
+
+            seconds = max(time.perf_counter() - started, 1e-9)
+            summary = {
+                'rows': sum(batch['rows'] for batch in batches),
+                'inserted': sum(batch['inserted'] for batch in batches),
+                'existing': sum(batch['existing'] for batch in batches),
+                'retries': sum(batch['retries'] for batch in batches),
+                'batches': len(batches),
+                'seconds': seconds,
+            }
+            summary['rows_per_second'] = summary['rows'] / seconds
+            logging.info(f'Loaded {file_path} into {database}.{collection.name}: {summary}')
+            return summary
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
     def insert_data_to_mongoDB(self, records, database, collection):
         '''
             Inserts a list of records into a specified MongoDB collection.
+            Records are upserted on row_hash in batches, so inserting the same records again adds nothing.
 
             Parameters
             records : A list of dictionaries where each dictionary represents a document to insert.
@@ -53,32 +211,37 @@ class NetworkDataExtract():
         '''
         try:
             self.records = records
-            self.database = database
-            self.collection = collection
-            
-            self.mongo_client = pymongo.MongoClient(MONGO_DB_URL, tlsCAFile=certifi.where())
-            self.database = self.mongo_client[self.database]
-            self.collection = self.database[self.collection]
+            self.database = self.get_client()[database]
+            self.collection = self.database[collection]
+            self.prepare_collection(self.collection)
 
-            self.collection.insert_many(self.records)
+            self.row_hash_counts.clear()
+            records = pd.DataFrame(self.records)
+            records[ROW_HASH_FIELD] = self.add_row_hashes(records)
+            records = records.to_dict(orient='records')
+            for start in range(0, len(records), BATCH_SIZE):
+                self.upsert_batch(self.collection, records[start:start + BATCH_SIZE])
 
             return len(self.records)
-        
+
         except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
-        
+
 
 if __name__ == '__main__':
-    FILE_PATH = 'Network_Data/phisingData.csv'
-    DATABASE = 'NetworkSecurityData'
-    COLLECTION = 'NetworkData'
+    parser = argparse.ArgumentParser(description='Load a CSV into MongoDB with parallel, idempotent bulk upserts.')
+    parser.add_argument('--file', default='Network_Data/phisingData.csv')
+    parser.add_argument('--database', default='NetworkSecurityData')
+    parser.add_argument('--collection', default='NetworkData')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--writers', type=int, default=N_WRITERS)
+    args = parser.parse_args()
 
-    networkobj = NetworkDataExtract()
+    networkobj = NetworkDataExtract(n_writers=args.writers)
 
-    records = networkobj.csv_to_json(file_path=FILE_PATH)
+    summary = networkobj.load_csv_to_mongoDB(file_path=args.file, database=args.database,
+                                             collection=args.collection, batch_size=args.batch_size)
 
-    no_of_records = networkobj.insert_data_to_mongoDB(records=records, database=DATABASE, collection=COLLECTION)
-    
-    print(f'Number of records sucesfully inserted into {DATABASE} database: {no_of_records}')
+    print(f'Number of records sucesfully loaded into {args.database} database: {summary}')
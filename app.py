@@ -1,19 +1,30 @@
-import sys, os, certifi
+import sys, os, uuid, certifi
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import pymongo
+import numpy as np
 import pandas as pd
+from typing import Dict, Optional
+from pydantic import BaseModel
 
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
-from networksecurity.pipeline.training_pipeline import TrainingPipeline
-from networksecurity.utils import main_utils, ml_utils
+from networksecurity.pipeline.training_jobs import TrainingJobManager
+from networksecurity.utils import main_utils
+from networksecurity.serving.model_registry import ModelRegistry
+from networksecurity.serving.executor import InferenceExecutor, ExecutorBusyError
+from networksecurity.serving.micro_batcher import MicroBatcher
+from networksecurity.serving.streaming import stream_predictions, STREAM_MEDIA_TYPES
+from networksecurity.serving.drift_monitor import DriftMonitor
+from networksecurity.serving.prediction_log import PredictionLog
 
 from networksecurity.constants.training_pipeline import DATA_INGESTION_COLLECTION_NAME, DATA_INGESTION_DATABASE_NAME
+from networksecurity.constants.training_pipeline import SCHEMA_FILE_PATH, TARGET_COLUMN, MODEL_SERVING_STREAM_CHUNK_SIZE
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, File, UploadFile,Request
+from fastapi import FastAPI, File, UploadFile, Request, HTTPException
 from uvicorn import run as app_run
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse, StreamingResponse
 from starlette.responses import RedirectResponse
 import pandas as pd
 
@@ -25,8 +36,51 @@ client = pymongo.MongoClient(mongo_db_url, tlsCAFile=ca)
 database = client[DATA_INGESTION_DATABASE_NAME]
 collection = database[DATA_INGESTION_COLLECTION_NAME]
 
+# Model is loaded once per worker and hot-swapped when final_model/model.json changes
+model_registry = ModelRegistry()
+# Blocking work (parsing, inference) runs here instead of on the event loop
+executor = InferenceExecutor()
+# Training runs in a separate worker process, one run at a time
+training_jobs = TrainingJobManager()
+# Live feature distributions compared with the training data sketch saved next to the model
+drift_monitor = DriftMonitor()
+# Prediction outputs are buffered locally and uploaded to S3 in the background, in a few large files
+prediction_log = PredictionLog()
+
+# Input features in the order the model was trained on
+feature_columns = [column for column in main_utils.read_yaml_file(SCHEMA_FILE_PATH)['columns'] if column != TARGET_COLUMN]
+
+def predict_batch(X: np.ndarray) -> np.ndarray:
+    '''
+        Scores a stacked batch of feature vectors with the currently served model and records the micro-batch
+        in the prediction log under one batch id.
+    '''
+    network_model = model_registry.get_model().model
+    drift_monitor.observe(X, columns=feature_columns)
+    df = pd.DataFrame(X, columns=feature_columns)
+    predictions = network_model.predict(df)
+    prediction_log.append(df.assign(predicted_column=predictions))
+    return predictions
+
+# Concurrent /predict/json requests are scored together in micro-batches
+micro_batcher = MicroBatcher(predict_fn=predict_batch, run_fn=executor.run_in_thread)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        model_registry.refresh()
+    except Exception:
+        logging.warning('No trained model available yet, it will be loaded on first prediction.')
+    drift_monitor.refresh()
+    micro_batcher.start()
+    prediction_log.start()
+    yield
+    await micro_batcher.stop()
+    prediction_log.close()
+    executor.shutdown(wait=False)
+
 # Setting up FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 origins = ["*"]
 
 app.add_middleware(
@@ -45,42 +99,136 @@ templates = Jinja2Templates(directory="./templates")
 async def index():
     return RedirectResponse(url="/docs")
 
-@app.get("/train")
+@app.post("/train", status_code=202)
 async def train_route():
     try:
-        train_pipeline=TrainingPipeline()
-        train_pipeline.run_pipeline()
-        return Response("Training is successful!")
+        job, created = await executor.run_in_thread(training_jobs.submit)
+        return JSONResponse({'created': created, **job}, status_code=202)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
+
+@app.get("/train")
+async def list_train_jobs_route():
+    try:
+        return JSONResponse(await executor.run_in_thread(training_jobs.list_jobs))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+@app.get("/train/{job_id}")
+async def train_job_status_route(job_id: str):
+    try:
+        job = await executor.run_in_thread(training_jobs.get_job, job_id)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f'Training job {job_id} not found')
+    return JSONResponse(job)
+
+@app.delete("/train/{job_id}")
+async def cancel_train_job_route(job_id: str):
+    try:
+        job = await executor.run_in_thread(training_jobs.cancel, job_id)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f'Training job {job_id} not found')
+    return JSONResponse(job)
+
+def score_csv(file_obj)->pd.DataFrame:
+    '''
+        Parses an uploaded CSV and adds the model predictions. Runs in the executor's thread pool.
+    '''
+    df=pd.read_csv(file_obj)
+    network_model=model_registry.get_model().model
+    drift_monitor.observe(df)
+    df['predicted_column'] = network_model.predict(df)
+    prediction_log.append(df)
+    return df
     
 @app.post("/predict")
 async def predict_route(request: Request,file: UploadFile = File(...)):
     try:
-        df=pd.read_csv(file.file)
-        network_model=main_utils.load_object("final_model/model.pkl")
-        print(df.iloc[0])
-        y_pred = network_model.predict(df)
-        print(y_pred)
-        df['predicted_column'] = y_pred
-        print(df['predicted_column'])
+        df = await executor.run_in_thread(score_csv, file.file)
         #df['predicted_column'].replace(-1, 0)
         #return df.to_json()
         
-        # Save to local folder and S3 bucket
-        ml_utils.sync_prediction_dir_to_s3(df)
-        
-        table_html = df.to_html(classes='table table-striped')
-        #print(table_html)
+        table_html = await executor.run_in_thread(df.to_html, classes='table table-striped')
         return templates.TemplateResponse("table.html", {"request": request, "table": table_html})
         
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
 
+@app.post("/predict/stream")
+async def predict_stream_route(file: UploadFile = File(...), output_format: str = 'csv',
+                               chunk_size: int = MODEL_SERVING_STREAM_CHUNK_SIZE):
+    if output_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=422, detail=f'output_format must be one of {list(STREAM_MEDIA_TYPES)}')
+    if chunk_size <= 0:
+        raise HTTPException(status_code=422, detail='chunk_size must be positive')
+    try:
+        # One model version for the whole upload even if a new model is swapped in mid-stream
+        network_model = (await executor.run_in_thread(model_registry.get_model)).model
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    # Every chunk of the upload is recorded in the prediction log under one batch id
+    batch_id = uuid.uuid4().hex
+    chunks = stream_predictions(file.file, network_model, chunk_size=chunk_size, output_format=output_format,
+                                observe_fn=drift_monitor.observe,
+                                record_fn=lambda chunk: prediction_log.append(chunk, batch_id=batch_id))
+
+    async def scored_chunks():
+        # Every chunk is parsed and scored on the executor thread pool, never on the event loop
+        while True:
+            chunk = await executor.run_in_thread(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    return StreamingResponse(scored_chunks(), media_type=STREAM_MEDIA_TYPES[output_format])
+
+class PredictionRequest(BaseModel):
+    # Feature name -> value. Missing or null features are imputed by the model's preprocessor.
+    features: Dict[str, Optional[float]]
+
+@app.post("/predict/json")
+async def predict_json_route(prediction_request: PredictionRequest):
+    unknown = set(prediction_request.features) - set(feature_columns)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f'Unknown features: {sorted(unknown)}')
+    row = np.array([prediction_request.features.get(column, np.nan) for column in feature_columns], dtype=float)
+    try:
+        prediction = await micro_batcher.submit(row)
+        return JSONResponse({'prediction': np.asarray(prediction).item(), 'model_version': model_registry.status().get('version')})
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+@app.get("/model/status")
+async def model_status_route():
+    return JSONResponse(model_registry.status())
+
+@app.get("/metrics")
+async def metrics_route():
+    return JSONResponse({'executor': executor.stats(), 'micro_batcher': micro_batcher.stats(),
+                         'drift_observe_seconds': drift_monitor.observe_histogram.snapshot(),
+                         'prediction_log': prediction_log.stats()})
+
+@app.get("/drift")
+async def drift_route():
+    return JSONResponse(drift_monitor.report())
+
 
 #Running the app
 if __name__ == "__main__":
@@ -1,38 +1,65 @@
+from networksecurity.pipeline.training_pipeline import TrainingPipeline
+from networksecurity.pipeline.artifact_store import ArtifactStore
 from networksecurity.components.data_ingestion import DataIngestion
-from networksecurity.components.data_validation import DataValidation
-from networksecurity.components.data_transformation import DataTransformation
-from networksecurity.components.model_trainer import ModelTrainer
-from networksecurity.entity.config_entity import DataIngestionConfig, TrainingPipelineConfig, DataValidationConfig, DataTransformationConfig, ModelTrainerConfig
+from networksecurity.entity.config_entity import TrainingPipelineConfig, DataIngestionConfig
+from networksecurity.constants.training_pipeline import (
+    SCHEMA_FILE_PATH, ARTIFACT_FORMAT_BENCHMARK_DIR, ARTIFACT_FORMAT_BENCHMARK_FILE_NAME)
+from networksecurity.utils import main_utils
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
+import argparse
 import sys
+import os
 
 
 if __name__ == '__main__':
     try:
-        training_pipeline_config = TrainingPipelineConfig()
-        data_ingestion_config = DataIngestionConfig(training_pipeline_config)
-        data_ingestion = DataIngestion(data_ingestion_config)
-        data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
-        print(data_ingestion_artifact)
+        parser = argparse.ArgumentParser(description='Run the training pipeline locally, reusing cached stages.')
+        parser.add_argument('--resume', action='store_true', help='Continue the latest failed run from the stage that failed')
+        parser.add_argument('--no-cache', action='store_true', help='Re-run every stage even if a cached artifact matches')
+        parser.add_argument('--limit', type=int, default=None, help='Ingest only the first N documents (quick runs)')
+        parser.add_argument('--sample', type=int, default=None, help='Ingest a random sample of N documents (quick runs)')
+        parser.add_argument('--incremental', choices=['object_id', 'change_stream'], default=None,
+                            help='Fetch only new (object_id) or changed (change_stream) documents into the local feature store')
+        parser.add_argument('--train-mode', choices=['full', 'incremental'], default=None,
+                            help='Search and fit every model (full) or continue the final model on new rows (incremental)')
+        parser.add_argument('--gc', type=int, default=None, metavar='N',
+                            help='Delete all but the N latest runs and the artifact blobs only they used, then exit')
+        parser.add_argument('--benchmark-export', action='store_true',
+                            help='Time the streaming MongoDB export against pd.DataFrame(collection.find()) (honours --limit), '
+                                 'write the report to the run\'s data_ingestion/export_benchmark/ and exit')
+        parser.add_argument('--benchmark-formats', default=None, metavar='CSV',
+                            help='Time the stage hand-offs of the CSV\'s data as csv, parquet and feather, '
+                                 'write the report to the run\'s format_benchmark/ and exit')
+        args = parser.parse_args()
 
-        data_validation_config = DataValidationConfig(training_pipeline_config)
-        data_validation = DataValidation(data_ingestion_artifact, data_validation_config)
-        data_validation_artifact = data_validation.initialize_data_validation()
-        print(data_validation_artifact)
+        if args.gc is not None:
+            print(ArtifactStore().gc(keep=args.gc))
+            sys.exit(0)
 
-        data_transformation_config = DataTransformationConfig(training_pipeline_config)
-        data_transformation = DataTransformation(data_validation_artifact, data_transformation_config)
-        data_transformation_artifact = data_transformation.initiate_data_transformation()
-        print(data_transformation_artifact)
+        if args.benchmark_export:
+            data_ingestion_config = DataIngestionConfig(TrainingPipelineConfig())
+            data_ingestion_config.row_limit = args.limit
+            print(DataIngestion(data_ingestion_config).benchmark_export())
+            sys.exit(0)
 
-        model_trainer_config = ModelTrainerConfig(training_pipeline_config)
-        model_trainer = ModelTrainer(data_transformation_artifact, model_trainer_config)
-        model_trainer_artifact = model_trainer.initiate_model_trainer()
+        if args.benchmark_formats is not None:
+            output_dir = os.path.join(TrainingPipelineConfig().artifact_dir, ARTIFACT_FORMAT_BENCHMARK_DIR)
+            report = main_utils.benchmark_artifact_formats(main_utils.read_csv_data(args.benchmark_formats), output_dir,
+                                                           main_utils.read_yaml_file(SCHEMA_FILE_PATH)['columns'])
+            main_utils.write_yaml_file(os.path.join(output_dir, ARTIFACT_FORMAT_BENCHMARK_FILE_NAME), report)
+            print(report)
+            sys.exit(0)
+
+        training_pipeline = TrainingPipeline(use_cache=not args.no_cache, resume=args.resume,
+                                             row_limit=args.limit, sample_size=args.sample,
+                                             incremental_mode=args.incremental, training_mode=args.train_mode)
+        model_trainer_artifact = training_pipeline.run_pipeline(
+            progress_callback=lambda stage, status: print(f'{stage}: {status}'),
+            sync_to_s3=False
+        )
         print(model_trainer_artifact)
 
-        
-    
     except Exception as e:
         custom_err = CustomException(e, sys)
         logging.error(custom_err)
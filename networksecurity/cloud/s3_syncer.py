@@ -1,22 +1,226 @@
-import os
+import os, sys
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse
+
+import boto3
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+from networksecurity.entity.artifact_entity import S3SyncArtifact
+from networksecurity.constants.training_pipeline import (
+    S3_SYNC_ENDPOINT_URL,
+    S3_SYNC_MAX_CONCURRENCY,
+    S3_SYNC_MULTIPART_THRESHOLD,
+    S3_SYNC_MULTIPART_CHUNKSIZE,
+)
+
+#One client per endpoint for the whole process: boto3 clients are thread-safe and keep their connection pool
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_s3_client(endpoint_url:str=None, max_pool_connections:int=S3_SYNC_MAX_CONCURRENCY):
+    with _clients_lock:
+        if endpoint_url not in _clients:
+            _clients[endpoint_url] = boto3.session.Session().client(
+                's3', endpoint_url=endpoint_url,
+                config=Config(max_pool_connections=max_pool_connections, retries={'max_attempts': 5, 'mode': 'adaptive'}))
+        return _clients[endpoint_url]
+
+
+def parse_s3_url(aws_bucket_url:str)->tuple:
+    '''
+        Splits s3://bucket/some/prefix into ('bucket', 'some/prefix').
+    '''
+    parsed = urlparse(aws_bucket_url)
+    if parsed.scheme != 's3' or not parsed.netloc:
+        raise ValueError(f'Not an s3:// url: {aws_bucket_url}')
+    return parsed.netloc, parsed.path.strip('/')
+
+
+def s3_etag(file_path:str, multipart_threshold:int=S3_SYNC_MULTIPART_THRESHOLD,
+            multipart_chunksize:int=S3_SYNC_MULTIPART_CHUNKSIZE)->str:
+    '''
+        Returns the ETag S3 gives the file when it is uploaded with these multipart settings: the MD5 of the file,
+        or for multipart uploads the MD5 of the parts' MD5s followed by -<number of parts>.
+    '''
+    if os.path.getsize(file_path) < multipart_threshold:
+        md5 = hashlib.md5()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                md5.update(block)
+        return md5.hexdigest()
+    part_digests = []
+    with open(file_path, 'rb') as file:
+        for part in iter(lambda: file.read(multipart_chunksize), b''):
+            part_digests.append(hashlib.md5(part).digest())
+    return f'{hashlib.md5(b"".join(part_digests)).hexdigest()}-{len(part_digests)}'
+
 
 class S3Sync:
-    def sync_folder_to_s3(self,folder,aws_bucket_url):
+    '''
+        Syncs folders with S3 in-process: one pooled boto3 client and one transfer manager move all files
+        concurrently, files above the multipart threshold in concurrent parts.
+        A file is skipped when the other side has it with the same size and ETag (the MD5 checksum S3 keeps,
+        computed locally with the same part size), so re-syncing an unchanged folder only lists the prefix.
+        Transfer errors do not stop the other files and are returned in the S3SyncArtifact.
+        endpoint_url (or S3_SYNC_ENDPOINT_URL / AWS_ENDPOINT_URL) points it at an S3 stand-in such as MinIO or moto.
+    '''
+    def __init__(self, endpoint_url:str=None, client=None, max_concurrency:int=S3_SYNC_MAX_CONCURRENCY,
+                 multipart_threshold:int=S3_SYNC_MULTIPART_THRESHOLD, multipart_chunksize:int=S3_SYNC_MULTIPART_CHUNKSIZE):
+        try:
+            self.endpoint_url = endpoint_url or S3_SYNC_ENDPOINT_URL or os.getenv('AWS_ENDPOINT_URL')
+            self._client = client
+            self.multipart_threshold = multipart_threshold
+            self.multipart_chunksize = multipart_chunksize
+            self.transfer_config = TransferConfig(multipart_threshold=multipart_threshold,
+                                                  multipart_chunksize=multipart_chunksize,
+                                                  max_concurrency=max_concurrency)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_s3_client(self.endpoint_url, self.transfer_config.max_request_concurrency)
+        return self._client
+
+    def list_objects(self, bucket:str, prefix:str)->dict:
+        '''
+            Returns {key relative to prefix: (size, etag)} for every object under prefix.
+        '''
+        objects = {}
+        root = f'{prefix}/' if prefix else ''
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=root):
+            for item in page.get('Contents', []):
+                objects[item['Key'][len(root):]] = (item['Size'], item['ETag'].strip('"'))
+        return objects
+
+    def _unchanged(self, file_path:str, remote:tuple)->bool:
+        return remote is not None and remote[0] == os.path.getsize(file_path) and \
+            remote[1] == s3_etag(file_path, self.multipart_threshold, self.multipart_chunksize)
+
+    def _run(self, transfers:list, direction:str, bucket:str, source:str, destination:str, skipped:int,
+             started:float)->S3SyncArtifact:
+        '''
+            Hands every (name, size, file path, key) transfer to one transfer manager at once and waits for all.
+        '''
+        errors, bytes_transferred, files_transferred = [], 0, 0
+        with create_transfer_manager(self.client, self.transfer_config) as manager:
+            futures = [(name, size, manager.upload(file_path, bucket, key) if direction == 'upload'
+                        else manager.download(bucket, key, file_path))
+                       for name, size, file_path, key in transfers]
+            for name, size, future in futures:
+                try:
+                    future.result()
+                    bytes_transferred += size
+                    files_transferred += 1
+                except Exception as e:
+                    errors.append(f'{name}: {e}')
+
+        sync_artifact = S3SyncArtifact(source=source, destination=destination, files_transferred=files_transferred,
+                                       files_skipped=skipped, bytes_transferred=bytes_transferred,
+                                       seconds=time.perf_counter() - started, errors=errors)
+        if errors:
+            logging.error(f'{len(errors)} files failed to sync from {source} to {destination}: {errors[:5]}')
+        logging.info(f'Synced {source} to {destination}: {files_transferred} files, {bytes_transferred} bytes, '
+                     f'{skipped} unchanged, {sync_artifact.seconds:.2f}s')
+        return sync_artifact
+
+    def upload_file(self, file_path:str, aws_object_url:str)->int:
+        '''
+            Uploads one file to s3://bucket/key with the folder sync's multipart settings. Returns its size.
+        '''
+        try:
+            bucket, key = parse_s3_url(aws_object_url)
+            self.client.upload_file(file_path, bucket, key, Config=self.transfer_config)
+            return os.path.getsize(file_path)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def upload_files(self, files:dict, aws_bucket_url:str, source:str=None)->S3SyncArtifact:
+        '''
+            Uploads {key relative to aws_bucket_url: local file path} concurrently, without comparing anything.
+        '''
+        try:
+            started = time.perf_counter()
+            bucket, prefix = parse_s3_url(aws_bucket_url)
+            transfers = [(name, os.path.getsize(file_path), file_path, f'{prefix}/{name}' if prefix else name)
+                         for name, file_path in sorted(files.items())]
+            return self._run(transfers, 'upload', bucket, source or f'{len(files)} files', aws_bucket_url, 0, started)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def sync_folder_to_s3(self,folder,aws_bucket_url)->S3SyncArtifact:
         '''
         Syncs a local folder to an S3 bucket.
         Args:
             folder (str): The local folder to sync.
             aws_bucket_url (str): The S3 bucket URL to sync to.
         '''
-        command = f"aws s3 sync {folder} {aws_bucket_url} "
-        os.system(command)
+        try:
+            started = time.perf_counter()
+            bucket, prefix = parse_s3_url(aws_bucket_url)
+            try:
+                remote = self.list_objects(bucket, prefix)
+            except Exception as e:
+                remote = {}
+                logging.warning(f'Could not list {aws_bucket_url}, uploading every file: {e}')
+
+            transfers, skipped = [], 0
+            for directory, _, file_names in os.walk(folder):
+                for file_name in file_names:
+                    file_path = os.path.join(directory, file_name)
+                    name = os.path.relpath(file_path, folder).replace(os.sep, '/')
+                    if self._unchanged(file_path, remote.get(name)):
+                        skipped += 1
+                        continue
+                    key = f'{prefix}/{name}' if prefix else name
+                    transfers.append((name, os.path.getsize(file_path), file_path, key))
+            return self._run(transfers, 'upload', bucket, folder, aws_bucket_url, skipped, started)
 
-    def sync_folder_from_s3(self,folder,aws_bucket_url):
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def sync_folder_from_s3(self,folder,aws_bucket_url)->S3SyncArtifact:
         '''
         Syncs an S3 bucket to a local folder.
         Args:
             folder (str): The local folder to sync.
             aws_bucket_url (str): The S3 bucket URL to sync from.
         '''
-        command = f"aws s3 sync  {aws_bucket_url} {folder} "
-        os.system(command)
\ No newline at end of file
+        try:
+            started = time.perf_counter()
+            bucket, prefix = parse_s3_url(aws_bucket_url)
+            transfers, skipped = [], 0
+            for name, (size, etag) in self.list_objects(bucket, prefix).items():
+                if not name or name.endswith('/'):
+                    continue
+                file_path = os.path.join(folder, *name.split('/'))
+                if os.path.isfile(file_path) and self._unchanged(file_path, (size, etag)):
+                    skipped += 1
+                    continue
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                key = f'{prefix}/{name}' if prefix else name
+                transfers.append((name, size, file_path, key))
+            return self._run(transfers, 'download', bucket, aws_bucket_url, folder, skipped, started)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
@@ -5,6 +5,7 @@ import pandas as pd
 import pymongo
 from dotenv import load_dotenv
 import certifi
+from itertools import islice
 
 from sklearn.model_selection import train_test_split
 from networksecurity.logging_exception.exception import CustomException
@@ -13,72 +14,306 @@ from networksecurity.logging_exception.logger import logging
 #Import configuration for data ingestion config
 from networksecurity.entity.config_entity import DataIngestionConfig
 from networksecurity.entity.artifact_entity import DataIngestionArtifact
+from networksecurity.constants.training_pipeline import SCHEMA_FILE_PATH
+from networksecurity.utils.main_utils import read_yaml_file, write_yaml_file, write_dataframe, measure
+from networksecurity.utils.feature_store import ColumnarFeatureStore
+from bson import ObjectId
 
 #Load env variables
 load_dotenv()
 MONGO_DB_URL=os.getenv('MONGO_DB_URL')
 
 class DataIngestion():
-    def __init__(self, data_ingestion_config:DataIngestionConfig):
+    def __init__(self, data_ingestion_config:DataIngestionConfig, mongo_client=None):
         #self.data_ingestion_config becomes an instance of DataIngestionConfig class
+        #mongo_client can be injected (e.g. a mongomock client), otherwise one is created from MONGO_DB_URL
         try:
             self.data_ingestion_config = data_ingestion_config
+            self.mongo_client = mongo_client
         
         except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
 
-    def export_collection_as_df(self):
+    def get_collection(self):
         '''
-            Reads a collection from MongoDB and converts to cleaned dataframe
+            Connects to MongoDB once and returns the configured collection
         '''
-        try:
-            database_name = self.data_ingestion_config.database_name
-            collection_name = self.data_ingestion_config.collection_name
-            
+        if self.mongo_client is None:
             self.mongo_client = pymongo.MongoClient(MONGO_DB_URL, tlsCAFile=certifi.where())
             logging.info('Sucessfully connected to MongoDB')
-            collection = self.mongo_client[database_name][collection_name]
+        return self.mongo_client[self.data_ingestion_config.database_name][self.data_ingestion_config.collection_name]
 
-            #Read collection from MongoDB and drop _id column
-            df = pd.DataFrame(collection.find())
-            df.drop(columns='_id', inplace=True, errors='ignore')
-            df.replace('na', np.nan, inplace=True)
-            logging.info('MongoDB collection converted to dataframe')
-            
-            return df
+    def get_collection_fingerprint(self)->dict:
+        '''
+            Summarizes the collection so an unchanged collection can reuse a previous ingestion.
+            Uses the server's dbHash of the collection and falls back to document count and last _id
+            where dbHash is not permitted.
+        '''
+        try:
+            collection = self.get_collection()
+            fingerprint = {'database': collection.database.name, 'collection': collection.name,
+                           'row_limit': self.data_ingestion_config.row_limit,
+                           'sample_size': self.data_ingestion_config.sample_size,
+                           'incremental_mode': self.data_ingestion_config.incremental_mode}
+            try:
+                db_hash = collection.database.command('dbHash', collections=[collection.name])
+                fingerprint['md5'] = db_hash['collections'].get(collection.name)
+            except (pymongo.errors.PyMongoError, NotImplementedError) as e: #NotImplementedError: mongomock
+                logging.info(f'dbHash not available ({e}), fingerprinting by count and last _id')
+                last_document = collection.find_one(sort=[('_id', pymongo.DESCENDING)], projection={'_id': 1})
+                fingerprint['count'] = collection.estimated_document_count()
+                fingerprint['last_id'] = str(last_document['_id']) if last_document else None
+            return fingerprint
 
         except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
-    
-    def export_data_to_feature_store(self, dataframe: pd.DataFrame):
+
+    def open_cursor(self, collection, columns:list):
         '''
-            Reads raw data and saves in Artiface/feature_store folder
+            Returns a cursor over the schema columns (no _id), limited or sampled as configured
+        '''
+        projection = {column: 1 for column in columns}
+        projection['_id'] = 0
+        batch_size = self.data_ingestion_config.mongo_batch_size
+        if self.data_ingestion_config.sample_size:
+            return collection.aggregate([{'$sample': {'size': self.data_ingestion_config.sample_size}},
+                                         {'$project': projection}], batchSize=batch_size)
+        cursor = collection.find({}, projection, batch_size=batch_size)
+        if self.data_ingestion_config.row_limit:
+            cursor = cursor.limit(self.data_ingestion_config.row_limit)
+        return cursor
+
+    @staticmethod
+    def fill_buffers(buffers:dict, offset:int, batch:list)->None:
+        '''
+            Writes one batch of documents column by column into the float32 buffers starting at offset
+        '''
+        for column, buffer in buffers.items():
+            values = [document.get(column) for document in batch]
+            try:
+                buffer[offset:offset + len(batch)] = values #None becomes NaN
+            except (ValueError, TypeError):
+                buffer[offset:offset + len(batch)] = [np.nan if value == 'na' else value for value in values]
+
+    @staticmethod
+    def buffers_to_frame(buffers:dict, n_rows:int)->pd.DataFrame:
+        '''
+            Copies the filled part of the float32 column buffers into a frame, as int8 where a column
+            has no missing values and only integers in the int8 range
+        '''
+        columns = {}
+        for column, buffer in buffers.items():
+            values = buffer[:n_rows]
+            if not np.isnan(values).any() and np.array_equal(values, np.round(values)) \
+                    and (n_rows == 0 or (values.min() >= -128 and values.max() <= 127)):
+                columns[column] = values.astype(np.int8)
+            else:
+                columns[column] = np.array(values) #copy, also out of a memory map
+        return pd.DataFrame(columns)
+
+    def export_collection_as_df(self, feature_store_file_path:str=None)->pd.DataFrame:
+        '''
+            Streams a collection from MongoDB in cursor batches and converts each batch straight into typed
+            column buffers ('na' becomes NaN per batch). Every export_chunk_size rows the buffers become a compact
+            chunk that is appended to feature_store_file_path when it is a CSV; other formats are written once.
+            Returns the cleaned dataframe with int8 columns (float32 where a chunk had missing values).
         '''
         try:
-            feature_store_file_path = self.data_ingestion_config.feature_store_file_path #get full file path
-            
-            dir_path = os.path.dirname(feature_store_file_path) #get the dir name
-            os.makedirs(dir_path,exist_ok=True) #create the dir 
+            collection = self.get_collection()
+            columns = list(read_yaml_file(SCHEMA_FILE_PATH)['columns'])
+            documents = iter(self.open_cursor(collection, columns))
+            batch_size = self.data_ingestion_config.mongo_batch_size
+            chunk_size = self.data_ingestion_config.export_chunk_size
+            if feature_store_file_path is not None and os.path.dirname(feature_store_file_path):
+                os.makedirs(os.path.dirname(feature_store_file_path), exist_ok=True)
+
+            buffers = {column: np.empty(chunk_size, dtype=np.float32) for column in columns}
+            chunks, n_rows = [], 0
+            append_chunks = feature_store_file_path is not None and feature_store_file_path.endswith('.csv')
+            def flush():
+                chunk = self.buffers_to_frame(buffers, n_rows)
+                if append_chunks:
+                    chunk.to_csv(feature_store_file_path, mode='w' if not chunks else 'a', index=False, header=not chunks)
+                chunks.append(chunk)
+
+            while True:
+                batch = list(islice(documents, min(batch_size, chunk_size - n_rows)))
+                if not batch:
+                    break
+                self.fill_buffers(buffers, n_rows, batch)
+                n_rows += len(batch)
+                if n_rows == chunk_size:
+                    flush()
+                    n_rows = 0
+            if n_rows or not chunks:
+                flush()
+
+            dataframe = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+            if feature_store_file_path is not None and not append_chunks:
+                write_dataframe(feature_store_file_path, dataframe)
+            logging.info(f'MongoDB collection streamed to dataframe: {len(dataframe)} rows in {len(chunks)} chunks')
+            return dataframe
 
-            dataframe.to_csv(feature_store_file_path, index=False, header=True)
-            logging.info('Raw data stored in Artiface/feature_store folder')
-        
         except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
     
+    def export_collection_with_find(self, feature_store_file_path:str)->pd.DataFrame:
+        '''
+            The export the streaming one replaced: a dataframe of every document straight from find(),
+            'na' replaced afterwards, written to feature_store_file_path. Kept as the baseline of benchmark_export.
+        '''
+        cursor = self.get_collection().find()
+        if self.data_ingestion_config.row_limit:
+            cursor = cursor.limit(self.data_ingestion_config.row_limit)
+        df = pd.DataFrame(cursor)
+        df.drop(columns='_id', inplace=True, errors='ignore')
+        df.replace('na', np.nan, inplace=True)
+        os.makedirs(os.path.dirname(feature_store_file_path), exist_ok=True)
+        df.to_csv(feature_store_file_path, index=False, header=True)
+        return df
+
+    def benchmark_export(self)->dict:
+        '''
+            Exports the collection with the streaming exporter and with the old pd.DataFrame(collection.find())
+            path, each into its own feature store CSV, and writes their wall time, peak memory (see measure)
+            and dataframe size to export_benchmark_file_path in the run's data_ingestion directory.
+            The streaming export runs first, so the old path's RSS growth is measured above its peak.
+            Returns the report.
+        '''
+        try:
+            benchmark_file_path = self.data_ingestion_config.export_benchmark_file_path
+            report = {}
+            for name, export in (('streaming', self.export_collection_as_df), ('find', self.export_collection_with_find)):
+                #Both write CSV, the format the old path wrote
+                feature_store_file_path = os.path.join(os.path.dirname(benchmark_file_path), name, 'feature_store.csv')
+                dataframe, stats = measure(export, feature_store_file_path)
+                stats['rows'] = len(dataframe)
+                stats['dataframe_mb'] = round(float(dataframe.memory_usage(deep=True).sum()) / 2**20, 1)
+                report[name] = stats
+            write_yaml_file(benchmark_file_path, report)
+            logging.info(f'Export benchmark: {report}')
+            return report
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def documents_to_columns(self, documents:list, columns:list)->tuple:
+        '''
+            Converts documents to (12-byte _id array, column -> float32 array)
+        '''
+        buffers = {column: np.empty(len(documents), dtype=np.float32) for column in columns}
+        self.fill_buffers(buffers, 0, documents)
+        ids = np.array([document['_id'].binary for document in documents], dtype='S12')
+        return ids, buffers
+
+    def fetch_new_documents(self, collection, store:ColumnarFeatureStore, columns:list)->int:
+        '''
+            Reads the documents whose _id is above the stored high-water mark, in _id order, merges them
+            into the store and advances the mark. Returns the number of documents fetched.
+        '''
+        last_id = store.state.get('last_id')
+        query = {'_id': {'$gt': ObjectId(last_id)}} if last_id else {}
+        projection = {column: 1 for column in columns}
+        cursor = collection.find(query, projection, batch_size=self.data_ingestion_config.mongo_batch_size).sort('_id', pymongo.ASCENDING)
+        documents = iter(cursor)
+
+        ids, batches = [], []
+        while True:
+            batch = list(islice(documents, self.data_ingestion_config.mongo_batch_size))
+            if not batch:
+                break
+            batch_ids, batch_columns = self.documents_to_columns(batch, columns)
+            ids.append(batch_ids)
+            batches.append(batch_columns)
+            last_id = str(batch[-1]['_id'])
+
+        if ids:
+            store.merge(np.concatenate(ids), {column: np.concatenate([batch[column] for batch in batches]) for column in columns},
+                        last_id=last_id)
+        return sum(len(batch_ids) for batch_ids in ids)
+
+    def fetch_change_stream(self, collection, store:ColumnarFeatureStore, columns:list)->int:
+        '''
+            Applies the inserts, updates and deletes recorded in the collection's change stream since the stored
+            resume token. The first run takes a resume token, then copies the whole collection.
+            Requires a replica set. Returns the number of changes applied.
+        '''
+        resume_token = store.state.get('resume_token')
+        if resume_token is None:
+            #Token is taken before the copy so changes made during the copy are replayed next time
+            with collection.watch(full_document='updateLookup') as stream:
+                resume_token = stream.resume_token
+            n_documents = self.fetch_new_documents(collection, store, columns)
+            store.save_state(resume_token=resume_token)
+            return n_documents
+
+        n_changes = 0
+        with collection.watch(full_document='updateLookup', resume_after=resume_token) as stream:
+            while True:
+                #_id -> latest full document, or None when the last event for it was a delete
+                changes = {}
+                for event in iter(stream.try_next, None):
+                    if event['operationType'] in ('insert', 'update', 'replace') and event.get('fullDocument'):
+                        changes[event['documentKey']['_id']] = event['fullDocument']
+                    elif event['operationType'] == 'delete':
+                        changes[event['documentKey']['_id']] = None
+                    if len(changes) >= self.data_ingestion_config.mongo_batch_size:
+                        break
+                if not changes:
+                    break
+                upserts = [document for document in changes.values() if document is not None]
+                deleted_ids = np.array([_id.binary for _id, document in changes.items() if document is None], dtype='S12')
+                ids, upsert_columns = self.documents_to_columns(upserts, columns)
+                store.merge(ids, upsert_columns, deleted_ids=deleted_ids, resume_token=stream.resume_token)
+                n_changes += len(changes)
+            store.save_state(resume_token=stream.resume_token)
+        return n_changes
+
+    def export_collection_incrementally(self, feature_store_file_path:str=None)->pd.DataFrame:
+        '''
+            Brings the local columnar store up to date with only the new (object_id mode) or changed
+            (change_stream mode) documents, then returns the whole store as a dataframe and writes it
+            to feature_store_file_path when given.
+        '''
+        try:
+            collection = self.get_collection()
+            columns = list(read_yaml_file(SCHEMA_FILE_PATH)['columns'])
+            store = ColumnarFeatureStore(self.data_ingestion_config.incremental_store_dir, columns)
+            mode = self.data_ingestion_config.incremental_mode
+            if mode == 'object_id':
+                n_changes = self.fetch_new_documents(collection, store, columns)
+            elif mode == 'change_stream':
+                n_changes = self.fetch_change_stream(collection, store, columns)
+            else:
+                raise ValueError(f'Unknown incremental mode {mode}, expected "object_id" or "change_stream"')
+            logging.info(f'Incremental ingestion ({mode}) applied {n_changes} changes, store has {store.state["rows"]} rows')
+
+            dataframe = self.buffers_to_frame(store.to_buffers(), store.state['rows'])
+            if feature_store_file_path is not None:
+                write_dataframe(feature_store_file_path, dataframe)
+            return dataframe
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
     def split_data_as_train_test(self,dataframe: pd.DataFrame):
         '''
             Reads raw data and splits into training and test sets and saves in Artiface/ingested folder
         '''
         try:
             train_set, test_set = train_test_split(
-                dataframe, test_size=self.data_ingestion_config.train_test_split_ratio
+                dataframe, test_size=self.data_ingestion_config.train_test_split_ratio,
+                random_state=self.data_ingestion_config.split_random_state
             )
             logging.info("Performed train test split on the dataframe")
             
@@ -86,12 +321,9 @@ class DataIngestion():
             dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
             os.makedirs(dir_path, exist_ok=True)
             
-            train_set.to_csv(
-                self.data_ingestion_config.training_file_path, index=False, header=True
-            )
-            test_set.to_csv(
-                self.data_ingestion_config.testing_file_path, index=False, header=True
-            )
+            schema_columns = read_yaml_file(SCHEMA_FILE_PATH)['columns']
+            write_dataframe(self.data_ingestion_config.training_file_path, train_set, schema_columns)
+            write_dataframe(self.data_ingestion_config.testing_file_path, test_set, schema_columns)
             logging.info('Train Test split data stored in Artifacts/ingested folder')
             
         except Exception as e:
@@ -106,9 +338,12 @@ class DataIngestion():
         '''
         logging.info('Initiating data ingestion')
         try:
-            #Call the function that returns the MongoDB as df then save raw data in feature_store
-            dataframe = self.export_collection_as_df()
-            self.export_data_to_feature_store(dataframe)
+            #Stream the MongoDB collection (or only its changes) into a df, saving raw data in feature_store
+            feature_store_file_path = self.data_ingestion_config.feature_store_file_path
+            if self.data_ingestion_config.incremental_mode:
+                dataframe = self.export_collection_incrementally(feature_store_file_path=feature_store_file_path)
+            else:
+                dataframe = self.export_collection_as_df(feature_store_file_path=feature_store_file_path)
             self.split_data_as_train_test(dataframe)
 
             data_ingestion_artifact = DataIngestionArtifact(
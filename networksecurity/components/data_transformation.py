@@ -1,4 +1,6 @@
 import sys
+import time
+import pickle
 import numpy as np
 from sklearn.impute import KNNImputer
 from sklearn.pipeline import Pipeline
@@ -6,9 +8,13 @@ from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
 
 from networksecurity.constants.training_pipeline import TARGET_COLUMN, DATA_TRANSFORMATION_IMPUTER_PARAMS
+from networksecurity.constants.training_pipeline import DATA_TRANSFORMATION_IMPUTER_EVAL_MISSING_RATE
+from networksecurity.constants.training_pipeline import DATA_TRANSFORMATION_FEATURE_DTYPE, DATA_TRANSFORMATION_LABEL_DTYPE
 from networksecurity.entity.config_entity import DataTransformationConfig
 from networksecurity.entity.artifact_entity import DataValidationArtifact, DataTransformationArtifact
 from networksecurity.utils import main_utils
+from networksecurity.utils import drift
+from networksecurity.utils.imputer import PatternImputer
 
 class DataTransformation:
     def __init__(self, data_validation_artifact:DataValidationArtifact,
@@ -22,16 +28,25 @@ class DataTransformation:
             logging.error(custom_err)
             raise custom_err
 
-    def get_data_transformer_object(cls)->Pipeline:
+    def get_data_transformer_object(cls, strategy:str=None)->Pipeline:
         '''
-            Initializes a KNNImputer object with parameters defined in training_pipeline constants 
-            and returns a Pipeline object with the KNNImputer object as the first step.
+            Initializes the imputer selected by "strategy" in DATA_TRANSFORMATION_IMPUTER_PARAMS ("pattern" for
+            PatternImputer, "knn" for KNNImputer) with the remaining parameters
+            and returns a Pipeline object with the imputer as the first step.
 
             This is a method of the class rather than of an instance.
         '''
         try:
-            logging.info(f'Initializing KNNImputer with parameters: {DATA_TRANSFORMATION_IMPUTER_PARAMS}')
-            imputer:KNNImputer = KNNImputer(**DATA_TRANSFORMATION_IMPUTER_PARAMS)
+            imputer_params = dict(DATA_TRANSFORMATION_IMPUTER_PARAMS)
+            configured_strategy = imputer_params.pop('strategy', 'knn')
+            strategy = strategy or configured_strategy
+            logging.info(f'Initializing {strategy} imputer with parameters: {imputer_params}')
+            if strategy == 'pattern':
+                imputer = PatternImputer(**imputer_params)
+            elif strategy == 'knn':
+                imputer = KNNImputer(**imputer_params)
+            else:
+                raise ValueError(f'Unknown imputer strategy {strategy}, expected "pattern" or "knn"')
 
             processor:Pipeline = Pipeline([('imputer',imputer)])
             return processor
@@ -41,11 +56,47 @@ class DataTransformation:
             logging.error(custom_err)
             raise custom_err
 
+    def compare_imputers(self, input_feature_train_df, input_feature_test_df)->dict:
+        '''
+            Hides a share of the known test values, imputes them with every strategy fitted on the training inputs
+            and reports how many are recovered exactly, the time taken and the pickled size of each imputer,
+            plus the accuracy delta of PatternImputer against KNNImputer.
+        '''
+        try:
+            test = input_feature_test_df.to_numpy(dtype=np.float64)
+            rng = np.random.default_rng(0)
+            hidden = ~np.isnan(test) & (rng.random(test.shape) < DATA_TRANSFORMATION_IMPUTER_EVAL_MISSING_RATE)
+            masked = test.copy()
+            masked[hidden] = np.nan
+
+            report = {'hidden_values': int(hidden.sum())}
+            for strategy in ('pattern', 'knn'):
+                preprocessor = self.get_data_transformer_object(strategy=strategy).fit(input_feature_train_df)
+                started = time.perf_counter()
+                imputed = preprocessor.transform(masked)
+                report[strategy] = {
+                    'accuracy': float(np.mean(np.round(imputed[hidden]) == test[hidden])) if hidden.any() else None,
+                    'mean_absolute_error': float(np.mean(np.abs(imputed[hidden] - test[hidden]))) if hidden.any() else None,
+                    'transform_seconds': time.perf_counter() - started,
+                    'pickled_bytes': len(pickle.dumps(preprocessor)),
+                }
+
+            configured = DATA_TRANSFORMATION_IMPUTER_PARAMS.get('strategy', 'knn')
+            report['configured_strategy'] = configured
+            if hidden.any():
+                report['pattern_accuracy_delta_vs_knn'] = report['pattern']['accuracy'] - report['knn']['accuracy']
+            return report
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
     def initiate_data_transformation(self)->DataTransformationArtifact:
         logging.info('Initiating data transformation.')
         try:
-            train_df = main_utils.read_csv_data(self.data_validation_artifact.valid_train_file_path)
-            test_df = main_utils.read_csv_data(self.data_validation_artifact.valid_test_file_path)
+            train_df = main_utils.read_dataframe(self.data_validation_artifact.valid_train_file_path)
+            test_df = main_utils.read_dataframe(self.data_validation_artifact.valid_test_file_path)
 
             logging.info('Separating input and target features')
             input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
@@ -58,26 +109,44 @@ class DataTransformation:
             target_feature_train_df = target_feature_train_df.replace(-1,0)
             target_feature_test_df = target_feature_test_df.replace(-1,0)
 
-            logging.info('Imputing missing values with KNNImputer preprocessor')
+            logging.info('Imputing missing values with the configured imputer')
             preprocessor = self.get_data_transformer_object()
             preprocessor_object = preprocessor.fit(input_feature_train_df)
             transformed_input_train_feature = preprocessor_object.transform(input_feature_train_df)
             transformed_input_test_feature = preprocessor_object.transform(input_feature_test_df)
 
-            logging.info('Combining transformed inputs with target columns')
-            train_arr = np.c_[transformed_input_train_feature, np.array(target_feature_train_df) ]
-            test_arr = np.c_[transformed_input_test_feature, np.array(target_feature_test_df) ]
-
-            logging.info('Saving numpy array data and preprocessor object')
-            main_utils.save_numpy_array_data(file_path=self.data_transformation_config.transformed_train_file_path, array=train_arr)
-            main_utils.save_numpy_array_data(file_path=self.data_transformation_config.transformed_test_file_path, array=test_arr)
+            logging.info('Saving input features and targets as separate numpy arrays, and the preprocessor object')
+            config = self.data_transformation_config
+            main_utils.save_numpy_array_data(file_path=config.transformed_train_file_path,
+                                             array=transformed_input_train_feature, dtype=DATA_TRANSFORMATION_FEATURE_DTYPE)
+            main_utils.save_numpy_array_data(file_path=config.transformed_test_file_path,
+                                             array=transformed_input_test_feature, dtype=DATA_TRANSFORMATION_FEATURE_DTYPE)
+            main_utils.save_numpy_array_data(file_path=config.transformed_train_label_file_path,
+                                             array=target_feature_train_df, dtype=DATA_TRANSFORMATION_LABEL_DTYPE)
+            main_utils.save_numpy_array_data(file_path=config.transformed_test_label_file_path,
+                                             array=target_feature_test_df, dtype=DATA_TRANSFORMATION_LABEL_DTYPE)
             main_utils.save_object(file_path=self.data_transformation_config.transformed_object_file_path, obj=preprocessor_object)
 
+            logging.info('Saving the reference sketch of the raw training inputs for drift monitoring')
+            columns = list(input_feature_train_df.columns)
+            reference_sketch = drift.build_reference_sketch(
+                np.column_stack([input_feature_train_df[column].to_numpy() for column in columns]), columns,
+                max_bins=config.drift_max_bins)
+            main_utils.write_yaml_file(file_path=config.reference_sketch_file_path, content=reference_sketch)
+
+            logging.info('Comparing the configured imputer against KNNImputer')
+            imputer_report = self.compare_imputers(input_feature_train_df, input_feature_test_df)
+            main_utils.write_yaml_file(file_path=self.data_transformation_config.imputer_report_file_path, content=imputer_report)
+            logging.info(f'Imputer report: {imputer_report}')
+
             logging.info('Preparing transformation artifacts')
             data_transformation_artifact = DataTransformationArtifact(
                 transformed_object_file_path = self.data_transformation_config.transformed_object_file_path,
                 transformed_train_file_path = self.data_transformation_config.transformed_train_file_path,
-                transformed_test_file_path = self.data_transformation_config.transformed_test_file_path
+                transformed_test_file_path = self.data_transformation_config.transformed_test_file_path,
+                transformed_train_label_file_path = self.data_transformation_config.transformed_train_label_file_path,
+                transformed_test_label_file_path = self.data_transformation_config.transformed_test_label_file_path,
+                reference_sketch_file_path = self.data_transformation_config.reference_sketch_file_path
             )
 
             logging.info('Data transformation complete and artifacts generated!')
@@ -1,6 +1,6 @@
 import os, sys
+import numpy as np
 import pandas as pd
-from scipy.stats import ks_2samp
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
 
@@ -9,6 +9,7 @@ from networksecurity.entity.config_entity import DataValidationConfig
 from networksecurity.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
 from networksecurity.constants.training_pipeline import SCHEMA_FILE_PATH
 from networksecurity.utils import main_utils
+from networksecurity.utils import drift
 
 class DataValidation():
     def __init__(self, data_ingestion_artifact:DataIngestionArtifact,
@@ -55,32 +56,43 @@ class DataValidation():
             raise custom_err
 
 
-    def detect_dataset_drift(self, base_df, current_df, threshold=0.05)->bool:
+    def detect_dataset_drift(self, base_df, current_df, threshold=None, test=None)->bool:
         '''
-            Checks distribution between columns in two dataframes and determines if there is drift in the distributions
-            using Kolmogorov-Smirnov non-parametric test.
+            Checks distribution between columns in two dataframes and determines if there is drift in the distributions.
+            Every column is reduced to a histogram of its values in one vectorized pass, then the configured test
+            (population stability index by default, or Jensen-Shannon, chi-square or Kolmogorov-Smirnov) compares
+            the histograms of all columns at once.
         '''
         try:
-            status = True
+            config = self.data_validation_config
+            test = test or config.drift_test
+            threshold = config.drift_threshold if threshold is None else threshold
+            columns = list(base_df.columns)
+            #Stacked in the columns' own dtypes (int8, or float32 with missing values), not converted up front
+            base_values = np.column_stack([base_df[column].to_numpy() for column in columns])
+            current_values = np.column_stack([current_df[column].to_numpy() for column in columns])
+
+            bin_edges = drift.compute_bin_edges(base_values, current_values, max_bins=config.drift_max_bins)
+            histogram_params = dict(bin_edges=bin_edges, n_jobs=config.drift_n_jobs,
+                                    column_block_size=config.drift_column_block_size)
+            base_histograms = drift.column_histograms(base_values, **histogram_params)
+            current_histograms = drift.column_histograms(current_values, **histogram_params)
+            scores, p_values = drift.drift_statistics(base_histograms, current_histograms, test=test)
+            drifted = drift.is_drifted(scores, p_values, test, threshold)
+
             report = {}
-            #Compare distributions column by column
-            for column in base_df.columns:
-                d1 = base_df[column]
-                d2 = current_df[column]
-                is_same_dist = ks_2samp(d1,d2) #compare distribution of 2 samples
-                
-                if is_same_dist.pvalue < threshold:
-                    is_found = True    # Drift detected
-                    status = False     # Overall status becomes False
-                    logging.warning(f'Drift detected in {column} column')
-                else:
-                    is_found = False   # No drift detected
+            for column, score, p_value, is_found in zip(columns, scores, p_values, drifted):
+                if is_found:
+                    logging.warning(f'Drift detected in {column} column ({test} {score:.4f}, p-value {p_value:.4g})')
                 report.update({
                         column:{
-                            'p-value':float(is_same_dist.pvalue),
-                            'drift_status':is_found
+                            'p-value':float(p_value),
+                            'drift_status':bool(is_found),
+                            'test':test,
+                            'statistic':float(score)
                         }
                     })
+            status = not drifted.any()
             
             #Save report in YAML file
             drift_report_file_path = self.data_validation_config.drift_report_file_path
@@ -100,8 +112,8 @@ class DataValidation():
             train_file_path=self.data_ingestion_artifact.trained_file_path
             test_file_path=self.data_ingestion_artifact.test_file_path
 
-            train_df = main_utils.read_csv_data(train_file_path)
-            test_df = main_utils.read_csv_data(test_file_path)
+            train_df = main_utils.read_dataframe(train_file_path)
+            test_df = main_utils.read_dataframe(test_file_path)
             logging.info('Train and test data read and stored.')
 
             #Validate number of columns
@@ -125,15 +137,15 @@ class DataValidation():
             status = status_train and status_test and status_drift
             logging.info(f'Final Validation Status: {status}')
 
-            #Save data to directory based on status
+            #Hand the unchanged files to the next stage based on status, hard-linked rather than rewritten
             os.makedirs(self.data_validation_config.valid_data_dir, exist_ok=True)
             os.makedirs(self.data_validation_config.invalid_data_dir, exist_ok=True)
             if status == True:
-                train_df.to_csv(self.data_validation_config.valid_train_file_path, index=False, header=True)
-                test_df.to_csv(self.data_validation_config.valid_test_file_path, index=False, header=True)
+                main_utils.link_or_copy(train_file_path, self.data_validation_config.valid_train_file_path)
+                main_utils.link_or_copy(test_file_path, self.data_validation_config.valid_test_file_path)
             else:
-                train_df.to_csv(self.data_validation_config.invalid_train_file_path, index=False, header=True)
-                test_df.to_csv(self.data_validation_config.invalid_test_file_path, index=False, header=True)
+                main_utils.link_or_copy(train_file_path, self.data_validation_config.invalid_train_file_path)
+                main_utils.link_or_copy(test_file_path, self.data_validation_config.invalid_test_file_path)
 
             #Generate validation artifact
             data_validation_artifact = DataValidationArtifact(
@@ -1,10 +1,15 @@
 import sys, os
+import shutil
+import numpy as np
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
 
 from networksecurity.entity.config_entity import ModelTrainerConfig
 from networksecurity.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact
-from networksecurity.utils import main_utils, ml_utils, ml_flow
+from networksecurity.utils import main_utils, ml_utils, ml_flow, incremental, model_bundle
+from networksecurity.utils.fit_scheduler import FitScheduler
+from networksecurity.constants.training_pipeline import FINAL_MODEL_FILE_PATH, FINAL_REFERENCE_SKETCH_FILE_PATH
+from networksecurity.constants.training_pipeline import FINAL_TRAIN_ROW_HASHES_FILE_PATH, MODEL_BUNDLE_DATA_DIR_NAME
 
 
 class ModelTrainer:
@@ -20,18 +25,34 @@ class ModelTrainer:
     
     def train_and_evaluate_model(self, X_train, y_train, X_test, y_test):
         '''
-            Trains and compares models using GridSearchCV. 
-            Best model is used to make predictions and classification scores are stored.
-            Final model is saved for future predictions.
+            Trains and compares models, screening them on a subsample and tuning the survivors with the configured
+            hyperparameter search strategy. The model with the best test f1 makes predictions and its
+            classification scores are stored.
+            Final model is saved for future predictions. Every candidate is tracked in one MLflow run, in the background.
         '''
+        tracker = ml_flow.MlflowTracker().start(tags={'training_mode': 'full'})
         try:
             models = self.model_trainer_config.models
             param_grid = self.model_trainer_config.param_grid
-            model_report, best_model, best_model_name, best_score = ml_utils.evaluate_models(
-                                                         X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
-                                                         models=models,param=param_grid)
+            with FitScheduler(self.model_trainer_config.cpu_budget) as scheduler:
+                model_report, best_model, best_model_name, best_score, search_report = ml_utils.evaluate_models(
+                                                             X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
+                                                             models=models,param=param_grid,
+                                                             search_params=self.model_trainer_config.search_params,
+                                                             baseline_strategy=self.model_trainer_config.search_baseline_strategy,
+                                                             scheduler=scheduler,
+                                                             screening_params=self.model_trainer_config.screening_params,
+                                                             expected_score=self.model_trainer_config.expected_accuracy)
             
             logging.info(f'Best Model: {best_model_name}, Score: {best_score}')
+            tracker.log_candidates(model_report, search_report)
+            tracker.set_tags({'best_model': best_model_name, 'model_type': type(best_model).__name__})
+            main_utils.write_yaml_file(file_path=self.model_trainer_config.search_report_file_path, content=search_report)
+            logging.info(f'Hyperparameter search report: {search_report}')
+            timeline = scheduler.timeline()
+            main_utils.write_yaml_file(file_path=self.model_trainer_config.search_timeline_file_path, content=timeline)
+            logging.info(f'Search used {timeline["busy_seconds"]}s of CPU in {timeline["wall_seconds"]}s on {timeline["n_cores"]} cores, '
+                         f'utilization {timeline["utilization"]}')
             
             logging.info('Generating classification metric artifact using best model.')
             y_train_pred = best_model.predict(X_train)
@@ -41,25 +62,24 @@ class ModelTrainer:
             y_test_pred = best_model.predict(X_test)
             classification_test_metric=ml_utils.get_classification_score(y_true=y_test, y_pred=y_test_pred)
 
-            logging.info('Tracking experiment in mlflow.')
-            ml_flow.track_mlflow(best_model=best_model, classification_metric=classification_train_metric)
-            ml_flow.track_mlflow(best_model=best_model, classification_metric=classification_test_metric)
+            tracker.log_classification_metric(classification_train_metric, prefix='train_')
+            tracker.log_classification_metric(classification_test_metric, prefix='test_')
             
             logging.info('Saving model object containing preprocessor and model with function to make future predictions.')
-            # Create directory to save best model and save NetworkModel obj containing preprocessor and model which can also be used to predict
-            os.makedirs(os.path.dirname(self.model_trainer_config.trained_model_file_path),exist_ok=True)
-
             preprocessor = main_utils.load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
             Network_Model=ml_utils.NetworkModel(preprocessor=preprocessor,model=best_model)
-            main_utils.save_object(self.model_trainer_config.trained_model_file_path, obj=Network_Model)
-            
-            #Save final preprocessor and model
-            main_utils.save_object("final_model/model.pkl", Network_Model)
+            self.save_model(Network_Model, incremental.row_hashes(X_train, y_train))
             logging.info('Final model saved in final_model folder!')
+            #The saved bundle is uploaded as it is, no second dump of the model
+            self.log_model_bundle(tracker)
+            tracker.log_artifact(self.model_trainer_config.search_report_file_path, artifact_path='search')
+            tracker.log_artifact(self.model_trainer_config.search_timeline_file_path, artifact_path='search')
             
             model_trainer_artifact = ModelTrainerArtifact(trained_model_file_path=self.model_trainer_config.trained_model_file_path,
                                 train_metric_artifact=classification_train_metric,
-                                test_metric_artifact=classification_test_metric
+                                test_metric_artifact=classification_test_metric,
+                                reference_sketch_file_path=self.model_trainer_config.reference_sketch_file_path,
+                                train_row_hashes_file_path=self.model_trainer_config.train_row_hashes_file_path
                                 )
             
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
@@ -69,26 +89,141 @@ class ModelTrainer:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
+        finally:
+            tracker.close()
+
 
 
+    def save_model(self, network_model, row_hashes:np.ndarray, promote:bool=True)->None:
+        '''
+            Saves the model with the reference sketch and the hashes of its training rows in trained_model/.
+            When promoted, the three files also replace final_model/, the model last since serving workers
+            hot-swap when it changes. The model is saved once as a bundle, final_model/ links to its arrays.
+        '''
+        config = self.model_trainer_config
+        os.makedirs(os.path.dirname(config.trained_model_file_path),exist_ok=True)
+        model_bundle.save_model_bundle(config.trained_model_file_path, network_model)
+        #The reference sketch of the training inputs travels with the model, serving compares live traffic to it
+        shutil.copyfile(self.data_transformation_artifact.reference_sketch_file_path, config.reference_sketch_file_path)
+        main_utils.save_numpy_array_data(config.train_row_hashes_file_path, row_hashes)
+        if not promote:
+            return
+
+        for source_file_path, final_file_path in [(config.reference_sketch_file_path, FINAL_REFERENCE_SKETCH_FILE_PATH),
+                                                  (config.train_row_hashes_file_path, FINAL_TRAIN_ROW_HASHES_FILE_PATH)]:
+            os.makedirs(os.path.dirname(final_file_path), exist_ok=True)
+            tmp_path = f'{final_file_path}.tmp'
+            shutil.copyfile(source_file_path, tmp_path)
+            os.replace(tmp_path, final_file_path)
+        #The manifest is replaced atomically after the arrays are linked, so serving workers hot-swap to it
+        model_bundle.copy_model_bundle(config.trained_model_file_path, FINAL_MODEL_FILE_PATH)
+
+    def log_model_bundle(self, tracker:ml_flow.MlflowTracker)->None:
+        '''
+            Uploads the trained model's manifest and data files to the MLflow run as they are.
+        '''
+        trained_model_file_path = self.model_trainer_config.trained_model_file_path
+        tracker.log_artifact(trained_model_file_path, artifact_path='model')
+        tracker.log_artifact(os.path.join(os.path.dirname(trained_model_file_path), MODEL_BUNDLE_DATA_DIR_NAME),
+                             artifact_path='model')
+
+
+    def incremental_train(self, X_train, y_train, X_test, y_test)->ModelTrainerArtifact:
+        '''
+            Continues the final model on the training rows it has not been trained on (told apart by row hashes),
+            replaying as many already trained rows, so the work is proportional to the new rows.
+            The continued model is saved with this run's preprocessor, the one that produced the arrays it is
+            trained and scored on, and is promoted to final_model only if its test f1 beats the final model's
+            on the same test set.
+            Returns None when a full retrain is needed: no final model or row hashes, too many new rows,
+            or a model type that cannot be continued.
+        '''
+        try:
+            config = self.model_trainer_config
+            if not (os.path.exists(FINAL_MODEL_FILE_PATH) and os.path.exists(FINAL_TRAIN_ROW_HASHES_FILE_PATH)):
+                logging.info('No final model with training row hashes to continue, training in full.')
+                return None
+            previous_model = model_bundle.load_model(FINAL_MODEL_FILE_PATH)
+            previous_hashes = main_utils.load_numpy_array_data(FINAL_TRAIN_ROW_HASHES_FILE_PATH)
+            hashes = incremental.row_hashes(X_train, y_train)
+            seen = np.isin(hashes, previous_hashes)
+            new_rows = np.flatnonzero(~seen)
+            logging.info(f'{len(new_rows)} of {len(hashes)} training rows are new to the final model.')
+            if len(new_rows) > config.incremental_max_new_rows_share * len(previous_hashes):
+                logging.info(f'More than {config.incremental_max_new_rows_share:.0%} new rows, training in full.')
+                return None
+
+            if len(new_rows):
+                rows = incremental.replay_sample(new_rows, np.flatnonzero(seen), config.incremental_replay_ratio)
+                model = incremental.continue_training(previous_model.model, X_train[rows], y_train[rows],
+                                                     growth=len(new_rows) / len(previous_hashes))
+                if model is None:
+                    logging.info(f'{type(previous_model.model).__name__} cannot be continued, training in full.')
+                    return None
+            else:
+                model = previous_model.model
+
+            previous_test_metric = ml_utils.get_classification_score(y_true=y_test, y_pred=previous_model.model.predict(X_test))
+            classification_train_metric = ml_utils.get_classification_score(y_true=y_train, y_pred=model.predict(X_train))
+            classification_test_metric = ml_utils.get_classification_score(y_true=y_test, y_pred=model.predict(X_test))
+            promoted = len(new_rows) > 0 and \
+                classification_test_metric.f1_score >= previous_test_metric.f1_score + config.incremental_min_improvement
+            logging.info(f'Continued model test f1 {classification_test_metric.f1_score:.4f}, final model '
+                         f'{previous_test_metric.f1_score:.4f}: {"promoted" if promoted else "final model kept"}.')
+
+            preprocessor = main_utils.load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            Network_Model = ml_utils.NetworkModel(preprocessor=preprocessor, model=model)
+            self.save_model(Network_Model, np.union1d(previous_hashes, hashes), promote=promoted)
+
+            tracker = ml_flow.MlflowTracker().start(tags={'training_mode': 'incremental', 'promoted': promoted,
+                                                          'model_type': type(model).__name__})
+            try:
+                tracker.log_metrics({'new_rows': len(new_rows), 'previous_test_f1': previous_test_metric.f1_score})
+                tracker.log_classification_metric(classification_train_metric, prefix='train_')
+                tracker.log_classification_metric(classification_test_metric, prefix='test_')
+                self.log_model_bundle(tracker)
+            finally:
+                tracker.close()
+
+            model_trainer_artifact = ModelTrainerArtifact(trained_model_file_path=config.trained_model_file_path,
+                                train_metric_artifact=classification_train_metric,
+                                test_metric_artifact=classification_test_metric,
+                                reference_sketch_file_path=config.reference_sketch_file_path,
+                                train_row_hashes_file_path=config.train_row_hashes_file_path,
+                                training_mode='incremental',
+                                new_rows=int(len(new_rows)),
+                                promoted=bool(promoted),
+                                previous_test_metric_artifact=previous_test_metric
+                                )
+            logging.info(f"Model trainer artifact: {model_trainer_artifact}")
+            return model_trainer_artifact
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
 
     def initiate_model_trainer(self)->ModelTrainerArtifact:
         logging.info('Initiating model trainer.')
         try:
             logging.info('Loading train and test arrays.')
-            train_file_path = self.data_transformation_artifact.transformed_train_file_path
-            test_file_path = self.data_transformation_artifact.transformed_test_file_path
-
-            train_arr = main_utils.load_numpy_array_data(train_file_path)
-            test_arr = main_utils.load_numpy_array_data(test_file_path)
-
+            #Memory-mapped read-only arrays: hyperparameter search workers map the same files instead of copying them
+            artifact = self.data_transformation_artifact
+            mmap_mode = self.model_trainer_config.array_mmap_mode
             X_train, y_train, X_test, y_test = (
-                train_arr[:,:-1],
-                train_arr[:,-1],
-                test_arr[:,:-1],
-                test_arr[:,-1]
+                main_utils.load_numpy_array_data(artifact.transformed_train_file_path, mmap_mode=mmap_mode),
+                main_utils.load_numpy_array_data(artifact.transformed_train_label_file_path, mmap_mode=mmap_mode),
+                main_utils.load_numpy_array_data(artifact.transformed_test_file_path, mmap_mode=mmap_mode),
+                main_utils.load_numpy_array_data(artifact.transformed_test_label_file_path, mmap_mode=mmap_mode)
             )
             
+            if self.model_trainer_config.training_mode == 'incremental':
+                logging.info('Continuing the final model on new training rows')
+                model_trainer_artifact = self.incremental_train(X_train, y_train, X_test, y_test)
+                if model_trainer_artifact is not None:
+                    return model_trainer_artifact
+
             logging.info('Training and evaluating models')
             model_trainer_artifact = self.train_and_evaluate_model(X_train, y_train, X_test, y_test)
             logging.info('Models trained and evaluated, best model chosen, and artifact generated.')
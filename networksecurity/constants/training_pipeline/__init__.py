@@ -9,15 +9,22 @@ Defining common constant variable for training pipeline
 TARGET_COLUMN = "Result"
 PIPELINE_NAME: str = "NetworkSecurity"
 ARTIFACT_DIR: str = "Artifacts"
-FILE_NAME: str = "phisingData.csv"
+#Format of the data handed between stages: "feather" (Arrow IPC, memory-mapped reads), "parquet" or "csv"
+ARTIFACT_FILE_FORMAT: str = "feather"
+FILE_NAME: str = f"phisingData.{ARTIFACT_FILE_FORMAT}"
+ARTIFACT_FORMAT_BENCHMARK_DIR: str = "format_benchmark" #stage hand-off timings per format (python main.py --benchmark-formats)
+ARTIFACT_FORMAT_BENCHMARK_FILE_NAME: str = "report.yaml"
 
-TRAIN_FILE_NAME: str = "train.csv"
-TEST_FILE_NAME: str = "test.csv"
+TRAIN_FILE_NAME: str = f"train.{ARTIFACT_FILE_FORMAT}"
+TEST_FILE_NAME: str = f"test.{ARTIFACT_FILE_FORMAT}"
 
 SCHEMA_FILE_PATH = os.path.join("data_schema", "schema.yaml")
 
 SAVED_MODEL_DIR =os.path.join("saved_models")
-MODEL_FILE_NAME = "model.pkl"
+MODEL_FILE_NAME = "model.json" #model bundle manifest, its arrays and pickles are in MODEL_BUNDLE_DATA_DIR_NAME next to it
+MODEL_BUNDLE_DATA_DIR_NAME: str = "model_data" #<sha256>.npy arrays (memory-mapped on load) and <sha256>.pkl estimators
+MODEL_BUNDLE_VERIFY_ON_LOAD: bool = False #re-hash every data file when a bundle is loaded, reads the whole bundle
+REFERENCE_SKETCH_FILE_NAME: str = "reference_sketch.yaml" #training input histograms, kept next to the model for drift monitoring
 
 
 
@@ -30,6 +37,15 @@ DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATION: float = 0.2
+DATA_INGESTION_SPLIT_RANDOM_STATE: int = 42 #same data gives the same split, so unchanged runs produce identical artifacts
+DATA_INGESTION_MONGO_BATCH_SIZE: int = 5000 #documents per cursor round trip
+DATA_INGESTION_EXPORT_CHUNK_SIZE: int = 100000 #rows buffered before a chunk is appended to the feature store
+DATA_INGESTION_ROW_LIMIT: int = None #export only the first N documents (quick runs)
+DATA_INGESTION_SAMPLE_SIZE: int = None #export a random sample of N documents (quick runs)
+DATA_INGESTION_INCREMENTAL_MODE: str = None #None (full export), "object_id" (new _ids only) or "change_stream" (inserts, updates, deletes)
+DATA_INGESTION_INCREMENTAL_STORE_DIR: str = os.path.join(ARTIFACT_DIR, "incremental_feature_store")
+DATA_INGESTION_EXPORT_BENCHMARK_DIR: str = "export_benchmark" #streaming vs pd.DataFrame(collection.find()) export (python main.py --benchmark-export)
+DATA_INGESTION_EXPORT_BENCHMARK_FILE_NAME: str = "report.yaml"
 
 
 """
@@ -40,6 +56,13 @@ DATA_VALIDATION_VALID_DIR: str = "validated"
 DATA_VALIDATION_INVALID_DIR: str = "invalid"
 DATA_VALIDATION_DRIFT_REPORT_DIR: str = "drift_report"
 DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.yaml"
+#Drift test on per-column value histograms: "ks" (same decisions as the former ks_2samp loop), "psi", "js" or "chi2"
+DATA_VALIDATION_DRIFT_TEST: str = "ks"
+#p-value below which ks/chi2 flag drift, score above which psi/js flag drift
+DATA_VALIDATION_DRIFT_THRESHOLDS: dict = {"ks": 0.05, "chi2": 0.05, "psi": 0.2, "js": 0.1}
+DATA_VALIDATION_DRIFT_MAX_BINS: int = 64 #columns with more distinct values are binned by quantiles
+DATA_VALIDATION_DRIFT_N_JOBS: int = -1 #threads counting histograms of column blocks
+DATA_VALIDATION_DRIFT_COLUMN_BLOCK_SIZE: int = 64
 
 
 """
@@ -48,12 +71,21 @@ Data Transformation related constant start with DATA_TRANSFORMATION_VAR_NAME
 DATA_TRANSFORMATION_DIR_NAME: str = "data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str = "transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR: str = "transformed_object"
-DATA_TRANSFORMATION_TRAIN_FILE_PATH: str = "train.npy"
-DATA_TRANSFORMATION_TEST_FILE_PATH: str = "test.npy"
+#Features and labels are stored apart in compact dtypes so the trainer can memory-map them without slicing
+DATA_TRANSFORMATION_TRAIN_FILE_PATH: str = "train_features.npy"
+DATA_TRANSFORMATION_TEST_FILE_PATH: str = "test_features.npy"
+DATA_TRANSFORMATION_TRAIN_LABEL_FILE_PATH: str = "train_labels.npy"
+DATA_TRANSFORMATION_TEST_LABEL_FILE_PATH: str = "test_labels.npy"
+DATA_TRANSFORMATION_FEATURE_DTYPE = np.float32 #the dtype tree models train on, so they need no converted copy
+DATA_TRANSFORMATION_LABEL_DTYPE = np.int8
 PREPROCESSING_OBJECT_FILE_NAME = "preprocessing.pkl"
+DATA_TRANSFORMATION_IMPUTER_REPORT_FILE_NAME: str = "imputer_report.yaml"
+DATA_TRANSFORMATION_IMPUTER_EVAL_MISSING_RATE: float = 0.05 #share of known test values hidden to score the imputer
 
-## kkn imputer to replace nan values
+## imputer to replace nan values, strategy "knn" (KNNImputer) or "pattern" (PatternImputer)
+## imputer_report.yaml of every run compares both, "pattern" is faster and smaller at a small accuracy delta
 DATA_TRANSFORMATION_IMPUTER_PARAMS: dict = {
+    "strategy": "knn",
     "missing_values": np.nan,
     "n_neighbors": 3,
     "weights": "uniform",
@@ -67,8 +99,131 @@ Model Trainer ralated constant start with MODEL_TRAINER_VAR_NAME
 
 MODEL_TRAINER_DIR_NAME: str = "model_trainer"
 MODEL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
-MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.pkl"
+MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.json"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.6
 MODEL_TRAINER_OVER_FIITING_UNDER_FITTING_THRESHOLD: float = 0.05
+MODEL_TRAINER_ARRAY_MMAP_MODE: str = "r" #memory-map the transformed arrays, shared by the search workers; None loads them into RAM
+MODEL_TRAINER_SEARCH_REPORT_FILE_NAME: str = "search_report.yaml"
+MODEL_TRAINER_SEARCH_TIMELINE_FILE_NAME: str = "search_timeline.yaml" #every fit of the search with its worker and start/end times
+MODEL_TRAINER_CPU_BUDGET: int = -1 #worker processes shared by all model searches, -1 = all cores; fits are single-threaded
+## hyperparameter search, strategy "exhaustive" (grid search), "randomized", "halving" or "early_stopping"
+## "halving" searched ~6x faster at about the same test accuracy on phisingData.csv, set
+## MODEL_TRAINER_SEARCH_BASELINE_STRATEGY = "exhaustive" to compare on your data in search_report.yaml
+MODEL_TRAINER_SEARCH_PARAMS: dict = {
+    "strategy": "exhaustive",
+    "cv": 3,
+    "time_budget": 300, #seconds per model, the best candidate found so far is used when it runs out
+    "n_iter": 20, #randomized: combinations sampled from the grid
+    "halving_factor": 3, #halving: share of candidates kept per round is 1/factor
+    "patience": 6, #early_stopping: candidates in a row without improvement before stopping
+    "n_iter_no_change": 10, #early_stopping: boosting rounds without improvement before a model stops adding trees
+}
+#Also run this strategy on every model and report score and time against it ("exhaustive" or None)
+MODEL_TRAINER_SEARCH_BASELINE_STRATEGY: str = None
+## model screening before the search, None searches every model
+MODEL_TRAINER_SCREENING_PARAMS: dict = {
+    "sample_size": 4000, #stratified training rows each model is fitted on with default parameters
+    "validation_size": 1000, #other stratified training rows the screening f1 is measured on (standard error ~0.008)
+    "margin": 0.02, #models whose screening f1 is further behind the leader are not searched
+}
+## training mode, "full" (search and fit every model) or "incremental" (continue the final model on the new rows)
+MODEL_TRAINER_TRAINING_MODE: str = "full"
+MODEL_TRAINER_TRAIN_ROW_HASHES_FILE_NAME: str = "train_row_hashes.npy" #hashes of the rows the model was trained on, saved next to it
+MODEL_TRAINER_INCREMENTAL_MAX_NEW_ROWS_SHARE: float = 0.3 #more new rows than this share of the trained rows falls back to a full retrain
+MODEL_TRAINER_INCREMENTAL_REPLAY_RATIO: float = 1.0 #already trained rows replayed per new row when continuing a model
+MODEL_TRAINER_INCREMENTAL_MIN_IMPROVEMENT: float = 0.0 #test f1 gain over the final model required to promote the continued model
+
+TRAINING_BUCKET_NAME = "networksecurity-saad"
+
+
+
+"""
+S3 sync related constant start with S3_SYNC_VAR_NAME
+"""
+S3_SYNC_ENDPOINT_URL: str = None #S3-compatible endpoint (MinIO, moto), AWS_ENDPOINT_URL from the environment when None
+S3_SYNC_MAX_CONCURRENCY: int = 16 #files and multipart parts transferred at once, also the client's connection pool size
+S3_SYNC_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024 #files from this size are sent in concurrent parts
+S3_SYNC_MULTIPART_CHUNKSIZE: int = 8 * 1024 * 1024 #part size, also used to compute the ETag of local files
+
+
+
+"""
+MLflow tracking related constant start with MLFLOW_VAR_NAME
+"""
+MLFLOW_EXPERIMENT_NAME: str = "networksecurity" #used when MLFLOW_EXPERIMENT_NAME is not set in the environment
+MLFLOW_RUN_NAME: str = "model_tracking"
+MLFLOW_FALLBACK_TRACKING_DIR: str = "mlruns" #local file store used when MLFLOW_TRACKING_URI is not set
+MLFLOW_FLUSH_INTERVAL: float = 1.0 #seconds between batched sends of queued metrics and params
+
+
+
+"""
+Training job related constant start with TRAINING_JOB_VAR_NAME
+"""
+TRAINING_PIPELINE_STAGES: list = ["data_ingestion", "data_validation", "data_transformation", "model_trainer", "s3_sync"]
+TRAINING_JOB_DIR: str = "training_jobs"
+TRAINING_JOB_LOCK_FILE_NAME: str = "training.lock"
+TRAINING_JOB_NICENESS: int = 10 #lower the training worker's CPU priority so serving latency stays flat
+TRAINING_JOB_START_TIMEOUT: int = 120 #seconds a job may stay queued before it is marked as failed
+
+"""
+Stage cache related constant start with STAGE_CACHE_VAR_NAME
+"""
+STAGE_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "stage_cache")
+STAGE_CACHE_RUN_STATE_FILE_NAME: str = "run_state.json" #stage statuses of one run, read by --resume
+
+
+
+"""
+Artifact store related constant start with ARTIFACT_STORE_VAR_NAME
+"""
+ARTIFACT_STORE_DIR: str = os.path.join(ARTIFACT_DIR, "blobs") #content-addressed files shared by every run, blobs/<sha256[:2]>/<sha256>
+ARTIFACT_STORE_MANIFEST_FILE_NAME: str = "manifest.json" #path -> sha256 and size of every file of a run, kept in its run directory
+ARTIFACT_STORE_KEEP_RUNS: int = 5 #runs kept by the garbage collection (python main.py --gc)
+
+
+
+"""
+Batch prediction related constant start with BATCH_PREDICTION_VAR_NAME
+"""
+BATCH_PREDICTION_DIR_NAME: str = "batch_prediction"
+BATCH_PREDICTION_MANIFEST_FILE_NAME: str = "manifest.json"
+BATCH_PREDICTION_SHARD_SIZE: int = 100000 #rows per shard for large CSV files and MongoDB queries
+BATCH_PREDICTION_NUM_WORKERS: int = max(1, (os.cpu_count() or 1) - 1)
+BATCH_PREDICTION_OUTPUT_FORMAT: str = "csv" #csv or parquet
+
+
+
+"""
+Model serving related constant start with MODEL_SERVING_VAR_NAME
+"""
+FINAL_MODEL_DIR: str = "final_model"
+FINAL_MODEL_FILE_PATH: str = os.path.join(FINAL_MODEL_DIR, MODEL_FILE_NAME)
+MODEL_SERVING_RELOAD_CHECK_INTERVAL: float = 2.0 #seconds between mtime checks of the final model file
+MODEL_SERVING_USE_COMPILED_MODEL: bool = True #serve CompiledNetworkModel (same predictions, faster small batches)
+MODEL_SERVING_LOOKUP_TABLE_SIZE: int = 1_000_000 #distinct ternary rows whose prediction is cached per loaded model
+MODEL_SERVING_COMPILED_MAX_ROWS: int = 256 #larger sets of new rows use the estimator's own predict
+MODEL_SERVING_THREAD_POOL_SIZE: int = min(32, (os.cpu_count() or 1) + 4)
+MODEL_SERVING_MAX_QUEUE_SIZE: int = 64 #tasks running or waiting in the thread pool before requests get a 429
+MODEL_SERVING_MAX_BATCH_SIZE: int = 64 #rows per micro-batch for /predict/json
+MODEL_SERVING_MAX_BATCH_WAIT_MS: float = 5.0 #how long the first row of a micro-batch waits for more rows
+MODEL_SERVING_BATCH_QUEUE_SIZE: int = 4096 #rows waiting for a micro-batch before requests get a 429
+MODEL_SERVING_STREAM_CHUNK_SIZE: int = 10000 #rows scored per chunk by /predict/stream
+FINAL_REFERENCE_SKETCH_FILE_PATH: str = os.path.join(FINAL_MODEL_DIR, REFERENCE_SKETCH_FILE_NAME)
+FINAL_TRAIN_ROW_HASHES_FILE_PATH: str = os.path.join(FINAL_MODEL_DIR, MODEL_TRAINER_TRAIN_ROW_HASHES_FILE_NAME)
+MODEL_SERVING_DRIFT_WINDOW_SIZE: int = 10000 #most recent rows /drift compares against the reference sketch
+MODEL_SERVING_DRIFT_WINDOW_BUCKETS: int = 10 #the window slides by window_size / buckets rows at a time
+MODEL_SERVING_DRIFT_MIN_ROWS: int = 500 #rows needed in the window before drift is reported
+
+
 
-TRAINING_BUCKET_NAME = "networksecurity-saad"
\ No newline at end of file
+"""
+Prediction log related constant start with PREDICTION_LOG_VAR_NAME
+"""
+PREDICTION_LOG_DIR: str = "prediction_output"
+PREDICTION_LOG_S3_PREFIX: str = "prediction_output" #segments are uploaded to s3://TRAINING_BUCKET_NAME/<prefix>/<YYYYmmdd>/
+PREDICTION_LOG_MAX_SEGMENT_BYTES: int = 64 * 1024 * 1024 #uncompressed size at which the open segment is sealed and uploaded
+PREDICTION_LOG_MAX_SEGMENT_SECONDS: float = 60.0 #age at which a non-empty segment is sealed and uploaded
+PREDICTION_LOG_UPLOAD_RETRIES: int = 5 #attempts after the first failed upload, then the segment waits in pending/
+PREDICTION_LOG_RETRY_BACKOFF: float = 2.0 #seconds before the first retry, doubled on every retry
+PREDICTION_LOG_CLOSE_TIMEOUT: float = 10.0 #seconds shutdown waits for the last uploads, the rest is uploaded on next start
\ No newline at end of file
@@ -17,8 +17,11 @@ class DataValidationArtifact:
 @dataclass
 class DataTransformationArtifact:
     transformed_object_file_path: str
-    transformed_train_file_path: str
+    transformed_train_file_path: str #input features
     transformed_test_file_path: str
+    transformed_train_label_file_path: str
+    transformed_test_label_file_path: str
+    reference_sketch_file_path: str #histograms of the raw training inputs, see utils.drift
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -26,8 +29,55 @@ class ClassificationMetricArtifact:
     precision_score: float
     recall_score: float
     
+@dataclass
+class ModelSearchArtifact:
+    strategy: str
+    best_params: dict
+    cv_score: float #mean cross-validated accuracy of best_params, None when the search was skipped
+    n_candidates: int #parameter combinations in the grid
+    n_fits: int #fits actually run, halving and early stopping run fewer than n_candidates x folds
+    seconds: float #search and refit wall-clock time
+    budget_exhausted: bool #the time budget cut the search short
+    skipped: bool = False #no candidate was scored within the time budget, no model was fitted
+
+@dataclass
+class S3SyncArtifact:
+    source: str
+    destination: str
+    files_transferred: int
+    files_skipped: int #already on the other side with the same size and checksum
+    bytes_transferred: int
+    seconds: float
+    errors: list #"<file>: <error>" for every file that could not be transferred
+
 @dataclass
 class ModelTrainerArtifact:
     trained_model_file_path: str
     train_metric_artifact: ClassificationMetricArtifact #this will contain f1_score, precision_score, recall_score
-    test_metric_artifact: ClassificationMetricArtifact
\ No newline at end of file
+    test_metric_artifact: ClassificationMetricArtifact
+    reference_sketch_file_path: str = None #copy of the training input sketch served with the model
+    train_row_hashes_file_path: str = None #hashes of the rows the model was trained on
+    training_mode: str = 'full' #"full" or "incremental"
+    new_rows: int = None #incremental: training rows the previous final model had not seen
+    promoted: bool = True #the model replaced final_model; a continued model that scored worse is not promoted
+    previous_test_metric_artifact: ClassificationMetricArtifact = None #incremental: previous final model on the same test set
+
+@dataclass
+class LoadedModelArtifact:
+    model: object #NetworkModel currently being served
+    version: str #short content hash of the model file
+    file_hash: str
+    model_file_path: str
+    loaded_at: str
+    mtime_ns: int
+    size: int
+
+
+@dataclass
+class BatchPredictionArtifact:
+    output_dir: str
+    manifest_file_path: str
+    total_shards: int
+    completed_shards: int
+    total_rows: int
+    worker_rows_per_second: dict #worker pid -> rows scored per second
@@ -11,7 +11,7 @@ print(training_pipeline.ARTIFACT_DIR)
 print(training_pipeline.DATA_INGESTION_DATABASE_NAME)
 
 class TrainingPipelineConfig():
-    def __init__(self, timestamp=datetime.now()):
+    def __init__(self, timestamp=None):
         '''
             Initializes the pipeline name and full timestamped artifacts directory.
             
@@ -21,7 +21,8 @@ class TrainingPipelineConfig():
 
             #Output path: Artifacts/'%m_%d_%Y_%H_%M_%S'
         '''
-        timestamp = timestamp.strftime('%m_%d_%Y_%H_%M_%S')
+        #Default is resolved per instance, a datetime.now() default argument is evaluated only once at import
+        timestamp = (timestamp or datetime.now()).strftime('%m_%d_%Y_%H_%M_%S')
         self.pipeline_name = training_pipeline.PIPELINE_NAME
         self.artifact_name = training_pipeline.ARTIFACT_DIR
         self.artifact_dir = os.path.join(self.artifact_name,timestamp)
@@ -54,11 +55,28 @@ class DataIngestionConfig():
         
         #Setting train_test split
         self.train_test_split_ratio: float = training_pipeline.DATA_INGESTION_TRAIN_TEST_SPLIT_RATION
+        self.split_random_state: int = training_pipeline.DATA_INGESTION_SPLIT_RANDOM_STATE
         
         #Setting MongoDB database and collection names
         self.collection_name: str = training_pipeline.DATA_INGESTION_COLLECTION_NAME
         self.database_name: str = training_pipeline.DATA_INGESTION_DATABASE_NAME
 
+        #Setting streaming export
+        self.mongo_batch_size: int = training_pipeline.DATA_INGESTION_MONGO_BATCH_SIZE
+        self.export_chunk_size: int = training_pipeline.DATA_INGESTION_EXPORT_CHUNK_SIZE
+        self.row_limit: int = training_pipeline.DATA_INGESTION_ROW_LIMIT
+        self.sample_size: int = training_pipeline.DATA_INGESTION_SAMPLE_SIZE
+
+        #Setting incremental ingestion into the local columnar store
+        self.incremental_mode: str = training_pipeline.DATA_INGESTION_INCREMENTAL_MODE
+        self.incremental_store_dir: str = training_pipeline.DATA_INGESTION_INCREMENTAL_STORE_DIR
+
+        #Setting the export benchmark report
+        self.export_benchmark_file_path: str = os.path.join(
+                self.data_ingestion_dir, training_pipeline.DATA_INGESTION_EXPORT_BENCHMARK_DIR,
+                training_pipeline.DATA_INGESTION_EXPORT_BENCHMARK_FILE_NAME
+            )
+
 class DataValidationConfig():
     def __init__(self, training_pipeline_config:TrainingPipelineConfig):
         self.data_validation_dir: str = os.path.join(training_pipeline_config.artifact_dir,training_pipeline.DATA_VALIDATION_DIR_NAME)
@@ -73,6 +91,11 @@ class DataValidationConfig():
             training_pipeline.DATA_VALIDATION_DRIFT_REPORT_DIR,
             training_pipeline.DATA_VALIDATION_DRIFT_REPORT_FILE_NAME,
         )
+        self.drift_test: str = training_pipeline.DATA_VALIDATION_DRIFT_TEST
+        self.drift_threshold: float = training_pipeline.DATA_VALIDATION_DRIFT_THRESHOLDS[self.drift_test]
+        self.drift_max_bins: int = training_pipeline.DATA_VALIDATION_DRIFT_MAX_BINS
+        self.drift_n_jobs: int = training_pipeline.DATA_VALIDATION_DRIFT_N_JOBS
+        self.drift_column_block_size: int = training_pipeline.DATA_VALIDATION_DRIFT_COLUMN_BLOCK_SIZE
 
 class DataTransformationConfig:
      def __init__(self,training_pipeline_config:TrainingPipelineConfig):
@@ -81,8 +104,17 @@ class DataTransformationConfig:
             training_pipeline.DATA_TRANSFORMATION_TRAIN_FILE_PATH)
         self.transformed_test_file_path: str = os.path.join(self.data_transformation_dir,  training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
             training_pipeline.DATA_TRANSFORMATION_TEST_FILE_PATH)
+        self.transformed_train_label_file_path: str = os.path.join(self.data_transformation_dir,training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+            training_pipeline.DATA_TRANSFORMATION_TRAIN_LABEL_FILE_PATH)
+        self.transformed_test_label_file_path: str = os.path.join(self.data_transformation_dir,training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+            training_pipeline.DATA_TRANSFORMATION_TEST_LABEL_FILE_PATH)
         self.transformed_object_file_path: str = os.path.join(self.data_transformation_dir, training_pipeline.DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
             training_pipeline.PREPROCESSING_OBJECT_FILE_NAME,)
+        self.imputer_report_file_path: str = os.path.join(self.data_transformation_dir,
+            training_pipeline.DATA_TRANSFORMATION_IMPUTER_REPORT_FILE_NAME)
+        self.reference_sketch_file_path: str = os.path.join(self.data_transformation_dir,
+            training_pipeline.REFERENCE_SKETCH_FILE_NAME)
+        self.drift_max_bins: int = training_pipeline.DATA_VALIDATION_DRIFT_MAX_BINS
         
 class ModelTrainerConfig:
     def __init__(self,training_pipeline_config:TrainingPipelineConfig):
@@ -91,8 +123,27 @@ class ModelTrainerConfig:
             self.model_trainer_dir, training_pipeline.MODEL_TRAINER_TRAINED_MODEL_DIR, 
             training_pipeline.MODEL_FILE_NAME
         )
+        self.reference_sketch_file_path: str = os.path.join(
+            self.model_trainer_dir, training_pipeline.MODEL_TRAINER_TRAINED_MODEL_DIR,
+            training_pipeline.REFERENCE_SKETCH_FILE_NAME
+        )
         self.expected_accuracy: float = training_pipeline.MODEL_TRAINER_EXPECTED_SCORE
         self.overfitting_underfitting_threshold = training_pipeline.MODEL_TRAINER_OVER_FIITING_UNDER_FITTING_THRESHOLD
+        self.array_mmap_mode = training_pipeline.MODEL_TRAINER_ARRAY_MMAP_MODE
+        self.search_params: dict = dict(training_pipeline.MODEL_TRAINER_SEARCH_PARAMS)
+        self.search_baseline_strategy: str = training_pipeline.MODEL_TRAINER_SEARCH_BASELINE_STRATEGY
+        self.screening_params: dict = dict(training_pipeline.MODEL_TRAINER_SCREENING_PARAMS or {})
+        self.search_report_file_path: str = os.path.join(self.model_trainer_dir, training_pipeline.MODEL_TRAINER_SEARCH_REPORT_FILE_NAME)
+        self.search_timeline_file_path: str = os.path.join(self.model_trainer_dir, training_pipeline.MODEL_TRAINER_SEARCH_TIMELINE_FILE_NAME)
+        self.cpu_budget: int = training_pipeline.MODEL_TRAINER_CPU_BUDGET
+        self.train_row_hashes_file_path: str = os.path.join(
+            self.model_trainer_dir, training_pipeline.MODEL_TRAINER_TRAINED_MODEL_DIR,
+            training_pipeline.MODEL_TRAINER_TRAIN_ROW_HASHES_FILE_NAME
+        )
+        self.training_mode: str = training_pipeline.MODEL_TRAINER_TRAINING_MODE
+        self.incremental_max_new_rows_share: float = training_pipeline.MODEL_TRAINER_INCREMENTAL_MAX_NEW_ROWS_SHARE
+        self.incremental_replay_ratio: float = training_pipeline.MODEL_TRAINER_INCREMENTAL_REPLAY_RATIO
+        self.incremental_min_improvement: float = training_pipeline.MODEL_TRAINER_INCREMENTAL_MIN_IMPROVEMENT
         #Lazy model creation = only instantized when variable is called avoiding unnecessary memory usage
         self.models = {
                     "Random Forest": lambda: RandomForestClassifier(verbose=1),
@@ -126,6 +177,25 @@ class ModelTrainerConfig:
                     'learning_rate':[.1,.01,.001],
                     'n_estimators': [8,16,32,64,128,256]
                 }
-            }                                                       
+            }
 
-                                                
\ No newline at end of file
+
+class BatchPredictionConfig:
+    def __init__(self, input_path:str=None, mongo_query:dict=None, output_dir:str=None, timestamp=None):
+        '''
+            Input is either a CSV/Parquet file, a directory or glob of them (input_path),
+            or a MongoDB query on the ingestion collection (mongo_query).
+
+            #Output path: batch_prediction/'%m_%d_%Y_%H_%M_%S'/part-xxxxx.{csv,parquet} and manifest.json
+        '''
+        timestamp = (timestamp or datetime.now()).strftime('%m_%d_%Y_%H_%M_%S')
+        self.input_path: str = input_path
+        self.mongo_query: dict = mongo_query
+        self.output_dir: str = output_dir or os.path.join(training_pipeline.BATCH_PREDICTION_DIR_NAME, timestamp)
+        self.manifest_file_path: str = os.path.join(self.output_dir, training_pipeline.BATCH_PREDICTION_MANIFEST_FILE_NAME)
+        self.model_file_path: str = training_pipeline.FINAL_MODEL_FILE_PATH
+        self.shard_size: int = training_pipeline.BATCH_PREDICTION_SHARD_SIZE
+        self.num_workers: int = training_pipeline.BATCH_PREDICTION_NUM_WORKERS
+        self.output_format: str = training_pipeline.BATCH_PREDICTION_OUTPUT_FORMAT
+        self.collection_name: str = training_pipeline.DATA_INGESTION_COLLECTION_NAME
+        self.database_name: str = training_pipeline.DATA_INGESTION_DATABASE_NAME
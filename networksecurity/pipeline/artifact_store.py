@@ -0,0 +1,300 @@
+import os, sys
+import json
+import shutil
+import stat
+from datetime import datetime
+try:
+    import fcntl
+except ImportError: #not on Windows, run files are hard linked there
+    fcntl = None
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import (
+    ARTIFACT_DIR,
+    ARTIFACT_STORE_DIR,
+    ARTIFACT_STORE_MANIFEST_FILE_NAME,
+    STAGE_CACHE_RUN_STATE_FILE_NAME,
+)
+from networksecurity.entity.artifact_entity import S3SyncArtifact
+from networksecurity.cloud.s3_syncer import S3Sync, parse_s3_url
+from networksecurity.pipeline.stage_cache import StageCache, hash_file
+
+#Name of the run directories TrainingPipelineConfig creates under ARTIFACT_DIR
+RUN_NAME_FORMAT = '%m_%d_%Y_%H_%M_%S'
+#Run files that change after the run's stages finished, they are uploaded as they are and not stored as blobs
+RUN_METADATA_FILE_NAMES = (ARTIFACT_STORE_MANIFEST_FILE_NAME, STAGE_CACHE_RUN_STATE_FILE_NAME)
+#ioctl cloning a file's extents (Linux FICLONE), supported by btrfs, XFS and other copy-on-write filesystems
+FICLONE = 0x40049409
+
+
+def _share_file(source:str, destination:str)->str:
+    '''
+        Replaces destination with a file holding the content of source without storing it twice: a reflink
+        (shared extents, copied on write) where the filesystem supports it, otherwise a hard link, and a plain
+        copy only across filesystems. Atomic: a reader sees the old file or the complete new one.
+        Returns how destination was written: 'reflink', 'link' or 'copy'.
+    '''
+    tmp_path = f'{destination}.tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        with open(source, 'rb') as source_file, open(tmp_path, 'wb') as tmp_file:
+            if fcntl is None:
+                raise OSError('reflink not supported')
+            fcntl.ioctl(tmp_file.fileno(), FICLONE, source_file.fileno())
+        method = 'reflink'
+    except OSError:
+        os.remove(tmp_path)
+        try:
+            os.link(source, tmp_path)
+            method = 'link'
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+            method = 'copy'
+    os.replace(tmp_path, destination)
+    return method
+
+
+class ArtifactStore:
+    '''
+        Content-addressed store for the files of training runs. When a stage finishes, every new file of the run
+        directory is hashed and stored once as blobs/<sha256[:2]>/<sha256> and the run gets a manifest.json of
+        path -> sha256, size and mtime. The run file and its blob then share their data: a reflink on copy-on-write
+        filesystems, otherwise a hard link made read-only, so a run identical to an earlier one takes no extra
+        space. Stored run files must not be written in place; detach() gives a stage that runs again private
+        copies to write to. A reused blob is checked against its sha256 first. push() uploads only the blobs S3
+        does not have yet, gc() keeps the latest runs, the runs they took cached stages from and the blobs all of
+        those use.
+    '''
+    def __init__(self, store_dir:str=ARTIFACT_STORE_DIR, artifact_dir:str=ARTIFACT_DIR):
+        try:
+            self.store_dir = store_dir
+            self.artifact_dir = artifact_dir
+            #Blobs whose content was checked against their digest by this instance
+            self._verified = set()
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def blob_path(self, digest:str)->str:
+        return os.path.join(self.store_dir, digest[:2], digest)
+
+    @staticmethod
+    def manifest_path(run_dir:str)->str:
+        return os.path.join(run_dir, ARTIFACT_STORE_MANIFEST_FILE_NAME)
+
+    def load_manifest(self, run_dir:str)->dict:
+        try:
+            with open(self.manifest_path(run_dir)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {'files': {}}
+
+    def blob_is_valid(self, digest:str)->bool:
+        '''
+            Whether the blob exists and still hashes to its digest (checked once per blob and instance).
+        '''
+        blob_path = self.blob_path(digest)
+        if digest not in self._verified:
+            if not os.path.exists(blob_path) or hash_file(blob_path) != digest:
+                return False
+            self._verified.add(digest)
+        return True
+
+    def put(self, file_path:str)->tuple:
+        '''
+            Stores the file's content as a blob unless a valid blob has it already, then makes the file share its
+            data with the blob. Returns (sha256, whether the blob was written). A blob that no longer matches
+            its digest is written again from the file.
+        '''
+        digest = hash_file(file_path)
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path) and os.path.samefile(file_path, blob_path):
+            return digest, False
+        created = not self.blob_is_valid(digest)
+        if created:
+            if os.path.exists(blob_path):
+                logging.warning(f'Artifact store: blob {digest} does not match its digest, storing it again')
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            _share_file(file_path, blob_path)
+            self._verified.add(digest)
+        else:
+            _share_file(blob_path, file_path)
+        #Read-only for the blob and, when they are hard linked, for the run file too
+        os.chmod(blob_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        return digest, created
+
+    def commit(self, run_dir:str)->dict:
+        '''
+            Stores every file of run_dir not stored yet and rewrites its manifest. Files with the size and mtime
+            their manifest entry recorded are not hashed again. Returns the manifest.
+        '''
+        try:
+            manifest = self.load_manifest(run_dir)
+            files, new_files, new_bytes = {}, 0, 0
+            for directory, _, file_names in os.walk(run_dir):
+                for file_name in sorted(file_names):
+                    file_path = os.path.join(directory, file_name)
+                    name = os.path.relpath(file_path, run_dir).replace(os.sep, '/')
+                    if name in RUN_METADATA_FILE_NAMES or file_name.endswith('.tmp'):
+                        continue
+                    entry = manifest['files'].get(name)
+                    file_stat = os.stat(file_path)
+                    if entry is not None and (entry['size'], entry.get('mtime_ns')) == (file_stat.st_size, file_stat.st_mtime_ns) \
+                            and os.path.exists(self.blob_path(entry['sha256'])):
+                        files[name] = entry
+                        continue
+                    digest, created = self.put(file_path)
+                    file_stat = os.stat(file_path)
+                    files[name] = {'sha256': digest, 'size': file_stat.st_size, 'mtime_ns': file_stat.st_mtime_ns}
+                    if created:
+                        new_files += 1
+                        new_bytes += files[name]['size']
+
+            manifest = {'run': os.path.basename(os.path.normpath(run_dir)), 'files': files}
+            manifest_path = self.manifest_path(run_dir)
+            tmp_path = f'{manifest_path}.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(manifest, file, indent=2)
+            os.replace(tmp_path, manifest_path)
+            total_bytes = sum(entry['size'] for entry in files.values())
+            logging.info(f'Artifact store: {run_dir} has {len(files)} files ({total_bytes} bytes), '
+                         f'{new_files} new blobs ({new_bytes} bytes)')
+            return manifest
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    @staticmethod
+    def detach(run_dir:str, file_paths:list)->None:
+        '''
+            Before a stage of run_dir runs again: replaces the stored files (links to blobs) of the stage
+            directories its previous files were in by private, writable copies, so nothing the stage writes
+            again reaches a blob. Files of other runs (a stage taken from the stage cache) are left alone.
+        '''
+        run_dir = os.path.abspath(run_dir)
+        stage_dirs = set()
+        for file_path in file_paths:
+            relative_path = os.path.relpath(os.path.abspath(file_path), run_dir)
+            if not relative_path.startswith(os.pardir):
+                stage_dirs.add(os.path.join(run_dir, relative_path.split(os.sep)[0]))
+        for stage_dir in stage_dirs:
+            for directory, _, file_names in os.walk(stage_dir):
+                for file_name in file_names:
+                    file_path = os.path.join(directory, file_name)
+                    if os.stat(file_path).st_nlink > 1:
+                        tmp_path = f'{file_path}.tmp'
+                        shutil.copyfile(file_path, tmp_path)
+                        os.replace(tmp_path, file_path)
+
+    def push(self, run_dir:str, aws_bucket_url:str, s3_sync:S3Sync)->S3SyncArtifact:
+        '''
+            Uploads the run's blobs S3 does not have yet to <aws_bucket_url>/blobs/ and then its manifest and
+            run state to <aws_bucket_url>/runs/<run>/, so a run is listed only once all its blobs are there.
+        '''
+        try:
+            manifest = self.commit(run_dir)
+            bucket, prefix = parse_s3_url(aws_bucket_url)
+            remote_blobs = s3_sync.list_objects(bucket, f'{prefix}/blobs' if prefix else 'blobs')
+            digests = sorted({entry['sha256'] for entry in manifest['files'].values()})
+            missing = {f'blobs/{digest[:2]}/{digest}': self.blob_path(digest) for digest in digests
+                       if f'{digest[:2]}/{digest}' not in remote_blobs}
+            sync_artifact = s3_sync.upload_files(missing, aws_bucket_url, source=run_dir)
+            sync_artifact.files_skipped = len(digests) - len(missing)
+            if sync_artifact.errors:
+                return sync_artifact
+
+            run_name = manifest['run']
+            for file_name in RUN_METADATA_FILE_NAMES:
+                file_path = os.path.join(run_dir, file_name)
+                if os.path.exists(file_path):
+                    sync_artifact.bytes_transferred += s3_sync.upload_file(file_path, f'{aws_bucket_url}/runs/{run_name}/{file_name}')
+                    sync_artifact.files_transferred += 1
+            logging.info(f'Pushed run {run_name}: {len(missing)} new blobs, {sync_artifact.files_skipped} already in S3')
+            return sync_artifact
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def list_runs(self)->list:
+        '''
+            Returns the run directories under artifact_dir, oldest first.
+        '''
+        runs = []
+        for name in os.listdir(self.artifact_dir) if os.path.isdir(self.artifact_dir) else []:
+            try:
+                runs.append((datetime.strptime(name, RUN_NAME_FORMAT), os.path.join(self.artifact_dir, name)))
+            except ValueError:
+                continue
+        return [run_dir for _, run_dir in sorted(runs)]
+
+    @staticmethod
+    def referenced_files(run_dir:str)->list:
+        '''
+            Returns the files the run's stages use, from its run state: its own files and those of the earlier
+            runs it took cached stages from.
+        '''
+        try:
+            with open(os.path.join(run_dir, STAGE_CACHE_RUN_STATE_FILE_NAME)) as file:
+                stages = json.load(file).get('stages', {})
+        except FileNotFoundError:
+            return []
+        return [file_path for stage in stages.values() for file_path in stage.get('files', [])]
+
+    def gc(self, keep:int, stage_cache:StageCache=None)->dict:
+        '''
+            Deletes every run but the keep most recent ones and the runs they took cached stages from, then the
+            stage cache entries pointing into deleted runs and the blobs no remaining run uses.
+        '''
+        try:
+            if keep < 1:
+                raise ValueError('gc must keep at least the latest run')
+            runs = self.list_runs()
+            run_dirs = {os.path.abspath(run_dir): run_dir for run_dir in runs}
+            kept = set(runs[-keep:])
+            pending = list(kept)
+            while pending:
+                for file_path in self.referenced_files(pending.pop()):
+                    relative_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(self.artifact_dir))
+                    run_dir = run_dirs.get(os.path.abspath(os.path.join(self.artifact_dir, relative_path.split(os.sep)[0])))
+                    if run_dir is not None and run_dir not in kept:
+                        kept.add(run_dir)
+                        pending.append(run_dir)
+            removed_runs = [run_dir for run_dir in runs if run_dir not in kept]
+            for run_dir in removed_runs:
+                shutil.rmtree(run_dir)
+                logging.info(f'Artifact store gc: removed run {run_dir}')
+            removed_entries = (stage_cache or StageCache()).prune()
+
+            used = {entry['sha256'] for run_dir in kept
+                    for entry in self.load_manifest(run_dir)['files'].values()}
+            removed_blobs, freed_bytes = 0, 0
+            for directory, _, file_names in os.walk(self.store_dir):
+                for digest in file_names:
+                    if digest in used:
+                        continue
+                    blob_path = os.path.join(directory, digest)
+                    blob_stat = os.stat(blob_path)
+                    if blob_stat.st_nlink == 1: #otherwise a file outside the runs (e.g. final_model) still holds it
+                        freed_bytes += blob_stat.st_size
+                    os.remove(blob_path)
+                    removed_blobs += 1
+
+            report = {'runs_kept': len(kept), 'runs_removed': len(removed_runs),
+                      'blobs_kept': len(used), 'blobs_removed': removed_blobs, 'bytes_freed': freed_bytes,
+                      'stage_cache_entries_removed': removed_entries}
+            logging.info(f'Artifact store gc: {report}')
+            return report
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
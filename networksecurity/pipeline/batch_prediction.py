@@ -1,2 +1,318 @@
+import os, sys
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 
+import numpy as np
+import pandas as pd
+import pymongo
+import certifi
+from bson import ObjectId
+from dotenv import load_dotenv
 
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.entity.config_entity import BatchPredictionConfig
+from networksecurity.entity.artifact_entity import BatchPredictionArtifact
+from networksecurity.utils import model_bundle
+from networksecurity.utils.compiled_model import CompiledNetworkModel
+
+#Load env variables
+load_dotenv()
+MONGO_DB_URL=os.getenv('MONGO_DB_URL')
+
+INPUT_EXTENSIONS = ('.csv', '.parquet')
+
+#Set once per worker process by _init_worker so the model is loaded only once per worker
+_worker_model = None
+_worker_collection = None
+
+
+def _init_worker(model_file_path:str, database_name:str, collection_name:str, use_mongo:bool)->None:
+    global _worker_model, _worker_collection
+    _worker_model = CompiledNetworkModel.from_network_model(model_bundle.load_model(model_file_path))
+    if use_mongo:
+        mongo_client = pymongo.MongoClient(MONGO_DB_URL, tlsCAFile=certifi.where())
+        _worker_collection = mongo_client[database_name][collection_name]
+
+
+def _read_shard(shard:dict)->pd.DataFrame:
+    if shard['source'] == 'mongo':
+        id_range = {'$gte': ObjectId(shard['start_id'])}
+        if shard['end_id'] is not None:
+            id_range['$lt'] = ObjectId(shard['end_id'])
+        query = {'$and': [shard['query'], {'_id': id_range}]}
+        df = pd.DataFrame(list(_worker_collection.find(query).sort('_id', pymongo.ASCENDING)))
+        df.drop(columns='_id', inplace=True, errors='ignore')
+        df.replace('na', np.nan, inplace=True)
+        return df
+    if shard['path'].endswith('.parquet'):
+        return pd.read_parquet(shard['path'])
+    if shard['nrows'] is None:
+        return pd.read_csv(shard['path'])
+    #Row range of a large CSV: skip the data rows before this shard but keep the header
+    return pd.read_csv(shard['path'], skiprows=range(1, shard['skiprows'] + 1), nrows=shard['nrows'])
+
+
+def _score_shard(shard:dict, output_dir:str, output_format:str)->dict:
+    '''
+        Runs in a worker process: reads one shard, predicts it and writes its output partition.
+    '''
+    started = time.perf_counter()
+    df = _read_shard(shard)
+    feature_columns = list(getattr(_worker_model.preprocessor, 'feature_names_in_', df.columns))
+    df['predicted_column'] = _worker_model.predict(df[feature_columns]) if len(df) else []
+
+    output_path = os.path.join(output_dir, f"{shard['shard_id']}.{output_format}")
+    tmp_output_path = f'{output_path}.tmp'
+    if output_format == 'parquet':
+        df.to_parquet(tmp_output_path, index=False)
+    else:
+        df.to_csv(tmp_output_path, index=False)
+    #Only a fully written partition gets its final name, so resume never trusts a partial file
+    os.replace(tmp_output_path, output_path)
+
+    return {
+        'shard_id': shard['shard_id'],
+        'status': 'completed',
+        'rows': len(df),
+        'seconds': time.perf_counter() - started,
+        'worker_pid': os.getpid(),
+        'output_path': output_path,
+    }
+
+
+class BatchPredictionPipeline:
+    '''
+        Scores CSV/Parquet files or a MongoDB query offline with the final model.
+
+        The input is split into shards which are scored in a process pool (one model load per worker).
+        Each shard writes its own output partition and is recorded in manifest.json as it completes,
+        so a crashed run can be resumed from the shards that are not completed yet.
+    '''
+    def __init__(self, batch_prediction_config:BatchPredictionConfig):
+        try:
+            self.batch_prediction_config = batch_prediction_config
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def list_input_files(self)->list:
+        '''
+            Expands input_path (file, directory or glob) into the sorted list of CSV/Parquet files.
+        '''
+        try:
+            input_path = self.batch_prediction_config.input_path
+            if os.path.isdir(input_path):
+                paths = [os.path.join(input_path, name) for name in os.listdir(input_path)]
+            else:
+                paths = glob.glob(input_path)
+            files = sorted(path for path in paths if os.path.isfile(path) and path.endswith(INPUT_EXTENSIONS))
+            if not files:
+                raise Exception(f'No CSV or Parquet files found for input: {input_path}')
+            return files
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def plan_file_shards(self)->list:
+        '''
+            One shard per file; CSV files with more than shard_size rows are split into row ranges.
+        '''
+        try:
+            shard_size = self.batch_prediction_config.shard_size
+            shards = []
+            for path in self.list_input_files():
+                n_rows = None
+                if path.endswith('.csv'):
+                    with open(path, 'rb') as file_obj:
+                        n_rows = sum(chunk.count(b'\n') for chunk in iter(lambda: file_obj.read(1 << 20), b'')) - 1
+                if n_rows is None or n_rows <= shard_size:
+                    shards.append({'source': 'file', 'path': path, 'skiprows': 0, 'nrows': None})
+                    continue
+                for skiprows in range(0, n_rows, shard_size):
+                    shards.append({'source': 'file', 'path': path, 'skiprows': skiprows, 'nrows': shard_size})
+            return shards
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def plan_mongo_shards(self)->list:
+        '''
+            Splits the documents matching mongo_query into _id ranges of shard_size documents
+            using a single pass over the _id index.
+        '''
+        try:
+            config = self.batch_prediction_config
+            mongo_client = pymongo.MongoClient(MONGO_DB_URL, tlsCAFile=certifi.where())
+            collection = mongo_client[config.database_name][config.collection_name]
+
+            boundaries = []
+            cursor = collection.find(config.mongo_query, projection={'_id': 1}).sort('_id', pymongo.ASCENDING)
+            for index, document in enumerate(cursor):
+                if index % config.shard_size == 0:
+                    boundaries.append(str(document['_id']))
+            mongo_client.close()
+
+            return [
+                {'source': 'mongo', 'query': config.mongo_query, 'start_id': start_id,
+                 'end_id': boundaries[i + 1] if i + 1 < len(boundaries) else None}
+                for i, start_id in enumerate(boundaries)
+            ]
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def load_manifest(self, resume:bool, model_hash:str)->dict:
+        '''
+            Returns the manifest of a previous run in output_dir when resuming, otherwise a new one.
+        '''
+        try:
+            manifest_file_path = self.batch_prediction_config.manifest_file_path
+            if resume and os.path.exists(manifest_file_path):
+                with open(manifest_file_path, 'r') as file_obj:
+                    manifest = json.load(file_obj)
+                if manifest['model_hash'] != model_hash:
+                    raise Exception('The final model changed since this batch was started; '
+                                    'resuming would mix predictions from two models')
+                logging.info(f'Resuming batch prediction from {manifest_file_path}')
+                return manifest
+
+            return {
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'model_file_path': self.batch_prediction_config.model_file_path,
+                'model_hash': model_hash,
+                'output_format': self.batch_prediction_config.output_format,
+                'shards': {},
+                'workers': {},
+            }
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def write_manifest(self, manifest:dict)->None:
+        manifest_file_path = self.batch_prediction_config.manifest_file_path
+        tmp_file_path = f'{manifest_file_path}.tmp'
+        with open(tmp_file_path, 'w') as file_obj:
+            json.dump(manifest, file_obj, indent=2)
+        os.replace(tmp_file_path, manifest_file_path)
+
+    def run_pipeline(self, resume:bool=False)->BatchPredictionArtifact:
+        logging.info('Initiating batch prediction')
+        try:
+            config = self.batch_prediction_config
+            os.makedirs(config.output_dir, exist_ok=True)
+            model_hash = model_bundle.model_file_hash(config.model_file_path)
+
+            manifest = self.load_manifest(resume=resume, model_hash=model_hash)
+            if not manifest['shards']:
+                shards = self.plan_mongo_shards() if config.mongo_query is not None else self.plan_file_shards()
+                for shard_number, shard in enumerate(shards):
+                    shard_id = f'part-{shard_number:05d}'
+                    manifest['shards'][shard_id] = {**shard, 'shard_id': shard_id, 'status': 'pending'}
+                self.write_manifest(manifest)
+            output_format = manifest['output_format']
+
+            pending = [shard for shard in manifest['shards'].values()
+                       if shard['status'] != 'completed' or not os.path.exists(shard.get('output_path', ''))]
+            logging.info(f'{len(pending)} of {len(manifest["shards"])} shards to score '
+                         f'with {config.num_workers} workers')
+
+            if pending:
+                with ProcessPoolExecutor(max_workers=min(config.num_workers, len(pending)),
+                                         mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_init_worker,
+                                         initargs=(config.model_file_path, config.database_name,
+                                                   config.collection_name, config.mongo_query is not None)) as pool:
+                    futures = [pool.submit(_score_shard, shard, config.output_dir, output_format) for shard in pending]
+                    for future in as_completed(futures):
+                        result = future.result()
+                        manifest['shards'][result['shard_id']].update(result)
+                        #Record progress after every shard so a crash loses at most the shards in flight
+                        self.write_manifest(manifest)
+                        logging.info(f"Shard {result['shard_id']}: {result['rows']} rows in {result['seconds']:.2f}s "
+                                     f"(worker {result['worker_pid']})")
+
+            #Throughput per worker over the shards it scored in this and earlier attempts
+            workers = {}
+            for shard in manifest['shards'].values():
+                if shard['status'] == 'completed':
+                    worker = workers.setdefault(str(shard['worker_pid']), {'rows': 0, 'seconds': 0.0, 'shards': 0})
+                    worker['rows'] += shard['rows']
+                    worker['seconds'] += shard['seconds']
+                    worker['shards'] += 1
+            for worker_pid, worker in workers.items():
+                worker['rows_per_second'] = worker['rows'] / worker['seconds'] if worker['seconds'] else 0.0
+                logging.info(f"Worker {worker_pid}: {worker['rows_per_second']:.0f} rows/s over {worker['shards']} shards")
+            manifest['workers'] = workers
+            manifest['finished_at'] = datetime.now().isoformat(timespec='seconds')
+            self.write_manifest(manifest)
+
+            completed = [shard for shard in manifest['shards'].values() if shard['status'] == 'completed']
+            batch_prediction_artifact = BatchPredictionArtifact(
+                output_dir=config.output_dir,
+                manifest_file_path=config.manifest_file_path,
+                total_shards=len(manifest['shards']),
+                completed_shards=len(completed),
+                total_rows=sum(shard['rows'] for shard in completed),
+                worker_rows_per_second={pid: worker['rows_per_second'] for pid, worker in workers.items()}
+            )
+            logging.info('Batch prediction completed and artifact generated!')
+            logging.info(batch_prediction_artifact)
+            return batch_prediction_artifact
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score CSV/Parquet files or a MongoDB query with the final model.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help='CSV/Parquet file, directory or glob pattern (quote it)')
+    source.add_argument('--mongo-query', help='JSON query on the NetworkData collection, e.g. "{}"')
+    parser.add_argument('--output-dir', help='Output directory; pass a previous run\'s directory with --resume')
+    parser.add_argument('--resume', action='store_true', help='Continue from the shards completed in --output-dir')
+    parser.add_argument('--workers', type=int, help='Number of worker processes')
+    parser.add_argument('--shard-size', type=int, help='Rows per shard for large CSV files and MongoDB queries')
+    parser.add_argument('--format', choices=['csv', 'parquet'], help='Output partition format')
+    args = parser.parse_args()
+    if args.resume and not args.output_dir:
+        #Without it a new timestamped directory is created and there is nothing to resume
+        parser.error('--resume requires --output-dir (the directory of the run to continue)')
+
+    try:
+        batch_prediction_config = BatchPredictionConfig(
+            input_path=args.input,
+            mongo_query=json.loads(args.mongo_query) if args.mongo_query is not None else None,
+            output_dir=args.output_dir
+        )
+        if args.workers:
+            batch_prediction_config.num_workers = args.workers
+        if args.shard_size:
+            batch_prediction_config.shard_size = args.shard_size
+        if args.format:
+            batch_prediction_config.output_format = args.format
+
+        batch_prediction_artifact = BatchPredictionPipeline(batch_prediction_config).run_pipeline(resume=args.resume)
+        print(batch_prediction_artifact)
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
@@ -0,0 +1,181 @@
+import os, sys
+import json
+import hashlib
+from dataclasses import asdict
+
+import networksecurity
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import STAGE_CACHE_DIR, SCHEMA_FILE_PATH
+from networksecurity.entity.artifact_entity import (
+    DataIngestionArtifact,
+    DataValidationArtifact,
+    DataTransformationArtifact,
+    ModelTrainerArtifact,
+    ClassificationMetricArtifact,
+)
+
+PACKAGE_DIR = os.path.dirname(networksecurity.__file__)
+
+#Files whose content decides a stage's output besides its input data, relative to the package directory
+COMMON_SOURCE_FILES = [
+    os.path.join('constants', 'training_pipeline', '__init__.py'),
+    os.path.join('entity', 'config_entity.py'),
+    os.path.join('utils', 'main_utils.py'),
+]
+STAGE_SOURCE_FILES = {
+    'data_ingestion': [os.path.join('components', 'data_ingestion.py')],
+    'data_validation': [os.path.join('components', 'data_validation.py')],
+    'data_transformation': [os.path.join('components', 'data_transformation.py'), os.path.join('utils', 'imputer.py')],
+    'model_trainer': [os.path.join('components', 'model_trainer.py'), os.path.join('utils', 'ml_utils.py'),
+                      os.path.join('utils', 'model_search.py'), os.path.join('utils', 'fit_scheduler.py'),
+                      os.path.join('utils', 'incremental.py')],
+}
+STAGE_ARTIFACTS = {
+    'data_ingestion': DataIngestionArtifact,
+    'data_validation': DataValidationArtifact,
+    'data_transformation': DataTransformationArtifact,
+    'model_trainer': ModelTrainerArtifact,
+}
+
+
+def artifact_to_dict(artifact)->dict:
+    return asdict(artifact)
+
+
+def artifact_from_dict(stage:str, content:dict):
+    if stage == 'model_trainer':
+        content = dict(content,
+                       train_metric_artifact=ClassificationMetricArtifact(**content['train_metric_artifact']),
+                       test_metric_artifact=ClassificationMetricArtifact(**content['test_metric_artifact']))
+        if content.get('previous_test_metric_artifact'):
+            content['previous_test_metric_artifact'] = ClassificationMetricArtifact(**content['previous_test_metric_artifact'])
+    return STAGE_ARTIFACTS[stage](**content)
+
+
+def artifact_files(artifact)->list:
+    '''
+        Returns the existing files an artifact points to.
+    '''
+    return sorted(value for value in asdict(artifact).values() if isinstance(value, str) and os.path.isfile(value))
+
+
+def hash_file(file_path:str)->str:
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class StageCache:
+    '''
+        Maps a stage fingerprint to the artifact a previous run produced for it.
+
+        A stage's fingerprint is the sha256 of its upstream fingerprint (or, for data ingestion, of the source
+        collection), the source files and schema that define the stage, and any extra inputs passed in.
+        Entries are small JSON files under STAGE_CACHE_DIR/<stage>/ and point at the earlier run's artifact files,
+        which are checked to still exist with the same size before an entry is reused.
+    '''
+    def __init__(self, cache_dir:str=STAGE_CACHE_DIR, enabled:bool=True):
+        try:
+            self.cache_dir = cache_dir
+            self.enabled = enabled
+            self._source_hashes = {}
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def _source_hash(self, relative_path:str)->str:
+        if relative_path not in self._source_hashes:
+            file_path = relative_path if os.path.isabs(relative_path) else os.path.join(PACKAGE_DIR, relative_path)
+            self._source_hashes[relative_path] = hash_file(file_path) if os.path.exists(file_path) else 'missing'
+        return self._source_hashes[relative_path]
+
+    def fingerprint(self, stage:str, upstream:str, extra:dict=None)->str:
+        try:
+            sources = COMMON_SOURCE_FILES + STAGE_SOURCE_FILES.get(stage, [])
+            content = {
+                'stage': stage,
+                'upstream': upstream,
+                'sources': {path: self._source_hash(path) for path in sources},
+                'schema': self._source_hash(os.path.abspath(SCHEMA_FILE_PATH)),
+                'extra': extra or {},
+            }
+            return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def _entry_path(self, stage:str, fingerprint:str)->str:
+        return os.path.join(self.cache_dir, stage, f'{fingerprint}.json')
+
+    def load(self, stage:str, fingerprint:str):
+        '''
+            Returns the cached artifact for the fingerprint, or None if caching is disabled, there is no entry
+            or any of its files changed or disappeared.
+        '''
+        if not self.enabled:
+            return None
+        entry_path = self._entry_path(stage, fingerprint)
+        try:
+            with open(entry_path) as file:
+                entry = json.load(file)
+            for file_path, size in entry['files'].items():
+                if not os.path.isfile(file_path) or os.path.getsize(file_path) != size:
+                    logging.info(f'Stage cache entry for {stage} is stale, {file_path} changed')
+                    return None
+            logging.info(f'Reusing {stage} artifact from run {entry["run"]} (fingerprint {fingerprint[:12]})')
+            return artifact_from_dict(stage, entry['artifact'])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f'Ignoring unreadable stage cache entry {entry_path}: {e}')
+            return None
+
+    def save(self, stage:str, fingerprint:str, artifact, run:str)->None:
+        try:
+            entry = {
+                'stage': stage,
+                'fingerprint': fingerprint,
+                'run': run,
+                'artifact': artifact_to_dict(artifact),
+                'files': {file_path: os.path.getsize(file_path) for file_path in artifact_files(artifact)},
+            }
+            entry_path = self._entry_path(stage, fingerprint)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            tmp_path = f'{entry_path}.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(entry, file, indent=2)
+            os.replace(tmp_path, entry_path)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def prune(self)->int:
+        '''
+            Deletes the entries whose files are gone (e.g. their run was garbage collected). Returns how many.
+        '''
+        removed = 0
+        for stage in STAGE_ARTIFACTS:
+            stage_dir = os.path.join(self.cache_dir, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for file_name in os.listdir(stage_dir):
+                entry_path = os.path.join(stage_dir, file_name)
+                try:
+                    with open(entry_path) as file:
+                        files = json.load(file)['files']
+                except Exception:
+                    continue
+                if not all(os.path.isfile(file_path) for file_path in files):
+                    os.remove(entry_path)
+                    removed += 1
+        return removed
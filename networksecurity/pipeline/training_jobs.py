@@ -0,0 +1,286 @@
+import os, sys
+import json
+import uuid
+import fcntl
+import signal
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import (
+    TRAINING_PIPELINE_STAGES,
+    TRAINING_JOB_DIR,
+    TRAINING_JOB_LOCK_FILE_NAME,
+    TRAINING_JOB_NICENESS,
+    TRAINING_JOB_START_TIMEOUT,
+)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _now()->str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _read_job(job_file_path:str)->dict:
+    with open(job_file_path, 'r') as file_obj:
+        return json.load(file_obj)
+
+
+def _write_job(job_file_path:str, job:dict)->None:
+    #Job files are read by every API worker, so replace them atomically
+    tmp_file_path = f'{job_file_path}.tmp'
+    with open(tmp_file_path, 'w') as file_obj:
+        json.dump(job, file_obj, indent=2)
+    os.replace(tmp_file_path, job_file_path)
+
+
+@contextmanager
+def _job_lock(job_file_path:str):
+    '''
+        Exclusive flock on the job's lock file. Every read-modify-write of a job file holds it, so the
+        worker's queued -> running transition and cancel() cannot both win.
+    '''
+    with open(f'{job_file_path}.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _update_job(job_file_path:str, expected:tuple=None, **changes)->tuple:
+    '''
+        Compare-and-set of a job file: applies changes only if the job's status is in expected (any status when
+        expected is None). Returns (job, whether the changes were applied).
+    '''
+    with _job_lock(job_file_path):
+        job = _read_job(job_file_path)
+        if expected is not None and job['status'] not in expected:
+            return job, False
+        job.update(changes)
+        _write_job(job_file_path, job)
+        return job, True
+
+
+def _pid_alive(pid)->bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def run_training_job(job_id:str, job_dir:str=TRAINING_JOB_DIR)->None:
+    '''
+        Entry point of the training worker process. Holds the single-flight lock for the whole run
+        and records stage-level progress in the job file.
+    '''
+    #Imported here so the API process does not pay for the training imports
+    from networksecurity.pipeline.training_pipeline import TrainingPipeline
+
+    job_file_path = os.path.join(job_dir, f'{job_id}.json')
+    #Own session and process group, so cancel() can stop the worker together with its loky/joblib workers
+    os.setsid()
+    lock_file = open(os.path.join(job_dir, TRAINING_JOB_LOCK_FILE_NAME), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        _update_job(job_file_path, expected=('queued',), status='cancelled', finished_at=_now(),
+                    error='Another training run is already in progress')
+        lock_file.close()
+        return
+
+    job, started = _update_job(job_file_path, expected=('queued',), status='running', started_at=_now(), pid=os.getpid())
+    if not started:
+        #Cancelled while the worker process was starting
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+        return
+
+    try:
+        os.nice(TRAINING_JOB_NICENESS)
+    except OSError:
+        pass
+
+    def progress_callback(stage, status):
+        job['stages'][stage] = status
+        _, running = _update_job(job_file_path, expected=('running',), stages=job['stages'], current_stage=stage)
+        if not running:
+            raise Exception(f'Training job {job_id} was cancelled')
+        logging.info(f'Training job {job_id}: {stage} {status}')
+
+    try:
+        training_pipeline = TrainingPipeline()
+        _update_job(job_file_path, expected=('running',), artifact_dir=training_pipeline.training_pipeline_config.artifact_dir)
+        model_trainer_artifact = training_pipeline.run_pipeline(progress_callback=progress_callback)
+
+        _update_job(job_file_path, expected=('running',), status='succeeded', finished_at=_now(), current_stage=None,
+                    test_f1_score=float(model_trainer_artifact.test_metric_artifact.f1_score))
+
+    except Exception as e:
+        _update_job(job_file_path, expected=('running',), status='failed', finished_at=_now(), error=str(e))
+        raise
+
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+class TrainingJobManager:
+    '''
+        Submits training runs to a separate worker process and tracks them through job files in TRAINING_JOB_DIR.
+
+        Job files are the source of truth, so every API worker can report on and cancel any run.
+        Only one run is active at a time: submitting while a run is active returns the active job.
+    '''
+    def __init__(self, job_dir:str=TRAINING_JOB_DIR):
+        try:
+            self.job_dir = job_dir
+            os.makedirs(self.job_dir, exist_ok=True)
+            self.lock_file_path = os.path.join(self.job_dir, TRAINING_JOB_LOCK_FILE_NAME)
+            self._submit_lock = threading.Lock()
+            self._mp_context = multiprocessing.get_context('spawn')
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def _job_file_path(self, job_id:str)->str:
+        return os.path.join(self.job_dir, f'{job_id}.json')
+
+    @staticmethod
+    def _seconds_since(timestamp:str)->float:
+        return (datetime.now() - datetime.fromisoformat(timestamp)).total_seconds()
+
+    def _run_in_progress(self)->bool:
+        #The worker holds an exclusive flock for the whole run; if we can take it nothing is running
+        with open(self.lock_file_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return False
+
+    def list_jobs(self)->list:
+        '''
+            Returns all known jobs, newest first.
+        '''
+        try:
+            multiprocessing.active_children() #reap finished workers started by this process
+            jobs = []
+            for file_name in os.listdir(self.job_dir):
+                if file_name.endswith('.json'):
+                    jobs.append(self.get_job(file_name[:-len('.json')]))
+            return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def get_job(self, job_id:str)->dict:
+        '''
+            Returns the job record or None if the job does not exist.
+            A job whose worker died without reporting is marked as failed.
+        '''
+        try:
+            job_file_path = self._job_file_path(job_id)
+            if not os.path.exists(job_file_path):
+                return None
+            job = _read_job(job_file_path)
+            if job['status'] == 'running' and not _pid_alive(job.get('pid')):
+                job, _ = _update_job(job_file_path, expected=('running',), status='failed', finished_at=_now(),
+                                     error='Training worker exited unexpectedly')
+            elif job['status'] == 'queued' and self._seconds_since(job['created_at']) > TRAINING_JOB_START_TIMEOUT:
+                job, _ = _update_job(job_file_path, expected=('queued',), status='failed', finished_at=_now(),
+                                     error='Training worker did not start')
+            return job
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def submit(self)->tuple:
+        '''
+            Starts a training run unless one is already active.
+            Returns (job, created) where created is False when the active job was returned instead.
+        '''
+        try:
+            with self._submit_lock:
+                #Single-flight: a queued/running job or a held worker lock means a run is already active
+                active = [job for job in self.list_jobs() if job['status'] in ACTIVE_STATUSES]
+                if active:
+                    return active[0], False
+                if self._run_in_progress():
+                    raise Exception('A training worker holds the lock but no active job was found')
+
+                job_id = uuid.uuid4().hex[:12]
+                job = {
+                    'job_id': job_id,
+                    'status': 'queued',
+                    'created_at': _now(),
+                    'started_at': None,
+                    'finished_at': None,
+                    'pid': None,
+                    'current_stage': None,
+                    'stages': {stage: 'pending' for stage in TRAINING_PIPELINE_STAGES},
+                    'artifact_dir': None,
+                    'error': None,
+                }
+                _write_job(self._job_file_path(job_id), job)
+
+                process = self._mp_context.Process(target=run_training_job, args=(job_id, self.job_dir),
+                                                   name=f'training-{job_id}')
+                process.start()
+                logging.info(f'Started training job {job_id} in process {process.pid}')
+                return job, True
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def cancel(self, job_id:str)->dict:
+        '''
+            Stops a queued or running job. Finished jobs are returned unchanged.
+            A queued job's worker sees the cancellation when it tries to start and exits; a running worker
+            is sent SIGTERM with its whole process group.
+        '''
+        try:
+            job_file_path = self._job_file_path(job_id)
+            if not os.path.exists(job_file_path):
+                return None
+
+            with _job_lock(job_file_path):
+                job = _read_job(job_file_path)
+                if job['status'] not in ACTIVE_STATUSES:
+                    return job
+                if current_stage := job.get('current_stage'):
+                    job['stages'][current_stage] = 'cancelled'
+                job.update(status='cancelled', finished_at=_now())
+                _write_job(job_file_path, job)
+
+                if _pid_alive(job.get('pid')):
+                    try:
+                        os.killpg(job['pid'], signal.SIGTERM)
+                        logging.info(f'Sent SIGTERM to training job {job_id} (process group {job["pid"]})')
+                    except ProcessLookupError:
+                        pass
+            return job
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
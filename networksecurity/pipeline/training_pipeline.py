@@ -1,4 +1,8 @@
 import sys, os
+import glob
+import json
+import shutil
+from datetime import datetime
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
 
@@ -6,8 +10,13 @@ from networksecurity.components.data_ingestion import DataIngestion
 from networksecurity.components.data_validation import DataValidation
 from networksecurity.components.data_transformation import DataTransformation
 from networksecurity.components.model_trainer import ModelTrainer
-from networksecurity.constants.training_pipeline import TRAINING_BUCKET_NAME
+from networksecurity.constants.training_pipeline import TRAINING_BUCKET_NAME, ARTIFACT_DIR, FINAL_MODEL_FILE_PATH
+from networksecurity.constants.training_pipeline import FINAL_REFERENCE_SKETCH_FILE_PATH, FINAL_TRAIN_ROW_HASHES_FILE_PATH
+from networksecurity.constants.training_pipeline import STAGE_CACHE_RUN_STATE_FILE_NAME
 from networksecurity.cloud.s3_syncer import S3Sync
+from networksecurity.pipeline.stage_cache import StageCache, artifact_to_dict, artifact_from_dict, artifact_files, hash_file
+from networksecurity.pipeline.artifact_store import ArtifactStore
+from networksecurity.utils import model_bundle
 
 from networksecurity.entity.config_entity import (
     DataIngestionConfig, 
@@ -25,16 +34,111 @@ from networksecurity.entity.artifact_entity import (
 )
 
 
+TIMESTAMP_FORMAT = '%m_%d_%Y_%H_%M_%S'
+
+
 class TrainingPipeline:
-    def __init__(self):
-        self.training_pipeline_config = TrainingPipelineConfig()
+    '''
+        Runs the training stages, reusing a stage's artifact from an earlier run when its fingerprint matches
+        (see StageCache). With resume=True the latest failed run continues in its own artifact directory,
+        skipping the stages it already finished. Stage statuses are kept in the run's run_state.json.
+        Files of finished stages are kept in the ArtifactStore, so identical outputs of different runs are stored
+        and uploaded once.
+    '''
+    def __init__(self, use_cache:bool=True, resume:bool=False, row_limit:int=None, sample_size:int=None,
+                 incremental_mode:str=None, training_mode:str=None):
+        self.row_limit = row_limit
+        self.sample_size = sample_size
+        self.incremental_mode = incremental_mode
+        self.training_mode = training_mode
+        self.stage_cache = StageCache(enabled=use_cache)
+        self.run_state = self.find_failed_run() if resume else None
+        self.resuming = self.run_state is not None
+        if self.resuming:
+            timestamp = datetime.strptime(self.run_state['timestamp'], TIMESTAMP_FORMAT)
+            logging.info(f'Resuming failed run {self.run_state["timestamp"]}')
+        else:
+            if resume:
+                logging.info('No failed run to resume, starting a new run')
+            timestamp = None
+        self.training_pipeline_config = TrainingPipelineConfig(timestamp)
+        if not self.resuming:
+            self.run_state = {'timestamp': self.training_pipeline_config.timestamp, 'status': 'running', 'stages': {}}
+        self.run_state_file_path = os.path.join(self.training_pipeline_config.artifact_dir, STAGE_CACHE_RUN_STATE_FILE_NAME)
+        self.stage_status = {}
         self.s3_sync = S3Sync()
+        self.artifact_store = ArtifactStore()
+
+    @staticmethod
+    def find_failed_run()->dict:
+        '''
+            Returns the run state of the most recent run that failed, or None.
+        '''
+        run_state_files = glob.glob(os.path.join(ARTIFACT_DIR, '*', STAGE_CACHE_RUN_STATE_FILE_NAME))
+        for run_state_file in sorted(run_state_files, key=os.path.getmtime, reverse=True):
+            with open(run_state_file) as file:
+                run_state = json.load(file)
+            if run_state.get('status') == 'failed':
+                return run_state
+            if run_state.get('status') == 'completed':
+                return None #a later successful run supersedes older failures
+        return None
+
+    def save_run_state(self)->None:
+        os.makedirs(os.path.dirname(self.run_state_file_path), exist_ok=True)
+        tmp_path = f'{self.run_state_file_path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.run_state, file, indent=2)
+        os.replace(tmp_path, self.run_state_file_path)
+
+    def run_stage(self, stage:str, run_fn, get_upstream, get_extra=None):
+        '''
+            Returns the stage's artifact from the resumed run, the stage cache or by calling run_fn.
+            get_upstream returns what the stage's output depends on (upstream fingerprint or source summary)
+            and get_extra any other input; both are only called when the stage is not taken from the resumed run.
+        '''
+        previous = self.run_state['stages'].get(stage)
+        if self.resuming and previous and previous['status'] in ('completed', 'cached'):
+            artifact = artifact_from_dict(stage, previous['artifact'])
+            if all(os.path.isfile(file_path) for file_path in previous['files']):
+                logging.info(f'{stage} already finished in the resumed run')
+                self.stage_status[stage] = 'cached'
+                return artifact, previous['fingerprint']
+
+        fingerprint = self.stage_cache.fingerprint(stage, get_upstream(), get_extra() if get_extra else None)
+        artifact = self.stage_cache.load(stage, fingerprint)
+        if artifact is not None:
+            self.stage_status[stage] = 'cached'
+        else:
+            if previous:
+                #The stage writes its files of the resumed run again, they must not be written through to blobs
+                self.artifact_store.detach(self.training_pipeline_config.artifact_dir, previous.get('files', []))
+            artifact = run_fn()
+            self.artifact_store.commit(self.training_pipeline_config.artifact_dir)
+            self.stage_cache.save(stage, fingerprint, artifact, run=self.training_pipeline_config.timestamp)
+            self.stage_status[stage] = 'completed'
+
+        self.run_state['stages'][stage] = {
+            'status': self.stage_status[stage],
+            'fingerprint': fingerprint,
+            'artifact': artifact_to_dict(artifact),
+            'files': artifact_files(artifact),
+        }
+        self.save_run_state()
+        return artifact, fingerprint
 
     def start_data_ingestion(self):
         try:
             self.data_ingestion_config=DataIngestionConfig(training_pipeline_config=self.training_pipeline_config)
+            if self.row_limit is not None:
+                self.data_ingestion_config.row_limit = self.row_limit
+            if self.sample_size is not None:
+                self.data_ingestion_config.sample_size = self.sample_size
+            if self.incremental_mode is not None:
+                self.data_ingestion_config.incremental_mode = self.incremental_mode
             data_ingestion=DataIngestion(data_ingestion_config=self.data_ingestion_config)
-            data_ingestion_artifact=data_ingestion.initiate_data_ingestion()
+            data_ingestion_artifact, self.data_ingestion_fingerprint = self.run_stage(
+                'data_ingestion', data_ingestion.initiate_data_ingestion, data_ingestion.get_collection_fingerprint)
             return data_ingestion_artifact
         
         except Exception as e:
@@ -46,7 +150,8 @@ class TrainingPipeline:
         try:
             data_validation_config=DataValidationConfig(training_pipeline_config=self.training_pipeline_config)
             data_validation=DataValidation(data_ingestion_artifact=data_ingestion_artifact,data_validation_config=data_validation_config)
-            data_validation_artifact=data_validation.initiate_data_validation()
+            data_validation_artifact, self.data_validation_fingerprint = self.run_stage(
+                'data_validation', data_validation.initiate_data_validation, lambda: self.data_ingestion_fingerprint)
             return data_validation_artifact
         
         except Exception as e:
@@ -59,7 +164,8 @@ class TrainingPipeline:
             data_transformation_config = DataTransformationConfig(training_pipeline_config=self.training_pipeline_config)
             data_transformation = DataTransformation(data_validation_artifact=data_validation_artifact,
                                                     data_transformation_config=data_transformation_config)
-            data_transformation_artifact = data_transformation.initiate_data_transformation()
+            data_transformation_artifact, self.data_transformation_fingerprint = self.run_stage(
+                'data_transformation', data_transformation.initiate_data_transformation, lambda: self.data_validation_fingerprint)
             return data_transformation_artifact
         
         except Exception as e:
@@ -70,9 +176,15 @@ class TrainingPipeline:
     def start_model_trainer(self,data_transformation_artifact:DataTransformationArtifact)->ModelTrainerArtifact:
         try:
             self.model_trainer_config: ModelTrainerConfig = ModelTrainerConfig(training_pipeline_config=self.training_pipeline_config)
+            if self.training_mode is not None:
+                self.model_trainer_config.training_mode = self.training_mode
             model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
                                         model_trainer_config=self.model_trainer_config)
-            model_trainer_artifact = model_trainer.initiate_model_trainer()
+            model_trainer_artifact, _ = self.run_stage(
+                'model_trainer', model_trainer.initiate_model_trainer, lambda: self.data_transformation_fingerprint,
+                self.model_trainer_extra_inputs)
+            if self.stage_status['model_trainer'] == 'cached':
+                self.restore_final_model(model_trainer_artifact)
             return model_trainer_artifact
         
         except Exception as e:
@@ -80,12 +192,48 @@ class TrainingPipeline:
             logging.error(custom_err)
             raise custom_err
 
+    def model_trainer_extra_inputs(self)->dict:
+        '''
+            An incremental run continues the current final model, which is then an input of the stage.
+        '''
+        if self.model_trainer_config.training_mode != 'incremental':
+            return None
+        return {'training_mode': 'incremental',
+                'final_model': hash_file(FINAL_MODEL_FILE_PATH) if os.path.exists(FINAL_MODEL_FILE_PATH) else None}
+
+    def restore_final_model(self, model_trainer_artifact:ModelTrainerArtifact)->None:
+        '''
+            Points final_model at the cached trained model, its reference sketch and training row hashes, replacing
+            each file atomically only if it differs so serving workers do not reload an identical model.
+            A continued model that was not promoted is not restored.
+        '''
+        if not model_trainer_artifact.promoted:
+            return
+        restores = [(model_trainer_artifact.reference_sketch_file_path, FINAL_REFERENCE_SKETCH_FILE_PATH),
+                    (model_trainer_artifact.train_row_hashes_file_path, FINAL_TRAIN_ROW_HASHES_FILE_PATH)]
+        for source_file_path, final_file_path in restores:
+            if source_file_path is None or not os.path.exists(source_file_path):
+                continue
+            if os.path.exists(final_file_path) and hash_file(final_file_path) == hash_file(source_file_path):
+                continue
+            os.makedirs(os.path.dirname(final_file_path), exist_ok=True)
+            tmp_path = f'{final_file_path}.tmp'
+            shutil.copyfile(source_file_path, tmp_path)
+            os.replace(tmp_path, final_file_path)
+            logging.info(f'{final_file_path} restored from {source_file_path}')
+        #The model is restored last, serving workers reload when its manifest changes
+        model_bundle.copy_model_bundle(model_trainer_artifact.trained_model_file_path, FINAL_MODEL_FILE_PATH)
+
     ## local artifact is going to s3 bucket    
     def sync_artifact_dir_to_s3(self):
         try:
-            aws_bucket_url = f"s3://{TRAINING_BUCKET_NAME}/artifact/{self.training_pipeline_config.timestamp}"
-            self.s3_sync.sync_folder_to_s3(folder = self.training_pipeline_config.artifact_dir, aws_bucket_url=aws_bucket_url)
+            #Blobs under artifact/blobs/ are shared by every run, the run's manifest goes to artifact/runs/<timestamp>/
+            aws_bucket_url = f"s3://{TRAINING_BUCKET_NAME}/artifact"
+            sync_artifact = self.artifact_store.push(self.training_pipeline_config.artifact_dir, aws_bucket_url, self.s3_sync)
+            if sync_artifact.errors:
+                raise RuntimeError(f"{len(sync_artifact.errors)} files could not be synced to {aws_bucket_url}: {sync_artifact.errors[:5]}")
             logging.info(f"Artifact synced to s3 bucket: {aws_bucket_url}")
+            return sync_artifact
         
         except Exception as e:
             custom_err = CustomException(e, sys)
@@ -96,27 +244,65 @@ class TrainingPipeline:
     def sync_saved_model_dir_to_s3(self):
         try:
             aws_bucket_url = f"s3://{TRAINING_BUCKET_NAME}/final_model/{self.training_pipeline_config.timestamp}"
-            self.s3_sync.sync_folder_to_s3(folder = self.training_pipeline_config.model_dir, aws_bucket_url=aws_bucket_url)
+            sync_artifact = self.s3_sync.sync_folder_to_s3(folder = self.training_pipeline_config.model_dir, aws_bucket_url=aws_bucket_url)
+            if sync_artifact.errors:
+                raise RuntimeError(f"{len(sync_artifact.errors)} files could not be synced to {aws_bucket_url}: {sync_artifact.errors[:5]}")
             logging.info(f"Final model synced to s3 bucket: {aws_bucket_url}")
+            return sync_artifact
         
         except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
 
-    def run_pipeline(self):
+    def run_pipeline(self, progress_callback=None, sync_to_s3:bool=True):
+        '''
+            Runs every stage in order. progress_callback(stage, status) is called with status
+            'running', 'completed', 'cached' or 'failed' for each stage in TRAINING_PIPELINE_STAGES.
+        '''
+        stage = None
+        def report(status):
+            if progress_callback is not None:
+                progress_callback(stage, status)
         try:
+            stage = 'data_ingestion'
+            report('running')
             data_ingestion_artifact=self.start_data_ingestion()
+            report(self.stage_status[stage])
+
+            stage = 'data_validation'
+            report('running')
             data_validation_artifact=self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
+            report(self.stage_status[stage])
+
+            stage = 'data_transformation'
+            report('running')
             data_transformation_artifact=self.start_data_transformation(data_validation_artifact=data_validation_artifact)
+            report(self.stage_status[stage])
+
+            stage = 'model_trainer'
+            report('running')
             model_trainer_artifact=self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
+            report(self.stage_status[stage])
             
-            self.sync_artifact_dir_to_s3()
-            self.sync_saved_model_dir_to_s3()
-            
+            if sync_to_s3:
+                stage = 's3_sync'
+                report('running')
+                self.sync_artifact_dir_to_s3()
+                self.sync_saved_model_dir_to_s3()
+                self.run_state['stages'][stage] = {'status': 'completed'}
+                report('completed')
+
+            self.run_state['status'] = 'completed'
+            self.save_run_state()
             return model_trainer_artifact
 
         except Exception as e:
+            if stage is not None:
+                report('failed')
+                self.run_state['stages'][stage] = {'status': 'failed', 'error': str(e)}
+            self.run_state['status'] = 'failed'
+            self.save_run_state()
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
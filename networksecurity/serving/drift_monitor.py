@@ -0,0 +1,178 @@
+import os, sys
+import time
+import threading
+import numpy as np
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import (
+    FINAL_REFERENCE_SKETCH_FILE_PATH,
+    MODEL_SERVING_RELOAD_CHECK_INTERVAL,
+    MODEL_SERVING_DRIFT_WINDOW_SIZE,
+    MODEL_SERVING_DRIFT_WINDOW_BUCKETS,
+    MODEL_SERVING_DRIFT_MIN_ROWS,
+    DATA_VALIDATION_DRIFT_TEST,
+    DATA_VALIDATION_DRIFT_THRESHOLDS,
+)
+from networksecurity.serving.metrics import Histogram
+from networksecurity.utils import main_utils
+from networksecurity.utils import drift
+
+
+OBSERVE_LATENCY_BUCKETS = [0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01]
+
+
+class DriftMonitor:
+    '''
+        Compares the feature distribution of live prediction traffic with the reference sketch saved next to the
+        served model, using the same histogram statistics as DataValidation.detect_dataset_drift.
+
+        Rows are not kept: each observed row only increments the bin and missing-value counts of the current
+        bucket, O(columns) work whatever the window size. The window is n_buckets buckets of at least
+        window_size / n_buckets rows (a batch is never split); when the current bucket is full the oldest one
+        is cleared and reused, so the report covers about the most recent window_size rows.
+        The sketch is reloaded, and the window restarted, when its file changes with a new model.
+    '''
+    def __init__(self, sketch_file_path:str=FINAL_REFERENCE_SKETCH_FILE_PATH,
+                 window_size:int=MODEL_SERVING_DRIFT_WINDOW_SIZE, n_buckets:int=MODEL_SERVING_DRIFT_WINDOW_BUCKETS,
+                 min_rows:int=MODEL_SERVING_DRIFT_MIN_ROWS, test:str=DATA_VALIDATION_DRIFT_TEST,
+                 threshold:float=None, reload_check_interval:float=MODEL_SERVING_RELOAD_CHECK_INTERVAL):
+        try:
+            self.sketch_file_path = sketch_file_path
+            self.n_buckets = n_buckets
+            self.bucket_size = max(1, window_size // n_buckets)
+            self.min_rows = min_rows
+            self.test = test
+            self.threshold = DATA_VALIDATION_DRIFT_THRESHOLDS[test] if threshold is None else threshold
+            self.reload_check_interval = reload_check_interval
+            self.sketch = None
+            self._sketch_mtime_ns = None
+            self._last_check = 0.0
+            self._lock = threading.Lock()
+            self.observe_histogram = Histogram('drift_observe_seconds', OBSERVE_LATENCY_BUCKETS)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def _reset_window(self)->None:
+        n_columns, n_bins = len(self.sketch['columns']), self._bin_edges.shape[1] + 1
+        self._counts = np.zeros((self.n_buckets, n_columns, n_bins), dtype=np.int64)
+        self._missing = np.zeros((self.n_buckets, n_columns), dtype=np.int64)
+        self._rows = np.zeros(self.n_buckets, dtype=np.int64)
+        self._bucket = 0
+
+    def refresh(self)->bool:
+        '''
+            Loads the sketch if its file changed since the last check. Returns whether a sketch is loaded.
+            A missing or unreadable file keeps the current sketch.
+        '''
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                mtime_ns = os.stat(self.sketch_file_path).st_mtime_ns
+                if mtime_ns != self._sketch_mtime_ns:
+                    self.sketch = main_utils.read_yaml_file(self.sketch_file_path)
+                    self._bin_edges = drift.sketch_bin_edges(self.sketch)
+                    self._reference_counts = np.asarray(self.sketch['counts'], dtype=np.int64)
+                    self._sketch_mtime_ns = mtime_ns
+                    self._reset_window()
+                    logging.info(f'Drift monitor loaded reference sketch of {self.sketch["rows"]} rows')
+            except Exception as e:
+                if self.sketch is None:
+                    logging.warning(f'No reference sketch available at {self.sketch_file_path}: {e}')
+                else:
+                    logging.warning(f'Could not reload {self.sketch_file_path}, keeping the loaded sketch: {e}')
+            return self.sketch is not None
+
+    def _check_sketch(self)->bool:
+        if self.sketch is None or time.monotonic() - self._last_check >= self.reload_check_interval:
+            return self.refresh()
+        return True
+
+    def observe(self, values, columns:list=None)->None:
+        '''
+            Adds rows of features to the window: a dataframe, or a 2D array whose columns are named by columns
+            (the sketch's column order if not given). Features the sketch does not know are ignored and features
+            missing from the input count as missing values. Never raises, monitoring must not fail a prediction.
+        '''
+        started = time.perf_counter()
+        try:
+            if not self._check_sketch():
+                return
+            sketch_columns = self.sketch['columns']
+            if hasattr(values, 'columns'):
+                values = values.reindex(columns=sketch_columns).to_numpy(dtype=np.float64)
+            else:
+                values = np.asarray(values, dtype=np.float64)
+                if columns is not None and list(columns) != sketch_columns:
+                    positions = {column: index for index, column in enumerate(columns)}
+                    values = np.column_stack([values[:, positions[column]] if column in positions
+                                              else np.full(len(values), np.nan) for column in sketch_columns])
+            values = values.reshape(-1, len(sketch_columns))
+            counts = drift.column_histograms(values, self._bin_edges)
+            missing = np.isnan(values).sum(axis=0)
+
+            with self._lock:
+                if self._counts.shape[2] != counts.shape[1]:
+                    return #sketch was swapped while this batch was binned
+                if self._rows[self._bucket] >= self.bucket_size:
+                    self._bucket = (self._bucket + 1) % self.n_buckets
+                    self._counts[self._bucket] = 0
+                    self._missing[self._bucket] = 0
+                    self._rows[self._bucket] = 0
+                self._counts[self._bucket] += counts
+                self._missing[self._bucket] += missing
+                self._rows[self._bucket] += len(values)
+
+        except Exception as e:
+            logging.warning(f'Drift monitor could not observe a batch: {e}')
+        finally:
+            self.observe_histogram.observe(time.perf_counter() - started)
+
+    def report(self)->dict:
+        '''
+            Returns drift per column of the current window against the reference sketch, with the same
+            p-value / drift_status / test / statistic fields as the validation report plus missing-value rates.
+        '''
+        try:
+            if not self._check_sketch():
+                return {'available': False, 'sketch_file_path': self.sketch_file_path}
+            with self._lock:
+                window_counts = self._counts.sum(axis=0)
+                window_missing = self._missing.sum(axis=0)
+                window_rows = int(self._rows.sum())
+                sketch = self.sketch
+                reference_counts = self._reference_counts
+
+            scores, p_values = drift.drift_statistics(reference_counts, window_counts, test=self.test)
+            drifted = drift.is_drifted(scores, p_values, self.test, self.threshold)
+            enough_rows = window_rows >= self.min_rows
+            columns = {}
+            for index, column in enumerate(sketch['columns']):
+                columns[column] = {
+                    'p-value': float(p_values[index]),
+                    'drift_status': bool(drifted[index]) and enough_rows,
+                    'test': self.test,
+                    'statistic': float(scores[index]),
+                    'missing_rate': float(window_missing[index] / window_rows) if window_rows else None,
+                    'reference_missing_rate': float(sketch['missing_rates'][index]),
+                }
+            return {
+                'available': True,
+                'window_rows': window_rows,
+                'reference_rows': sketch['rows'],
+                'enough_rows': enough_rows,
+                'test': self.test,
+                'threshold': self.threshold,
+                'drift_detected': enough_rows and bool(drifted.any()),
+                'columns': columns,
+                'observe_seconds': self.observe_histogram.snapshot(),
+            }
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
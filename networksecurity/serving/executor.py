@@ -0,0 +1,119 @@
+import os, sys
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import (
+    MODEL_SERVING_THREAD_POOL_SIZE,
+    MODEL_SERVING_MAX_QUEUE_SIZE,
+)
+
+
+class ExecutorBusyError(Exception):
+    '''
+        Raised when the pool already has max_queue_size tasks running or waiting. The API turns this into a 429.
+    '''
+
+
+class BoundedPool:
+    '''
+        Wraps a concurrent.futures executor and rejects new work once too many tasks are in flight.
+    '''
+    def __init__(self, name:str, executor_factory, max_queue_size:int):
+        self.name = name
+        self.max_queue_size = max_queue_size
+        self._executor_factory = executor_factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        #Pools are created lazily so importing the app does not fork/spawn workers
+        if self._executor is None:
+            self._executor = self._executor_factory()
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._in_flight >= self.max_queue_size:
+                self.rejected += 1
+                raise ExecutorBusyError(f'{self.name} pool is full ({self._in_flight} tasks in flight)')
+            self._in_flight += 1
+            self.submitted += 1
+            executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def stats(self)->dict:
+        with self._lock:
+            return {
+                'queue_depth': self._in_flight,
+                'max_queue_size': self.max_queue_size,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self, wait:bool=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+class InferenceExecutor:
+    '''
+        Execution layer for the API: keeps blocking work off the asyncio event loop.
+
+        The thread pool runs CSV parsing, inference and I/O (pandas/numpy/sklearn release the GIL for most of
+        this work). Training runs in its own worker process (see TrainingJobManager). The pool is bounded and
+        raises ExecutorBusyError instead of queueing without limit.
+    '''
+    def __init__(self, max_threads:int=MODEL_SERVING_THREAD_POOL_SIZE,
+                 max_queue_size:int=MODEL_SERVING_MAX_QUEUE_SIZE):
+        try:
+            self.thread_pool = BoundedPool(
+                'thread',
+                partial(ThreadPoolExecutor, max_workers=max_threads, thread_name_prefix='inference'),
+                max_queue_size=max_queue_size
+            )
+            logging.info(f'Inference executor configured with {max_threads} threads, max queue size {max_queue_size}')
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    async def run_in_thread(self, fn, *args, **kwargs):
+        '''
+            Runs fn in the thread pool and awaits the result without blocking the event loop.
+        '''
+        return await asyncio.wrap_future(self.thread_pool.submit(fn, *args, **kwargs))
+
+    def stats(self)->dict:
+        return {'thread_pool': self.thread_pool.stats()}
+
+    def shutdown(self, wait:bool=True):
+        self.thread_pool.shutdown(wait=wait)
@@ -0,0 +1,37 @@
+import threading
+from bisect import bisect_left
+
+
+class Histogram:
+    '''
+        Thread-safe fixed-bucket histogram (cumulative counts per upper bound, like Prometheus).
+    '''
+    def __init__(self, name:str, buckets:list):
+        self.name = name
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1) #last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value:float)->None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self)->dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, buckets = 0, {}
+        for upper_bound, bucket_count in zip(self.buckets + ['+Inf'], counts):
+            cumulative += bucket_count
+            buckets[str(upper_bound)] = cumulative
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else None,
+            'buckets': buckets,
+        }
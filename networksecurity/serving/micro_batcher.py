@@ -0,0 +1,127 @@
+import sys
+import time
+import asyncio
+import numpy as np
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import (
+    MODEL_SERVING_MAX_BATCH_SIZE,
+    MODEL_SERVING_MAX_BATCH_WAIT_MS,
+    MODEL_SERVING_BATCH_QUEUE_SIZE,
+)
+from networksecurity.serving.executor import ExecutorBusyError
+from networksecurity.serving.metrics import Histogram
+
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+class MicroBatcher:
+    '''
+        Collects concurrent single-row prediction requests into one batch of up to max_batch_size rows,
+        waiting at most max_wait_ms after the first row arrives, and scores the stacked array with one call.
+
+        predict_fn takes a 2D numpy array and returns one prediction per row. run_fn is an async callable
+        used to run predict_fn off the event loop (e.g. InferenceExecutor.run_in_thread).
+    '''
+    def __init__(self, predict_fn, run_fn, max_batch_size:int=MODEL_SERVING_MAX_BATCH_SIZE,
+                 max_wait_ms:float=MODEL_SERVING_MAX_BATCH_WAIT_MS,
+                 max_queue_size:int=MODEL_SERVING_BATCH_QUEUE_SIZE):
+        try:
+            self.predict_fn = predict_fn
+            self.run_fn = run_fn
+            self.max_batch_size = max_batch_size
+            self.max_wait = max_wait_ms / 1000
+            self.max_queue_size = max_queue_size
+            self._queue: asyncio.Queue = None
+            self._task: asyncio.Task = None
+            self.latency_histogram = Histogram('predict_json_latency_seconds', LATENCY_BUCKETS)
+            self.batch_size_histogram = Histogram('predict_json_batch_size', BATCH_SIZE_BUCKETS)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def start(self)->None:
+        '''
+            Starts the collector task. Must be called from the running event loop (e.g. the app lifespan).
+        '''
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._collect_batches())
+        logging.info(f'Micro-batcher started with max_batch_size={self.max_batch_size}, '
+                     f'max_wait_ms={self.max_wait * 1000}')
+
+    async def stop(self)->None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, row:np.ndarray):
+        '''
+            Queues a single feature vector and waits for its prediction.
+        '''
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((row, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise ExecutorBusyError(f'Micro-batch queue is full ({self.max_queue_size} rows waiting)')
+        return await future
+
+    async def _next_batch(self)->list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            #Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _collect_batches(self)->None:
+        while True:
+            batch = await self._next_batch()
+            #Drop callers that went away while waiting
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+            self.batch_size_histogram.observe(len(batch))
+            try:
+                X = np.stack([row for row, _, _ in batch])
+                predictions = await self.run_fn(self.predict_fn, X)
+            except Exception as e:
+                logging.error(f'Micro-batch of {len(batch)} rows failed: {e}')
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            finished_at = time.perf_counter()
+            for (_, future, submitted_at), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+                self.latency_histogram.observe(finished_at - submitted_at)
+
+    def stats(self)->dict:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'latency_seconds': self.latency_histogram.snapshot(),
+            'batch_size': self.batch_size_histogram.snapshot(),
+        }
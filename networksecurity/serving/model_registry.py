@@ -0,0 +1,114 @@
+import os, sys
+import time
+import threading
+from datetime import datetime
+from dataclasses import replace
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import FINAL_MODEL_FILE_PATH, MODEL_SERVING_RELOAD_CHECK_INTERVAL
+from networksecurity.constants.training_pipeline import MODEL_SERVING_USE_COMPILED_MODEL
+from networksecurity.entity.artifact_entity import LoadedModelArtifact
+from networksecurity.utils import model_bundle
+from networksecurity.utils.compiled_model import CompiledNetworkModel
+
+
+class ModelRegistry:
+    '''
+        Keeps the NetworkModel loaded once per worker process and hot-swaps it when the model file changes.
+
+        The loaded model is held in a single LoadedModelArtifact reference which is replaced as a whole,
+        so a request that already called get_model() keeps using the old version until it finishes.
+    '''
+    def __init__(self, model_file_path:str=FINAL_MODEL_FILE_PATH,
+                 reload_check_interval:float=MODEL_SERVING_RELOAD_CHECK_INTERVAL,
+                 use_compiled_model:bool=MODEL_SERVING_USE_COMPILED_MODEL):
+        try:
+            self.model_file_path = model_file_path
+            self.reload_check_interval = reload_check_interval
+            self.use_compiled_model = use_compiled_model
+            self._loaded: LoadedModelArtifact = None
+            self._last_check = 0.0
+            self._lock = threading.Lock()
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def get_model(self)->LoadedModelArtifact:
+        '''
+            Returns the currently loaded model, checking the model file for changes at most once per reload_check_interval.
+        '''
+        try:
+            loaded = self._loaded
+            if loaded is None or time.monotonic() - self._last_check >= self.reload_check_interval:
+                loaded = self.refresh()
+            return loaded
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def refresh(self, force:bool=False)->LoadedModelArtifact:
+        '''
+            Reloads the model if the file's mtime/size changed and its content hash differs from the loaded version.
+            The file is the bundle manifest, whose hash covers every array, so a check reads a few kilobytes.
+            If the file cannot be read the previously loaded model keeps being served.
+        '''
+        with self._lock:
+            self._last_check = time.monotonic()
+            current = self._loaded
+            try:
+                stat = os.stat(self.model_file_path)
+                if not force and current is not None and (stat.st_mtime_ns, stat.st_size) == (current.mtime_ns, current.size):
+                    return current
+
+                model, file_hash = model_bundle.load_model_with_hash(self.model_file_path)
+                if not force and current is not None and file_hash == current.file_hash:
+                    #File was touched but content is unchanged, keep the loaded object
+                    self._loaded = replace(current, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                    return self._loaded
+
+                if self.use_compiled_model:
+                    #Compiled once per version, requests then share its lookup table
+                    model = CompiledNetworkModel.from_network_model(model)
+
+                self._loaded = LoadedModelArtifact(
+                    model=model,
+                    version=file_hash[:12],
+                    file_hash=file_hash,
+                    model_file_path=self.model_file_path,
+                    loaded_at=datetime.now().isoformat(timespec='seconds'),
+                    mtime_ns=stat.st_mtime_ns,
+                    size=stat.st_size
+                )
+                logging.info(f'Loaded model version {self._loaded.version} from {self.model_file_path}')
+                return self._loaded
+
+            except Exception as e:
+                if current is not None:
+                    logging.warning(f'Could not reload {self.model_file_path}, serving version {current.version}: {e}')
+                    return current
+                custom_err = CustomException(e, sys)
+                logging.error(custom_err)
+                raise custom_err
+
+    def status(self)->dict:
+        '''
+            Returns the version and load time of the model currently being served.
+        '''
+        loaded = self._loaded
+        if loaded is None:
+            return {'loaded': False, 'model_file_path': self.model_file_path}
+        return {
+            'loaded': True,
+            'model_file_path': loaded.model_file_path,
+            'version': loaded.version,
+            'file_hash': loaded.file_hash,
+            'loaded_at': loaded.loaded_at,
+            'model_type': getattr(loaded.model, 'model_type', None) or type(getattr(loaded.model, 'model', loaded.model)).__name__,
+            'compiled': getattr(loaded.model, 'compiled_model', None) is not None,
+        }
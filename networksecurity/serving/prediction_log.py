@@ -0,0 +1,269 @@
+import os, sys
+import gzip
+import time
+import uuid
+import queue
+import shutil
+import threading
+from datetime import datetime, timezone
+import pandas as pd
+try:
+    import fcntl
+except ImportError: #Windows: no cross-process lock, orphaned segments are recovered only when no other worker runs
+    fcntl = None
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import (
+    TRAINING_BUCKET_NAME,
+    PREDICTION_LOG_DIR,
+    PREDICTION_LOG_S3_PREFIX,
+    PREDICTION_LOG_MAX_SEGMENT_BYTES,
+    PREDICTION_LOG_MAX_SEGMENT_SECONDS,
+    PREDICTION_LOG_UPLOAD_RETRIES,
+    PREDICTION_LOG_RETRY_BACKOFF,
+    PREDICTION_LOG_CLOSE_TIMEOUT,
+)
+from networksecurity.cloud.s3_syncer import S3Sync
+
+SEGMENT_SUFFIX = '.jsonl'
+
+
+class _Segment:
+    def __init__(self, file_path:str):
+        self.file_path = file_path
+        self.file = open(file_path, 'ab')
+        if fcntl is not None:
+            #Held while the segment is open, so another worker's recovery never takes a live segment
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.opened = time.monotonic()
+        self.size = 0
+        self.rows = 0
+
+
+def _lock_orphan(file_path:str):
+    '''
+        Returns the segment opened and locked when no process holds it any more, None otherwise.
+    '''
+    try:
+        file = open(file_path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        #The owner may have sealed and removed it between open and lock
+        if os.fstat(file.fileno()).st_ino != os.stat(file_path).st_ino:
+            raise FileNotFoundError(file_path)
+        return file
+    except OSError:
+        file.close()
+        return None
+
+
+class PredictionLog:
+    '''
+        Write-ahead buffer for prediction outputs. append() adds the scored rows (JSON lines, with the request's
+        batch_id and predicted_at) to this process's open segment in wal/ and returns: no request waits for S3.
+        - a flusher thread seals the segment once it reaches max_segment_bytes or is max_segment_seconds old and
+          gzips it into pending/<YYYYmmdd>/
+        - an uploader thread sends sealed segments to s3://bucket_name/s3_prefix/<YYYYmmdd>/, retrying with
+          exponential backoff, and moves them to uploaded/
+        A segment is one object for every request of that period. Segments left in wal/ by a process that died,
+        and pending segments whose upload never succeeded, are sealed and uploaded again on start.
+    '''
+    def __init__(self, root_dir:str=PREDICTION_LOG_DIR, bucket_name:str=TRAINING_BUCKET_NAME,
+                 s3_prefix:str=PREDICTION_LOG_S3_PREFIX, max_segment_bytes:int=PREDICTION_LOG_MAX_SEGMENT_BYTES,
+                 max_segment_seconds:float=PREDICTION_LOG_MAX_SEGMENT_SECONDS,
+                 upload_retries:int=PREDICTION_LOG_UPLOAD_RETRIES, retry_backoff:float=PREDICTION_LOG_RETRY_BACKOFF,
+                 s3_sync:S3Sync=None):
+        try:
+            self.wal_dir = os.path.join(root_dir, 'wal')
+            self.pending_dir = os.path.join(root_dir, 'pending')
+            self.uploaded_dir = os.path.join(root_dir, 'uploaded')
+            self.bucket_name = bucket_name
+            self.s3_prefix = s3_prefix.strip('/')
+            self.max_segment_bytes = max_segment_bytes
+            self.max_segment_seconds = max_segment_seconds
+            self.upload_retries = upload_retries
+            self.retry_backoff = retry_backoff
+            self.s3_sync = s3_sync
+            self._segment: _Segment = None
+            self._lock = threading.Lock()
+            self._wake = threading.Event()
+            self._stop = threading.Event()
+            self._uploads = queue.Queue()
+            self._queued = set()
+            self._flusher = None
+            self._uploader = None
+            self.rows_appended = 0
+            self.segments_sealed = 0
+            self.segments_uploaded = 0
+            self.bytes_uploaded = 0
+            self.upload_failures = 0
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def start(self)->None:
+        '''
+            Recovers what earlier processes left behind and starts the flusher and uploader threads.
+        '''
+        for directory in (self.wal_dir, self.pending_dir, self.uploaded_dir):
+            os.makedirs(directory, exist_ok=True)
+        for file_name in sorted(os.listdir(self.wal_dir)):
+            if file_name.endswith(SEGMENT_SUFFIX):
+                file = _lock_orphan(os.path.join(self.wal_dir, file_name))
+                if file is not None:
+                    logging.info(f'Recovering prediction log segment {file_name} left by a stopped process')
+                    with file:
+                        self._compress(os.path.join(self.wal_dir, file_name))
+        self._queue_pending()
+        self._flusher = threading.Thread(target=self._flush_loop, name='prediction-log-flusher', daemon=True)
+        self._uploader = threading.Thread(target=self._upload_loop, name='prediction-log-uploader', daemon=True)
+        self._flusher.start()
+        self._uploader.start()
+        logging.info(f'Prediction log started in {os.path.dirname(self.wal_dir)}, uploading to '
+                     f's3://{self.bucket_name}/{self.s3_prefix}')
+
+    def append(self, df:pd.DataFrame, batch_id:str=None)->str:
+        '''
+            Appends the scored rows to the open segment and returns the batch_id they were recorded with.
+            Written to the OS before returning, so a crash of the process loses nothing.
+        '''
+        batch_id = batch_id or uuid.uuid4().hex
+        records = df.assign(batch_id=batch_id, predicted_at=datetime.now(timezone.utc).isoformat()) \
+            .to_json(orient='records', lines=True)
+        if not records:
+            return batch_id
+        data = (records if records.endswith('\n') else records + '\n').encode()
+        with self._lock:
+            if self._segment is None:
+                name = f'{datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")}-{uuid.uuid4().hex[:12]}{SEGMENT_SUFFIX}'
+                self._segment = _Segment(os.path.join(self.wal_dir, name))
+            self._segment.file.write(data)
+            self._segment.file.flush()
+            self._segment.size += len(data)
+            self._segment.rows += len(df)
+            self.rows_appended += len(df)
+            full = self._segment.size >= self.max_segment_bytes
+        if full:
+            self._wake.set()
+        return batch_id
+
+    def seal(self)->str:
+        '''
+            Closes the open segment, compresses it into pending/ and queues its upload. Returns the sealed file path.
+        '''
+        with self._lock:
+            segment, self._segment = self._segment, None
+        if segment is None:
+            return None
+        try:
+            #Still locked while compressing, so no other worker's recovery seals it as well
+            pending_path = self._compress(segment.file_path)
+        finally:
+            segment.file.close()
+        self.segments_sealed += 1
+        logging.info(f'Sealed prediction log segment {pending_path}: {segment.rows} rows, {segment.size} bytes')
+        self._queue_pending()
+        return pending_path
+
+    def _compress(self, wal_path:str)->str:
+        name = os.path.basename(wal_path)
+        pending_path = os.path.join(self.pending_dir, name[:8], f'{name}.gz')
+        if os.path.getsize(wal_path) == 0:
+            os.remove(wal_path)
+            return None
+        os.makedirs(os.path.dirname(pending_path), exist_ok=True)
+        tmp_path = f'{pending_path}.tmp'
+        with open(wal_path, 'rb') as source, gzip.open(tmp_path, 'wb') as destination:
+            shutil.copyfileobj(source, destination)
+        os.replace(tmp_path, pending_path)
+        os.remove(wal_path)
+        return pending_path
+
+    def _queue_pending(self)->None:
+        #Also re-queues segments whose upload gave up earlier, so an S3 outage does not need a restart
+        for directory, _, file_names in os.walk(self.pending_dir):
+            for file_name in sorted(file_names):
+                file_path = os.path.join(directory, file_name)
+                if file_name.endswith('.gz') and file_path not in self._queued:
+                    self._queued.add(file_path)
+                    self._uploads.put(file_path)
+
+    def _flush_loop(self)->None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=min(1.0, self.max_segment_seconds))
+            self._wake.clear()
+            with self._lock:
+                due = self._segment is not None and (self._segment.size >= self.max_segment_bytes or
+                                                     time.monotonic() - self._segment.opened >= self.max_segment_seconds)
+            if due:
+                try:
+                    self.seal()
+                except Exception as e:
+                    logging.error(f'Could not seal prediction log segment: {e}')
+
+    def _upload(self, file_path:str)->None:
+        relative_path = os.path.relpath(file_path, self.pending_dir).replace(os.sep, '/')
+        aws_object_url = f's3://{self.bucket_name}/{self.s3_prefix}/{relative_path}'
+        for attempt in range(self.upload_retries + 1):
+            try:
+                if self.s3_sync is None:
+                    self.s3_sync = S3Sync()
+                self.bytes_uploaded += self.s3_sync.upload_file(file_path, aws_object_url)
+                uploaded_path = os.path.join(self.uploaded_dir, relative_path)
+                os.makedirs(os.path.dirname(uploaded_path), exist_ok=True)
+                os.replace(file_path, uploaded_path)
+                self.segments_uploaded += 1
+                logging.info(f'Prediction log segment uploaded to {aws_object_url}')
+                return
+            except FileNotFoundError:
+                return #uploaded and moved by another worker
+            except Exception as e:
+                self.upload_failures += 1
+                delay = self.retry_backoff * 2 ** attempt
+                logging.warning(f'Upload of {file_path} failed (attempt {attempt + 1}): {e}')
+                #No retries while shutting down, the segment is uploaded on next start
+                if attempt == self.upload_retries or self._stop.wait(delay):
+                    break
+        logging.warning(f'Giving up on {file_path} for now, it stays in {self.pending_dir}')
+
+    def _upload_loop(self)->None:
+        while True:
+            file_path = self._uploads.get()
+            if file_path is None:
+                return
+            self._upload(file_path)
+            self._queued.discard(file_path)
+
+    def close(self, timeout:float=PREDICTION_LOG_CLOSE_TIMEOUT)->None:
+        '''
+            Seals the open segment and waits up to timeout seconds for the queued uploads (one attempt each).
+        '''
+        if self._flusher is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._flusher.join()
+        self.seal()
+        self._uploads.put(None)
+        self._uploader.join(timeout)
+
+    def stats(self)->dict:
+        with self._lock:
+            segment = self._segment
+            open_segment = {'rows': segment.rows, 'bytes': segment.size} if segment is not None else None
+        return {
+            'rows_appended': self.rows_appended,
+            'open_segment': open_segment,
+            'segments_sealed': self.segments_sealed,
+            'segments_uploaded': self.segments_uploaded,
+            'bytes_uploaded': self.bytes_uploaded,
+            'upload_failures': self.upload_failures,
+            'upload_queue_depth': self._uploads.qsize(),
+        }
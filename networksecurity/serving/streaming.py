@@ -0,0 +1,48 @@
+import sys
+import pandas as pd
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import MODEL_SERVING_STREAM_CHUNK_SIZE
+
+STREAM_MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def stream_predictions(file_obj, network_model, chunk_size:int=MODEL_SERVING_STREAM_CHUNK_SIZE,
+                       output_format:str='csv', observe_fn=None, record_fn=None):
+    '''
+        Reads a CSV upload in chunks of chunk_size rows, predicts each chunk and yields the scored chunk as CSV
+        or NDJSON text. Peak memory is bounded by the chunk size.
+        observe_fn, if given, is called with every input chunk (e.g. DriftMonitor.observe) and record_fn with
+        every scored chunk (e.g. PredictionLog.append).
+    '''
+    try:
+        if output_format not in STREAM_MEDIA_TYPES:
+            raise ValueError(f'Unsupported output format {output_format}, expected one of {list(STREAM_MEDIA_TYPES)}')
+
+        n_rows = 0
+        for chunk_number, chunk in enumerate(pd.read_csv(file_obj, chunksize=chunk_size)):
+            if observe_fn is not None:
+                observe_fn(chunk)
+            chunk['predicted_column'] = network_model.predict(chunk)
+            n_rows += len(chunk)
+            if record_fn is not None:
+                record_fn(chunk)
+
+            #Index keeps counting across chunks, so the output matches a single to_csv of the whole frame
+            if output_format == 'csv':
+                yield chunk.to_csv(header=chunk_number == 0)
+            else:
+                lines = chunk.to_json(orient='records', lines=True)
+                yield lines if lines.endswith('\n') else lines + '\n'
+
+        logging.info(f'Streamed predictions for {n_rows} rows')
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
@@ -0,0 +1,410 @@
+import sys
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+from sklearn.pipeline import Pipeline
+from sklearn.impute import KNNImputer
+from sklearn.dummy import DummyClassifier
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import (
+    MODEL_SERVING_LOOKUP_TABLE_SIZE,
+    MODEL_SERVING_COMPILED_MAX_ROWS,
+)
+
+#Features in data_schema/schema.yaml take the values {-1, 0, 1}
+TERNARY_VALUES = (-1, 0, 1)
+ROW_CHUNK_SIZE = 8192 #rows traversed at once, bounds the (rows x trees) node index matrix
+SHALLOW_TREE_DEPTH = 8 #up to this depth a fixed number of traversal steps beats tracking unfinished rows
+
+
+class CompiledTreeEnsemble:
+    '''
+        Tree ensemble flattened into NumPy node arrays and evaluated for all trees at once.
+
+        kind is one of 'tree', 'forest', 'gradient_boosting' or 'adaboost' and decides how leaf values are combined.
+        Combination follows the sklearn implementation step by step so predictions are bit-identical.
+    '''
+    def __init__(self, kind:str, arrays:dict, classes:np.ndarray, params:dict=None):
+        self.kind = kind
+        self.classes = classes
+        self.params = params or {}
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children_left = arrays['children_left']
+        self.children_right = arrays['children_right']
+        self.leaf_value = arrays['leaf_value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        #Next node for feature values -1, 0 and 1, so ternary rows need one lookup per step instead of a comparison
+        self.ternary_next = arrays.get('ternary_next')
+        if self.ternary_next is None:
+            self.ternary_next = np.where(np.array(TERNARY_VALUES)[np.newaxis, :] <= self.threshold[:, np.newaxis],
+                                         self.children_left[:, np.newaxis], self.children_right[:, np.newaxis]).astype(np.int32).ravel()
+        self.is_leaf = arrays.get('is_leaf')
+        if self.is_leaf is None:
+            self.is_leaf = self.children_left == np.arange(len(self.children_left))
+        self.estimator_weights = arrays.get('estimator_weights')
+        self.init_raw = arrays.get('init_raw')
+
+    def to_arrays(self)->dict:
+        '''
+            Every node array, including the derived lookup arrays so a model bundle does not rebuild them on load.
+        '''
+        arrays = {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'children_left': self.children_left,
+            'children_right': self.children_right,
+            'leaf_value': self.leaf_value,
+            'roots': self.roots,
+            'max_depth': np.array(self.max_depth),
+            'ternary_next': self.ternary_next,
+            'is_leaf': self.is_leaf,
+        }
+        if self.estimator_weights is not None:
+            arrays['estimator_weights'] = self.estimator_weights
+        if self.init_raw is not None:
+            arrays['init_raw'] = self.init_raw
+        return arrays
+
+    @classmethod
+    def from_estimator(cls, model):
+        '''
+            Compiles a fitted DecisionTree, RandomForest, GradientBoosting or AdaBoost classifier.
+            Returns None for estimators that cannot be compiled exactly.
+        '''
+        if isinstance(model, DecisionTreeClassifier) and model.n_outputs_ == 1:
+            kind, trees = 'tree', [model]
+        elif isinstance(model, RandomForestClassifier) and model.n_outputs_ == 1:
+            kind, trees = 'forest', list(model.estimators_)
+        elif isinstance(model, GradientBoostingClassifier):
+            if not (model.init_ == 'zero' or isinstance(model.init_, DummyClassifier)):
+                return None
+            kind, trees = 'gradient_boosting', list(model.estimators_.ravel())
+        elif isinstance(model, AdaBoostClassifier) and all(isinstance(tree, DecisionTreeClassifier) for tree in model.estimators_):
+            kind, trees = 'adaboost', list(model.estimators_)
+        else:
+            return None
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            tree_ = tree.tree_
+            is_leaf = tree_.children_left == -1
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree_.feature).astype(np.int32))
+            thresholds.append(tree_.threshold.astype(np.float64))
+            #Leaves point to themselves so traversal can run a fixed number of steps
+            node_ids = np.arange(tree_.node_count, dtype=np.int32) + offset
+            lefts.append(np.where(is_leaf, node_ids, tree_.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree_.children_right + offset).astype(np.int32))
+            values.append(cls._leaf_values(kind, tree, model))
+            offset += tree_.node_count
+
+        arrays = {
+            'feature': np.concatenate(features),
+            'threshold': np.concatenate(thresholds),
+            'children_left': np.concatenate(lefts),
+            'children_right': np.concatenate(rights),
+            'leaf_value': np.concatenate(values),
+            'roots': np.array(roots, dtype=np.int32),
+            'max_depth': np.array(max(tree.tree_.max_depth for tree in trees)),
+        }
+        params = {}
+        if kind == 'gradient_boosting':
+            params['learning_rate'] = float(model.learning_rate)
+            params['n_trees_per_iteration'] = int(model.estimators_.shape[1])
+            n_features = model.n_features_in_
+            arrays['init_raw'] = model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0]
+        if kind == 'adaboost':
+            arrays['estimator_weights'] = np.asarray(model.estimator_weights_, dtype=np.float64)
+        return cls(kind=kind, arrays=arrays, classes=model.classes_, params=params)
+
+    @staticmethod
+    def _leaf_values(kind:str, tree, model)->np.ndarray:
+        value = tree.tree_.value[:, 0, :]
+        if kind == 'forest':
+            #DecisionTreeClassifier.predict_proba: older sklearn stores weighted counts and normalizes them,
+            #newer sklearn stores fractions and returns them unchanged
+            proba = value[:, :tree.n_classes_].astype(np.float64)
+            sums = proba.sum(axis=1, keepdims=True)
+            if not np.allclose(sums, 1.0):
+                sums[sums == 0.0] = 1.0
+                proba = proba / sums
+            return proba
+        if kind in ('tree', 'adaboost'):
+            #Class label index each tree predicts (DecisionTreeClassifier.predict is argmax of the raw values)
+            return np.argmax(value, axis=1).astype(np.float64)[:, np.newaxis]
+        return value.astype(np.float64) #gradient boosting regression trees: one raw value per leaf
+
+    def apply(self, X:np.ndarray)->np.ndarray:
+        '''
+            Returns the global leaf index reached in every tree, shape (n_rows, n_trees).
+            int8 input must be ternary and takes the lookup-table path, anything else is compared with the thresholds.
+        '''
+        if X.dtype == np.int8:
+            return self._apply_ternary(X)
+        X = np.ascontiguousarray(X, dtype=np.float32) #sklearn trees compare float32 inputs with float64 thresholds
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return nodes
+
+    def _apply_ternary(self, X:np.ndarray)->np.ndarray:
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        values = (X.astype(np.intp) + 1).ravel() #-1, 0, 1 -> column of ternary_next
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+        nodes = np.tile(self.roots.astype(np.intp), n_rows)
+        feature = self.feature.astype(np.intp)
+
+        if self.max_depth <= SHALLOW_TREE_DEPTH:
+            for _ in range(self.max_depth):
+                nodes = self.ternary_next[nodes * 3 + values[row_offsets + feature[nodes]]]
+            return nodes.reshape(n_rows, n_trees)
+
+        #Deep trees: only keep stepping the (row, tree) pairs that have not reached a leaf
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            active_nodes = nodes[active]
+            active_nodes = self.ternary_next[active_nodes * 3 + values[row_offsets[active] + feature[active_nodes]]]
+            nodes[active] = active_nodes
+            active = active[~self.is_leaf[active_nodes]]
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict(self, X:np.ndarray)->np.ndarray:
+        predictions = [self._predict_chunk(X[start:start + ROW_CHUNK_SIZE])
+                       for start in range(0, X.shape[0], ROW_CHUNK_SIZE)]
+        if not predictions:
+            return self.classes[:0]
+        return np.concatenate(predictions)
+
+    def _predict_chunk(self, X:np.ndarray)->np.ndarray:
+        leaves = self.apply(X)
+        if self.kind == 'tree':
+            return self.classes.take(self.leaf_value[leaves[:, 0], 0].astype(np.intp), axis=0)
+
+        if self.kind == 'forest':
+            #RandomForestClassifier.predict_proba sums tree probabilities in order, then divides
+            proba = np.zeros((X.shape[0], self.leaf_value.shape[1]), dtype=np.float64)
+            for t in range(leaves.shape[1]):
+                proba += self.leaf_value[leaves[:, t]]
+            proba /= leaves.shape[1]
+            return self.classes.take(np.argmax(proba, axis=1), axis=0)
+
+        if self.kind == 'gradient_boosting':
+            k = self.params['n_trees_per_iteration']
+            raw = np.tile(self.init_raw, (X.shape[0], 1)).astype(np.float64)
+            learning_rate = self.params['learning_rate']
+            for t in range(leaves.shape[1]):
+                raw[:, t % k] += learning_rate * self.leaf_value[leaves[:, t], 0]
+            if k == 1:
+                return self.classes[(raw.ravel() >= 0).astype(int)]
+            return self.classes[np.argmax(raw, axis=1)]
+
+        #AdaBoost (SAMME): weighted vote of the estimators in order, as in AdaBoostClassifier.decision_function
+        n_classes = len(self.classes)
+        class_ids = np.arange(n_classes)
+        pred = 0
+        for t in range(leaves.shape[1]):
+            weight = self.estimator_weights[t]
+            votes = self.leaf_value[leaves[:, t], 0][:, np.newaxis] == class_ids
+            pred = pred + np.where(votes, weight, -1 / (n_classes - 1) * weight)
+        pred /= self.estimator_weights.sum()
+        if n_classes == 2:
+            pred[:, 0] *= -1
+            return self.classes.take(pred.sum(axis=1) > 0, axis=0)
+        return self.classes.take(np.argmax(pred, axis=1), axis=0)
+
+
+def _skips_complete_rows(preprocessor)->bool:
+    '''
+        True when the preprocessor only imputes, i.e. it returns rows without missing values unchanged.
+    '''
+    steps = [step for _, step in preprocessor.steps] if isinstance(preprocessor, Pipeline) else [preprocessor]
+    for step in steps:
+        if getattr(step, 'imputes_only', False):
+            continue
+        if isinstance(step, KNNImputer) and not step.add_indicator and np.all(step._valid_mask):
+            continue
+        return False
+    return True
+
+
+class CompiledNetworkModel:
+    '''
+        Fast drop-in replacement for NetworkModel.predict built from a trained NetworkModel.
+
+        - rows without missing values skip the imputer
+        - complete ternary rows are packed into int8 and keyed by their base-3 code; predictions of codes seen
+          before come from a sorted lookup table, new distinct codes are scored once and added to it
+        - small sets of new rows go through CompiledTreeEnsemble, which avoids sklearn's per-call overhead;
+          large sets use the estimator's own predict, which is faster for big batches of deep trees
+        Every path returns exactly what NetworkModel.predict returns.
+    '''
+    def __init__(self, network_model, compiled_model:CompiledTreeEnsemble=None,
+                 lookup_table_size:int=MODEL_SERVING_LOOKUP_TABLE_SIZE,
+                 compiled_max_rows:int=MODEL_SERVING_COMPILED_MAX_ROWS):
+        try:
+            self.preprocessor = network_model.preprocessor
+            #A model bundle unpickles its estimator only when .model is first used, e.g. for a large batch
+            self._network_model = network_model
+            self.model_type = getattr(network_model, 'model_type', None) or type(network_model.model).__name__
+            self.classes = compiled_model.classes if compiled_model is not None else network_model.model.classes_
+            self.compiled_model = compiled_model
+            self.lookup_table_size = lookup_table_size
+            self.compiled_max_rows = compiled_max_rows
+            self.skip_imputation = _skips_complete_rows(self.preprocessor)
+            self.feature_names = getattr(self.preprocessor, 'feature_names_in_', None)
+            self._code_weights = None
+            #Sorted codes and their predictions, replaced as a pair so readers never see them out of sync
+            self._lookup_table = (np.empty(0, dtype=np.int64), np.empty(0, dtype=self.classes.dtype))
+            self._lookup_lock = threading.Lock()
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    @property
+    def model(self):
+        return self._network_model.model
+
+    @classmethod
+    def from_network_model(cls, network_model, **kwargs):
+        if hasattr(network_model, 'compiled_model'):
+            compiled_model = network_model.compiled_model #model bundles are compiled when saved
+        else:
+            compiled_model = CompiledTreeEnsemble.from_estimator(network_model.model)
+        if compiled_model is None:
+            model_type = getattr(network_model, 'model_type', None) or type(network_model.model).__name__
+            logging.info(f'{model_type} is not a compilable tree ensemble, using its own predict')
+        return cls(network_model, compiled_model, **kwargs)
+
+    def _predict_transformed(self, X:np.ndarray)->np.ndarray:
+        if self.compiled_model is not None and X.shape[0] <= self.compiled_max_rows:
+            return self.compiled_model.predict(X)
+        return self.model.predict(X.astype(np.float64) if X.dtype == np.int8 else X)
+
+    def _predict_ternary(self, X_int8:np.ndarray)->np.ndarray:
+        if self._code_weights is None:
+            self._code_weights = 3 ** np.arange(X_int8.shape[1], dtype=np.int64)
+        codes = (X_int8 + 1).astype(np.int64) @ self._code_weights
+        unique_codes, first_index, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+
+        table_codes, table_predictions = self._lookup_table
+        position = np.searchsorted(table_codes, unique_codes).clip(max=max(len(table_codes) - 1, 0))
+        hit = (table_codes[position] == unique_codes) if len(table_codes) else np.zeros(len(unique_codes), dtype=bool)
+
+        unique_predictions = np.empty(len(unique_codes), dtype=table_predictions.dtype)
+        unique_predictions[hit] = table_predictions[position[hit]]
+        if not hit.all():
+            new_predictions = self._predict_transformed(X_int8[first_index[~hit]])
+            unique_predictions[~hit] = new_predictions
+            self._add_to_lookup_table(unique_codes[~hit], new_predictions)
+        return unique_predictions[inverse]
+
+    def _add_to_lookup_table(self, codes:np.ndarray, predictions:np.ndarray)->None:
+        with self._lookup_lock:
+            table_codes, table_predictions = self._lookup_table
+            room = self.lookup_table_size - len(table_codes)
+            if room <= 0:
+                return
+            #Another thread may have added some of these codes already
+            new = ~np.isin(codes, table_codes)
+            codes, predictions = codes[new][:room], predictions[new][:room]
+            if not len(codes):
+                return
+            merged_codes = np.concatenate([table_codes, codes])
+            order = np.argsort(merged_codes, kind='stable')
+            self._lookup_table = (merged_codes[order], np.concatenate([table_predictions, predictions])[order])
+
+    def predict(self, x):
+        try:
+            if isinstance(x, pd.DataFrame) and self.feature_names is not None:
+                X = x[list(self.feature_names)].to_numpy(dtype=np.float64)
+            else:
+                X = np.asarray(x, dtype=np.float64)
+            if not self.skip_imputation:
+                return self._predict_transformed(self.preprocessor.transform(x))
+
+            predictions = np.empty(X.shape[0], dtype=self.classes.dtype)
+            missing = np.isnan(X).any(axis=1)
+            if missing.any():
+                incomplete = x[missing] if isinstance(x, pd.DataFrame) else X[missing]
+                predictions[missing] = self._predict_transformed(self.preprocessor.transform(incomplete))
+
+            complete = ~missing
+            ternary = complete & np.isin(X, TERNARY_VALUES).all(axis=1)
+            if ternary.any():
+                predictions[ternary] = self._predict_ternary(X[ternary].astype(np.int8))
+
+            other = complete & ~ternary
+            if other.any():
+                predictions[other] = self._predict_transformed(X[other])
+            return predictions
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def lookup_table_size_used(self)->int:
+        return len(self._lookup_table[0])
+
+
+def benchmark_compiled_model(network_model, dataframe:pd.DataFrame, batch_size:int=64)->dict:
+    '''
+        Scores the frame in batches of batch_size rows (as the serving path does) with NetworkModel.predict
+        and with a fresh CompiledNetworkModel, first with an empty lookup table (cold) and then again (warm),
+        and checks that all predictions are identical.
+    '''
+    try:
+        compiled = CompiledNetworkModel.from_network_model(network_model)
+        batches = [dataframe.iloc[start:start + batch_size] for start in range(0, len(dataframe), batch_size)]
+        def timed(predict):
+            started = time.perf_counter()
+            predictions = np.concatenate([predict(batch) for batch in batches])
+            return predictions, time.perf_counter() - started
+
+        expected, sklearn_seconds = timed(network_model.predict)
+        cold, compiled_cold_seconds = timed(compiled.predict)
+        warm, compiled_warm_seconds = timed(compiled.predict)
+        return {
+            'model_type': compiled.model_type,
+            'compiled': compiled.compiled_model is not None,
+            'rows': len(dataframe),
+            'batch_size': batch_size,
+            'sklearn_seconds': sklearn_seconds,
+            'compiled_cold_seconds': compiled_cold_seconds,
+            'compiled_warm_seconds': compiled_warm_seconds,
+            'speedup_cold': sklearn_seconds / compiled_cold_seconds,
+            'speedup_warm': sklearn_seconds / compiled_warm_seconds,
+            'lookup_table_entries': compiled.lookup_table_size_used(),
+            'identical_predictions': bool(np.array_equal(expected, cold) and np.array_equal(expected, warm)),
+        }
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+if __name__ == '__main__':
+    # Benchmark: python -m networksecurity.utils.compiled_model Network_Data/phisingData.csv [batch_size]
+    from networksecurity.utils import main_utils, model_bundle
+    from networksecurity.constants.training_pipeline import FINAL_MODEL_FILE_PATH, TARGET_COLUMN
+    network_model = model_bundle.load_model(FINAL_MODEL_FILE_PATH)
+    dataframe = main_utils.read_csv_data(sys.argv[1]).drop(columns=[TARGET_COLUMN], errors='ignore')
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    print(benchmark_compiled_model(network_model, dataframe, batch_size=batch_size))
@@ -0,0 +1,193 @@
+import sys
+import warnings
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.stats import chi2, kstwo
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+DRIFT_TESTS = ('ks', 'chi2', 'psi', 'js')
+#Added to every bin share before taking logs, so a value missing on one side gives a large but finite score
+PROPORTION_EPSILON = 1e-4
+#Rows counted at once, keeps the temporary arrays small enough to stay in cache
+ROW_CHUNK_SIZE = 16384
+#Values inspected to decide whether a column is categorical and to place quantile bins
+EDGE_SAMPLE_SIZE = 100_000
+
+
+def _sample(values:np.ndarray, size:int)->np.ndarray:
+    if len(values) <= size:
+        return values
+    return values[::-(-len(values) // size)]
+
+
+def compute_bin_edges(base_values:np.ndarray, current_values:np.ndarray=None, max_bins:int=64)->np.ndarray:
+    '''
+        Returns the inner bin edges of every column as a (n_columns, n_edges) array padded with +inf.
+        Integer-valued columns spanning at most max_bins values get one bin per integer (edges halfway between
+        them), the schema's {-1, 0, 1} columns need two edges. Other columns get max_bins quantile bins of a
+        sample of base_values. Only the column ranges are read in full.
+    '''
+    try:
+        frames = [values for values in (base_values, current_values) if values is not None and len(values)]
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning) #all-NaN columns
+            lows = np.nanmin([np.nanmin(values, axis=0) for values in frames], axis=0)
+            highs = np.nanmax([np.nanmax(values, axis=0) for values in frames], axis=0)
+        samples = _sample(base_values, EDGE_SAMPLE_SIZE).astype(np.float64)
+
+        column_edges = []
+        for column, (low, high) in enumerate(zip(lows, highs)):
+            sample = samples[:, column]
+            sample = sample[~np.isnan(sample)]
+            if np.isnan(low):
+                edges = np.empty(0)
+            elif high - low < max_bins and np.all(sample == np.round(sample)):
+                edges = np.arange(low, high) + 0.5
+            else:
+                edges = np.unique(np.quantile(sample, np.linspace(0, 1, max_bins + 1)[1:-1])) if len(sample) else np.empty(0)
+            column_edges.append(edges)
+
+        return sketch_bin_edges({'bin_edges': column_edges})
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+def _block_histograms(values:np.ndarray, bin_edges:np.ndarray)->np.ndarray:
+    n_columns, n_bins = bin_edges.shape[0], bin_edges.shape[1] + 1
+    counts = np.zeros(n_columns * n_bins, dtype=np.int64)
+    offsets = np.arange(n_columns) * n_bins
+    #Edge columns that are +inf for every column add nothing, the schema's columns need 2 of them
+    edges = [bin_edges[:, edge] for edge in range(bin_edges.shape[1]) if np.isfinite(bin_edges[:, edge]).any()]
+    for start in range(0, len(values), ROW_CHUNK_SIZE):
+        chunk = values[start:start + ROW_CHUNK_SIZE]
+        #Bin index of every cell = number of edges below it, all columns of the chunk at once
+        codes = np.broadcast_to(offsets, chunk.shape).copy()
+        for edge in edges:
+            codes += chunk > edge
+        if chunk.dtype.kind == 'f':
+            codes = codes[~np.isnan(chunk)]
+        counts += np.bincount(codes.ravel(), minlength=n_columns * n_bins)
+    return counts.reshape(n_columns, n_bins)
+
+
+def column_histograms(values:np.ndarray, bin_edges:np.ndarray, n_jobs:int=1, column_block_size:int=64)->np.ndarray:
+    '''
+        Counts the values of every column in its bins in one vectorized pass over row chunks, in the values'
+        own dtype (int8 or float32 artifacts are not converted). Missing values are not counted.
+        Returns a (n_columns, n_edges + 1) int64 array. Schemas wider than column_block_size columns are split
+        into blocks that are counted in parallel threads.
+    '''
+    try:
+        blocks = [slice(start, start + column_block_size) for start in range(0, values.shape[1], column_block_size)]
+        if len(blocks) == 1 or n_jobs == 1:
+            histograms = [_block_histograms(values[:, block], bin_edges[block]) for block in blocks]
+        else:
+            histograms = Parallel(n_jobs=n_jobs, prefer='threads')(
+                delayed(_block_histograms)(values[:, block], bin_edges[block]) for block in blocks)
+        return np.vstack(histograms) if histograms else np.zeros((0, bin_edges.shape[1] + 1), dtype=np.int64)
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+def drift_statistics(base_histograms:np.ndarray, current_histograms:np.ndarray, test:str='ks')->tuple:
+    '''
+        Compares two sets of column histograms and returns (scores, p_values), one per column.
+            ks: largest gap between the cumulative distributions, asymptotic p-value
+            chi2: chi-square test of homogeneity on the 2 x bins contingency table
+            psi: population stability index
+            js: Jensen-Shannon distance (base 2, between 0 and 1)
+        psi and js have no p-value of their own, the chi-square p-value of the same histograms is returned.
+    '''
+    try:
+        if test not in DRIFT_TESTS:
+            raise ValueError(f'Unknown drift test {test}, expected one of {DRIFT_TESTS}')
+        base = base_histograms.astype(np.float64)
+        current = current_histograms.astype(np.float64)
+        n_base = base.sum(axis=1, keepdims=True)
+        n_current = current.sum(axis=1, keepdims=True)
+        base_share = base / np.maximum(n_base, 1)
+        current_share = current / np.maximum(n_current, 1)
+        used = (base + current) > 0
+
+        #Chi-square p-value, also reported for psi and js
+        total = n_base + n_current
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected_base = n_base * (base + current) / total
+            expected_current = n_current * (base + current) / total
+            cells = np.where(used, (base - expected_base) ** 2 / expected_base
+                                   + (current - expected_current) ** 2 / expected_current, 0.0)
+        chi2_scores = np.nan_to_num(cells.sum(axis=1))
+        dof = np.maximum(used.sum(axis=1) - 1, 1)
+        p_values = chi2.sf(chi2_scores, dof)
+
+        if test == 'chi2':
+            scores = chi2_scores
+        elif test == 'ks':
+            scores = np.abs(np.cumsum(base_share, axis=1) - np.cumsum(current_share, axis=1)).max(axis=1)
+            effective_n = np.round((n_base * n_current / np.maximum(total, 1)).ravel())
+            p_values = np.where(effective_n > 0, kstwo.sf(scores, np.maximum(effective_n, 1)), 1.0)
+        elif test == 'psi':
+            p = np.where(used, base_share + PROPORTION_EPSILON, 1.0)
+            q = np.where(used, current_share + PROPORTION_EPSILON, 1.0)
+            scores = ((q - p) * np.log(q / p)).sum(axis=1)
+        else:
+            middle = (base_share + current_share) / 2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                divergence = (np.where(base_share > 0, base_share * np.log2(base_share / middle), 0.0)
+                              + np.where(current_share > 0, current_share * np.log2(current_share / middle), 0.0))
+            scores = np.sqrt(np.clip(divergence.sum(axis=1) / 2, 0, 1))
+        return scores, p_values
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+def is_drifted(scores:np.ndarray, p_values:np.ndarray, test:str, threshold:float)->np.ndarray:
+    '''
+        ks and chi2 flag drift when the p-value is below threshold, psi and js when the score is above it.
+    '''
+    return p_values < threshold if test in ('ks', 'chi2') else scores > threshold
+
+
+def build_reference_sketch(values:np.ndarray, columns:list, max_bins:int=64)->dict:
+    '''
+        Summarises training inputs as what drift monitoring needs of them: per-column bin edges, value counts
+        and missing-value rates. A few hundred numbers for the schema, however many rows were trained on.
+    '''
+    try:
+        bin_edges = compute_bin_edges(values, max_bins=max_bins)
+        counts = column_histograms(values, bin_edges)
+        missing = np.isnan(values).sum(axis=0) if values.dtype.kind == 'f' else np.zeros(len(columns), dtype=np.int64)
+        return {
+            'columns': list(columns),
+            'rows': int(len(values)),
+            'bin_edges': [edges[np.isfinite(edges)].tolist() for edges in bin_edges],
+            'counts': counts.tolist(),
+            'missing_rates': (missing / max(len(values), 1)).tolist(),
+        }
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+def sketch_bin_edges(sketch:dict)->np.ndarray:
+    '''
+        Returns the sketch's bin edges as the padded array column_histograms takes.
+    '''
+    n_edges = max([len(edges) for edges in sketch['bin_edges']] + [0])
+    bin_edges = np.full((len(sketch['bin_edges']), n_edges), np.inf)
+    for column, edges in enumerate(sketch['bin_edges']):
+        bin_edges[column, :len(edges)] = edges
+    return bin_edges
@@ -0,0 +1,109 @@
+import os, sys
+import json
+import shutil
+import numpy as np
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+STATE_FILE_NAME = 'state.json'
+ID_COLUMN = '_id'
+
+
+class ColumnarFeatureStore:
+    '''
+        Local copy of the MongoDB collection kept as one .npy file per column (float32, NaN for missing values)
+        plus the documents' _id as 12-byte strings, sorted by _id.
+
+        Every merge writes a new version directory and then points state.json at it, so readers and crashes
+        never see a half-written store. state.json also carries the ingestion high-water mark.
+    '''
+    def __init__(self, store_dir:str, columns:list):
+        try:
+            self.store_dir = store_dir
+            self.columns = list(columns)
+            self.state_file_path = os.path.join(store_dir, STATE_FILE_NAME)
+            self.state = self.load_state()
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def load_state(self)->dict:
+        if not os.path.exists(self.state_file_path):
+            return {'version': 0, 'rows': 0}
+        with open(self.state_file_path) as file:
+            return json.load(file)
+
+    def _version_dir(self, version:int)->str:
+        return os.path.join(self.store_dir, f'v{version}')
+
+    def _load_column(self, column:str, mmap_mode:str='r')->np.ndarray:
+        return np.load(os.path.join(self._version_dir(self.state['version']), f'{column}.npy'), mmap_mode=mmap_mode)
+
+    def load_ids(self)->np.ndarray:
+        if not self.state['version']:
+            return np.empty(0, dtype='S12')
+        return self._load_column(ID_COLUMN)
+
+    def merge(self, ids:np.ndarray, columns:dict, deleted_ids:np.ndarray=None, **high_water_mark)->int:
+        '''
+            Upserts the rows (ids: 12-byte _id strings, columns: column -> float32 array), drops deleted_ids,
+            writes the result as a new version and stores the high-water mark keys in state.json.
+            Returns the number of rows in the store.
+        '''
+        try:
+            old_ids = self.load_ids()
+            all_ids = np.concatenate([old_ids, ids.astype('S12')])
+            #Stable sort keeps the new row after the stored row with the same _id, keep the last of each run
+            order = np.argsort(all_ids, kind='stable')
+            sorted_ids = all_ids[order]
+            keep = np.ones(len(sorted_ids), dtype=bool)
+            keep[:-1] = sorted_ids[:-1] != sorted_ids[1:]
+            if deleted_ids is not None and len(deleted_ids):
+                keep &= ~np.isin(sorted_ids, deleted_ids.astype('S12'))
+            order = order[keep]
+
+            version = self.state['version'] + 1
+            version_dir = self._version_dir(version)
+            os.makedirs(version_dir, exist_ok=True)
+            np.save(os.path.join(version_dir, f'{ID_COLUMN}.npy'), all_ids[order])
+            for column in self.columns:
+                old_values = self._load_column(column) if self.state['version'] else np.empty(0, dtype=np.float32)
+                values = np.concatenate([old_values, np.asarray(columns[column], dtype=np.float32)])
+                np.save(os.path.join(version_dir, f'{column}.npy'), values[order])
+
+            previous_version = self.state['version']
+            self.save_state(**high_water_mark, version=version, rows=int(len(order)))
+            if previous_version:
+                shutil.rmtree(self._version_dir(previous_version), ignore_errors=True)
+
+            logging.info(f'Feature store version {version}: {len(ids)} rows upserted, '
+                         f'{0 if deleted_ids is None else len(deleted_ids)} deleted, {len(order)} rows total')
+            return len(order)
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def save_state(self, **updates)->None:
+        '''
+            Atomically updates state.json (version, row count and high-water mark keys).
+        '''
+        state = dict(self.state, **updates)
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = f'{self.state_file_path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file, indent=2)
+        os.replace(tmp_path, self.state_file_path)
+        self.state = state
+
+    def to_buffers(self)->dict:
+        '''
+            Returns column -> memory-mapped float32 array for every schema column.
+        '''
+        if not self.state['version']:
+            return {column: np.empty(0, dtype=np.float32) for column in self.columns}
+        return {column: self._load_column(column) for column in self.columns}
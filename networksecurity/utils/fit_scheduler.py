@@ -0,0 +1,244 @@
+import os, sys
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from joblib import effective_n_jobs
+from joblib.executor import get_memmapping_executor
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from threadpoolctl import threadpool_limits
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+#Weight of the newest measurement in the running seconds-per-cost-unit estimate of an estimator class
+COST_SMOOTHING = 0.3
+
+
+def _limit_threads()->None:
+    #Worker initializer: BLAS/OpenMP single-threaded for the worker's lifetime (5ms per call, too slow per fit)
+    threadpool_limits(limits=1)
+
+
+def _run_task(estimator, params:dict, X, y, train, test, scoring:str=None)->tuple:
+    '''
+        Worker side of a task: fits a clone of estimator on the train rows (all rows when train is None) with
+        estimator threads limited to one, so the pool size is the number of cores used.
+        Returns (score on the test rows, or the fitted model when test is None, pid, start, end). The score is
+        the estimator's own (accuracy for classifiers) or the named sklearn scorer.
+    '''
+    started = time.time()
+    model = clone(estimator).set_params(**params)
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=1)
+    if train is None:
+        model.fit(X, y)
+    else:
+        model.fit(X[train], y[train])
+    if test is None:
+        result = model
+    elif scoring is None:
+        result = model.score(X[test], y[test])
+    else:
+        result = get_scorer(scoring)(model, X[test], y[test])
+    return result, os.getpid(), started, time.time()
+
+
+class TimeBudget:
+    '''
+        Seconds one search may use, counted from when its first fit starts on a worker, so time spent queued
+        behind other searches does not count against it.
+    '''
+    def __init__(self, seconds:float=None):
+        self.seconds = seconds
+        self.started = None
+
+    def start(self, started:float)->None:
+        #Called with the time.time() a finished fit started at; fits may finish out of order
+        self.started = started if self.started is None else min(self.started, started)
+
+    def expired(self)->bool:
+        return self.seconds is not None and self.started is not None and time.time() - self.started >= self.seconds
+
+
+class _Task:
+    def __init__(self, args:tuple, units:float, cost:float, budget:TimeBudget, label:dict):
+        self.args = args
+        self.units = units
+        self.cost = cost
+        self.budget = budget
+        self.label = label
+        self.group = label.get('model', label['estimator'])
+        self.future = Future()
+        self.queued = time.time()
+
+
+class FitScheduler:
+    '''
+        One pool of worker processes shared by every hyperparameter search of a training run, so a search
+        never waits for another to finish and the pool size is the only CPU budget (fits are single-threaded).
+
+        Searches submit (candidate, fold) fits from their own threads. A free core goes to the search that has
+        used the least core time so far (fair share), so cheap models are not queued behind the ensembles; within
+        a search the longest fit starts first (LPT scheduling). A fit's estimated cost is training rows x
+        n_estimators times the seconds per unit measured so far for that estimator class.
+        Fits still queued when their search's TimeBudget has run out are skipped and resolve to None.
+        Every fit is recorded in timeline().
+        Arrays are handed to workers memory-mapped, as joblib does.
+    '''
+    def __init__(self, n_cores:int=-1):
+        try:
+            self.n_cores = max(1, effective_n_jobs(n_cores))
+            #A single core runs fits on the dispatcher thread, like joblib with n_jobs=1: no worker process to pay for
+            self._executor = get_memmapping_executor(self.n_cores, initializer=_limit_threads) if self.n_cores > 1 else None
+            #Queued fits per search (the label's model), each a heap of (-cost, sequence, task)
+            self._queues = {}
+            self._used_seconds = {}
+            self._sequence = itertools.count()
+            self._condition = threading.Condition()
+            self._running = 0
+            self._closed = False
+            self._unit_seconds = {}
+            self._timeline = []
+            self._started = time.time()
+            self._dispatcher = threading.Thread(target=self._dispatch, name='fit-scheduler', daemon=True)
+            self._dispatcher.start()
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    @staticmethod
+    def _cost_units(estimator, params:dict, n_rows:int)->float:
+        return n_rows * (params.get('n_estimators', estimator.get_params().get('n_estimators')) or 1)
+
+    def submit(self, estimator, params:dict, X, y, train=None, test=None, budget:TimeBudget=None, label:dict=None,
+               scoring:str=None)->Future:
+        '''
+            Queues one fit of estimator with params, scored on the test rows with scoring (returns the fitted model
+            when test is None). The fit is skipped if budget has run out before it starts.
+        '''
+        n_rows = len(X) if train is None else len(train)
+        units = self._cost_units(estimator, params, n_rows)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('FitScheduler is shut down')
+            cost = units * self._unit_seconds.get(type(estimator).__name__, 1.0)
+            task = _Task((estimator, params, X, y, train, test, scoring), units, cost, budget,
+                         dict(label or {}, estimator=type(estimator).__name__, rows=n_rows))
+            heapq.heappush(self._queues.setdefault(task.group, []), (-task.cost, next(self._sequence), task))
+            self._condition.notify_all()
+        return task.future
+
+    def _dispatch(self)->None:
+        if self._executor is None:
+            with threadpool_limits(limits=1):
+                self._dispatch_loop()
+        else:
+            self._dispatch_loop()
+
+    def _next_task(self)->_Task:
+        #Search with the least core time used (running fits at their estimated cost), then its longest fit
+        group = min(self._queues, key=lambda group: (self._used_seconds.get(group, 0.0), self._queues[group][0][1]))
+        _, _, task = heapq.heappop(self._queues[group])
+        if not self._queues[group]:
+            del self._queues[group]
+        return task
+
+    def _dispatch_loop(self)->None:
+        while True:
+            with self._condition:
+                while not self._queues or self._running >= self.n_cores:
+                    if self._closed and not self._queues:
+                        return
+                    self._condition.wait()
+                task = self._next_task()
+                if task.budget is not None and task.budget.expired():
+                    task.future.set_result(None)
+                    continue
+                self._used_seconds[task.group] = self._used_seconds.get(task.group, 0.0) + task.cost
+                self._running += 1
+            if self._executor is None:
+                try:
+                    self._task_done(task, _run_task(*task.args))
+                except Exception as e:
+                    self._task_done(task, None, e)
+                continue
+            try:
+                future = self._executor.submit(_run_task, *task.args)
+                future.add_done_callback(lambda future, task=task: self._worker_done(task, future))
+            except Exception as e:
+                self._task_done(task, None, e)
+
+    def _worker_done(self, task:_Task, future)->None:
+        try:
+            outcome = future.result()
+        except Exception as e:
+            self._task_done(task, None, e)
+            return
+        self._task_done(task, outcome)
+
+    def _task_done(self, task:_Task, outcome:tuple, error:Exception=None)->None:
+        result, pid, started, finished = outcome if error is None else (None, None, None, None)
+        with self._condition:
+            self._running -= 1
+            if error is None:
+                #The estimate counted while running is replaced by the measured time
+                self._used_seconds[task.group] += (finished - started) - task.cost
+                if task.budget is not None:
+                    task.budget.start(started)
+                estimator = task.label['estimator']
+                unit_seconds = (finished - started) / task.units
+                previous = self._unit_seconds.get(estimator)
+                self._unit_seconds[estimator] = unit_seconds if previous is None else \
+                    (1 - COST_SMOOTHING) * previous + COST_SMOOTHING * unit_seconds
+                self._timeline.append(dict(task.label, worker=pid,
+                                           queued=round(task.queued - self._started, 4),
+                                           started=round(started - self._started, 4),
+                                           finished=round(finished - self._started, 4),
+                                           seconds=round(finished - started, 4)))
+            self._condition.notify_all()
+        if error is None:
+            task.future.set_result(result)
+        else:
+            task.future.set_exception(error)
+
+    def timeline(self)->dict:
+        '''
+            Returns every finished fit (label, worker pid, queued / started / finished seconds since the scheduler
+            started) with a summary: busy core-seconds, utilization of the n_cores budget over the wall time,
+            and the largest number of fits that ran at once.
+        '''
+        with self._condition:
+            tasks = sorted(self._timeline, key=lambda task: task['started'])
+        wall_seconds = max([task['finished'] for task in tasks] + [0.0])
+        busy_seconds = sum(task['seconds'] for task in tasks)
+        events = sorted([(task['started'], 1) for task in tasks] + [(task['finished'], -1) for task in tasks])
+        concurrency = max(itertools.accumulate(change for _, change in events), default=0)
+        return {
+            'n_cores': self.n_cores,
+            'n_tasks': len(tasks),
+            'wall_seconds': round(wall_seconds, 4),
+            'busy_seconds': round(busy_seconds, 4),
+            'utilization': round(busy_seconds / (wall_seconds * self.n_cores), 4) if wall_seconds else 0.0,
+            'max_concurrency': concurrency,
+            'tasks': tasks,
+        }
+
+    def shutdown(self)->None:
+        '''
+            Lets queued fits finish and stops the dispatcher. Worker processes are kept for reuse, like joblib's.
+        '''
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._dispatcher.join()
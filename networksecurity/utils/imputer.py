@@ -0,0 +1,170 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.neighbors import KDTree
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+
+class PatternImputer(TransformerMixin, BaseEstimator):
+    '''
+        Nearest-neighbour imputer for low-cardinality features (the schema's {-1, 0, 1} columns).
+
+        fit keeps only the distinct complete training rows (packed as int8 when the values allow it) and how often
+        each occurs, at most max_patterns of them, so the pickled object stays small however much data it saw.
+        A row with missing values is imputed from the n_neighbors nearest reference rows over its observed
+        features. Missing-value patterns that recur (or arrive in a group of at least tree_min_rows rows) get a
+        KDTree over the reference rows, so their lookups are sublinear; the trees are cached (at most
+        max_cached_masks) and not pickled. One-off patterns are searched by brute force over the distinct rows,
+        which is still cheaper than KNNImputer's scan of the full training matrix.
+
+        Parameters mirror KNNImputer so DATA_TRANSFORMATION_IMPUTER_PARAMS can configure either.
+    '''
+    #Complete rows pass through transform unchanged, CompiledNetworkModel relies on this to skip imputation
+    imputes_only = True
+
+    def __init__(self, missing_values=np.nan, n_neighbors:int=3, weights:str='uniform',
+                 max_patterns:int=100_000, max_cached_masks:int=256, tree_min_rows:int=32):
+        self.missing_values = missing_values
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.max_patterns = max_patterns
+        self.max_cached_masks = max_cached_masks
+        self.tree_min_rows = tree_min_rows
+
+    def _as_float_array(self, X)->np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        if not (isinstance(self.missing_values, float) and np.isnan(self.missing_values)):
+            X[X == self.missing_values] = np.nan
+        return X
+
+    def fit(self, X, y=None):
+        try:
+            if hasattr(X, 'columns'):
+                self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+            X = self._as_float_array(X)
+            self.n_features_in_ = X.shape[1]
+            if self.weights not in ('uniform', 'distance'):
+                raise ValueError(f"weights must be 'uniform' or 'distance', got {self.weights}")
+
+            complete = X[~np.isnan(X).any(axis=1)]
+            if len(complete) < self.n_neighbors:
+                #Too few complete rows: fill the gaps with column medians so there is something to search
+                medians = np.nan_to_num(np.nanmedian(X, axis=0))
+                complete = np.where(np.isnan(X), medians, X)
+
+            patterns, counts = np.unique(complete, axis=0, return_counts=True)
+            if len(patterns) > self.max_patterns:
+                keep = np.argsort(-counts, kind='stable')[:self.max_patterns]
+                patterns, counts = patterns[keep], counts[keep]
+
+            integral = np.all(patterns == np.round(patterns)) and patterns.min() >= -128 and patterns.max() <= 127
+            self.patterns_ = patterns.astype(np.int8 if integral else np.float32)
+            self.pattern_counts_ = counts.astype(np.int32)
+            #Extra coordinate that orders equally distant patterns by index, so the KDTree and the brute-force
+            #search pick the same neighbours; for integer data it is too small to reorder unequal distances
+            scale = 0.5 if integral else 1e-6
+            self.tie_breaker_ = scale / len(patterns) * np.arange(len(patterns), dtype=np.float64)
+            self.column_means_ = np.average(patterns, axis=0, weights=counts)
+            self._reset_caches()
+            logging.info(f'PatternImputer kept {len(self.patterns_)} distinct patterns out of {len(X)} rows')
+            return self
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def _neighbours(self, rows:np.ndarray, observed:np.ndarray, k:int)->tuple:
+        key = observed.tobytes()
+        with self._trees_lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+            #Masks are counted so a pattern gets a tree the second time it is seen
+            seen = self._mask_counts.get(key, 0) + 1
+            if len(self._mask_counts) < self.max_cached_masks * 64 or key in self._mask_counts:
+                self._mask_counts[key] = seen
+
+        reference = np.column_stack([self.patterns_[:, observed].astype(np.float64), self.tie_breaker_])
+        query = np.column_stack([rows[:, observed], np.zeros(len(rows))])
+        if tree is None and (seen > 1 or len(rows) >= self.tree_min_rows):
+            tree = KDTree(reference)
+            with self._trees_lock:
+                self._trees[key] = tree
+                if len(self._trees) > self.max_cached_masks:
+                    self._trees.popitem(last=False)
+        if tree is not None:
+            distances, indices = tree.query(query, k=k)
+        else:
+            squared = (query ** 2).sum(axis=1)[:, np.newaxis] - 2 * query @ reference.T + (reference ** 2).sum(axis=1)
+            indices = np.argpartition(squared, k - 1, axis=1)[:, :k] if k < len(reference) else np.tile(np.arange(k), (len(rows), 1))
+            order = np.argsort(np.take_along_axis(squared, indices, axis=1), axis=1)
+            indices = np.take_along_axis(indices, order, axis=1)
+        #Distances without the tie-break coordinate, used by weights='distance'
+        distances = np.sqrt(((reference[indices, :-1] - query[:, np.newaxis, :-1]) ** 2).sum(axis=2))
+        return distances, indices
+
+    def _impute_group(self, rows:np.ndarray, observed:np.ndarray)->np.ndarray:
+        missing = ~observed
+        if not observed.any():
+            rows[:, missing] = self.column_means_[missing]
+            return rows
+
+        #Distinct patterns are weighted by how often they occurred, so taking enough patterns to cover
+        #n_neighbors training rows approximates KNN over the original rows
+        n_patterns = min(len(self.patterns_), self.n_neighbors)
+        distances, indices = self._neighbours(rows, observed, n_patterns)
+        neighbour_values = self.patterns_[indices][:, :, missing].astype(np.float64)
+        neighbour_counts = np.minimum(self.pattern_counts_[indices], self.n_neighbors).astype(np.float64)
+        #Only the first n_neighbors rows in distance order count: clip the cumulative counts
+        covered = np.minimum(np.cumsum(neighbour_counts, axis=1), self.n_neighbors)
+        row_weights = np.diff(covered, axis=1, prepend=0.0)
+        if self.weights == 'distance':
+            with np.errstate(divide='ignore'):
+                inverse = 1.0 / distances
+            exact = np.isinf(inverse)
+            inverse[exact.any(axis=1)] = exact[exact.any(axis=1)] #exact matches get all the weight
+            row_weights = row_weights * inverse
+        row_weights /= row_weights.sum(axis=1, keepdims=True)
+        rows[:, missing] = np.einsum('rk,rkm->rm', row_weights, neighbour_values)
+        return rows
+
+    def transform(self, X)->np.ndarray:
+        try:
+            X = self._as_float_array(X)
+            missing_mask = np.isnan(X)
+            incomplete = np.flatnonzero(missing_mask.any(axis=1))
+            if not len(incomplete):
+                return X
+
+            #Group rows by missing-value pattern so each KDTree is queried once per group
+            masks, group = np.unique(missing_mask[incomplete], axis=0, return_inverse=True)
+            group = group.ravel()
+            for group_id, mask in enumerate(masks):
+                rows = incomplete[group == group_id]
+                X[rows] = self._impute_group(X[rows], ~mask)
+            return X
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def __getstate__(self):
+        #KD-trees are rebuilt on demand, pickling them would store the reference data twice
+        state = self.__dict__.copy()
+        for cache in ('_trees', '_trees_lock', '_mask_counts'):
+            state.pop(cache, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_caches()
+
+    def _reset_caches(self)->None:
+        self._trees, self._trees_lock, self._mask_counts = OrderedDict(), threading.Lock(), {}
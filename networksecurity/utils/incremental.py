@@ -0,0 +1,73 @@
+import sys
+import math
+import copy
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+
+def row_hashes(features:np.ndarray, labels:np.ndarray)->np.ndarray:
+    '''
+        Returns one uint64 hash per training row (features and label), used to tell which rows a model has
+        already been trained on. Vectorized, a few milliseconds per 100k rows.
+    '''
+    try:
+        frame = pd.DataFrame(np.asarray(features))
+        frame['label'] = np.asarray(labels)
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+def replay_sample(new_rows:np.ndarray, old_rows:np.ndarray, replay_ratio:float, random_state:int=42)->np.ndarray:
+    '''
+        Returns the indices to continue training on: every new row and replay_ratio times as many old rows drawn at
+        random, so added trees see both classes and do not only fit the latest rows.
+    '''
+    rng = np.random.default_rng(random_state)
+    n_replay = min(len(old_rows), int(math.ceil(len(new_rows) * replay_ratio)))
+    return np.sort(np.concatenate([new_rows, rng.choice(old_rows, size=n_replay, replace=False)]))
+
+
+def continue_training(model, X, y, growth:float):
+    '''
+        Returns a copy of the fitted model trained further on (X, y), or None when the model type has no
+        incremental path (DecisionTree, AdaBoost: retrain them in full).
+            RandomForest / ExtraTrees: warm_start adds trees fitted on (X, y)
+            GradientBoosting: warm_start adds boosting stages fitted on the residuals of (X, y)
+            LogisticRegression: warm_start refits (X, y) starting from the current coefficients
+        Ensembles grow by growth times their size (at least one estimator), the share of new rows, so the
+        work done is proportional to the rows added, not to the whole training set.
+    '''
+    try:
+        if not np.array_equal(np.unique(y), model.classes_):
+            logging.info('Incremental rows do not cover every class of the model, it cannot be continued')
+            return None
+        updated = copy.deepcopy(model)
+        if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier)):
+            n_estimators = len(model.estimators_)
+            n_added = max(1, int(math.ceil(n_estimators * growth)))
+            updated.set_params(warm_start=True, n_estimators=n_estimators + n_added)
+            if isinstance(model, GradientBoostingClassifier):
+                updated.set_params(n_iter_no_change=None) #add exactly n_added stages
+            logging.info(f'Adding {n_added} estimators to {type(model).__name__} ({n_estimators}) on {len(X)} rows')
+        elif isinstance(model, LogisticRegression):
+            updated.set_params(warm_start=True)
+            logging.info(f'Refitting LogisticRegression from its coefficients on {len(X)} rows')
+        else:
+            return None
+        updated.fit(X, y)
+        updated.set_params(warm_start=False)
+        return updated
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
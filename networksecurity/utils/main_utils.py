@@ -3,6 +3,14 @@ import yaml
 import numpy as np
 import pandas as pd
 import dill, pickle
+import hashlib
+import shutil
+import time
+import tracemalloc
+try:
+    import resource
+except ImportError: #Windows, peak RSS is not reported
+    resource = None
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
 
@@ -15,6 +23,158 @@ def read_csv_data(file_path)->pd.DataFrame:
         logging.error(custom_err)
         raise custom_err
 
+def apply_schema_dtypes(dataframe:pd.DataFrame, schema_columns:dict)->pd.DataFrame:
+    '''
+        Casts the columns listed in the schema (column -> dtype, e.g. int8) to their dtype.
+        Integer columns with missing values become float32 since integers cannot hold NaN.
+    '''
+    try:
+        dtypes = {}
+        for column, dtype in schema_columns.items():
+            if column not in dataframe.columns:
+                continue
+            if np.issubdtype(np.dtype(dtype), np.integer) and dataframe[column].isna().any():
+                dtypes[column] = np.float32
+            else:
+                dtypes[column] = dtype
+        return dataframe.astype(dtypes)
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+def write_dataframe(file_path:str, dataframe:pd.DataFrame, schema_columns:dict=None)->None:
+    '''
+        Writes a dataframe artifact in the format given by the file extension (.feather, .parquet or .csv),
+        cast to the schema dtypes when given. Feather files are uncompressed so they can be memory-mapped.
+        The file is replaced atomically.
+    '''
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if schema_columns is not None:
+            dataframe = apply_schema_dtypes(dataframe, schema_columns)
+        dataframe = dataframe.reset_index(drop=True)
+        tmp_file_path = f'{file_path}.tmp'
+        extension = os.path.splitext(file_path)[1]
+        if extension == '.feather':
+            import pyarrow.feather as feather
+            feather.write_feather(dataframe, tmp_file_path, compression='uncompressed')
+        elif extension == '.parquet':
+            dataframe.to_parquet(tmp_file_path, index=False)
+        elif extension == '.csv':
+            dataframe.to_csv(tmp_file_path, index=False, header=True)
+        else:
+            raise ValueError(f'Unsupported artifact format {extension}, expected .feather, .parquet or .csv')
+        os.replace(tmp_file_path, file_path)
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+def read_dataframe(file_path:str, memory_map:bool=True)->pd.DataFrame:
+    '''
+        Reads a dataframe artifact written by write_dataframe, memory-mapping columnar files.
+    '''
+    try:
+        extension = os.path.splitext(file_path)[1]
+        if extension == '.feather':
+            import pyarrow.feather as feather
+            return feather.read_feather(file_path, memory_map=memory_map)
+        if extension == '.parquet':
+            return pd.read_parquet(file_path, memory_map=memory_map)
+        return pd.read_csv(file_path)
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+def link_or_copy(source_file_path:str, target_file_path:str)->None:
+    '''
+        Makes target_file_path refer to the same data as source_file_path: a hard link where the file system
+        allows it, otherwise a copy. Used to hand unchanged artifacts to the next stage without rewriting them.
+    '''
+    try:
+        os.makedirs(os.path.dirname(target_file_path), exist_ok=True)
+        if os.path.lexists(target_file_path):
+            os.remove(target_file_path)
+        try:
+            os.link(source_file_path, target_file_path)
+        except OSError:
+            shutil.copyfile(source_file_path, target_file_path)
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+def _peak_rss_mb()->float:
+    if resource is None:
+        return 0.0
+    #ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+def measure(fn, *args, **kwargs)->tuple:
+    '''
+        Runs fn twice and returns (result of the first run, stats). The first run is timed and gives
+        peak_rss_growth_mb, how far it raised the process's peak RSS (0 if an earlier peak was higher); the second
+        runs under tracemalloc, which slows allocations down, for peak_traced_mb, the most memory Python and numpy
+        held at once.
+    '''
+    try:
+        rss_before = _peak_rss_mb()
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        stats = {'seconds': round(time.perf_counter() - started, 3),
+                 'peak_rss_growth_mb': round(_peak_rss_mb() - rss_before, 1)}
+        tracemalloc.start()
+        try:
+            fn(*args, **kwargs)
+            stats['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        finally:
+            tracemalloc.stop()
+        return result, stats
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+def benchmark_artifact_formats(dataframe:pd.DataFrame, output_dir:str, schema_columns:dict,
+                               formats:tuple=('csv', 'parquet', 'feather'))->dict:
+    '''
+        Times the stage hand-offs of each format on the dataframe: ingestion write, validation read and
+        hand-off (CSV rewrite as before versus hard link) and transformation read, and reports the file size.
+    '''
+    try:
+        report = {}
+        for file_format in formats:
+            ingested = os.path.join(output_dir, 'ingested', f'data.{file_format}')
+            validated = os.path.join(output_dir, 'validated', f'data.{file_format}')
+            timings = {}
+            started = time.perf_counter()
+            write_dataframe(ingested, dataframe, schema_columns if file_format != 'csv' else None)
+            timings['ingestion_write_seconds'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            validated_df = read_dataframe(ingested)
+            if file_format == 'csv':
+                write_dataframe(validated, validated_df)
+            else:
+                link_or_copy(ingested, validated)
+            timings['validation_seconds'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            read_dataframe(validated)
+            timings['transformation_read_seconds'] = time.perf_counter() - started
+
+            timings['total_seconds'] = sum(timings.values())
+            timings = {name: round(seconds, 4) for name, seconds in timings.items()}
+            timings['size_bytes'] = os.path.getsize(ingested)
+            report[file_format] = timings
+        return report
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
 def read_yaml_file(file_path: str)->dict:
     #Reads and loads a yaml file as a dictionary
     try:
@@ -44,27 +204,28 @@ def write_yaml_file(file_path: str, content:object, replace: bool = False)->None
             logging.error(custom_err)
             raise custom_err
 
-def save_numpy_array_data(file_path: str, array: np.array):
+def save_numpy_array_data(file_path: str, array: np.array, dtype=None):
     '''
-        Creates directory for file and saves numpy array data to file.
+        Creates directory for file and saves numpy array data to file, converted to dtype when given.
+        The array is stored C-contiguous so it can be memory-mapped as is.
     '''
     try:
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, 'wb') as file_obj:
-             np.save(file_obj, array)
+             np.save(file_obj, np.ascontiguousarray(array, dtype=dtype))
         
     except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
     
-def load_numpy_array_data(file_path: str):
+def load_numpy_array_data(file_path: str, mmap_mode: str = None):
     '''
-        Loads numpy array from file
+        Loads numpy array from file. With mmap_mode (e.g. 'r') the file is memory-mapped instead of read into RAM;
+        joblib hands such arrays to its workers by file name, so every process shares the same pages.
     '''
     try:
-        with open(file_path, 'rb') as file_obj:
-             return np.load(file_obj)
+        return np.load(file_path, mmap_mode=mmap_mode)
         
     except Exception as e:
             custom_err = CustomException(e, sys)
@@ -74,11 +235,15 @@ def load_numpy_array_data(file_path: str):
 def save_object(file_path:str, obj:object)->None:
     '''
         Creates directory for file and saves object files in .pkl format.
+        The file is replaced atomically so it can be hot-reloaded while being served.
     '''
     try:
          os.makedirs(os.path.dirname(file_path), exist_ok=True)
-         with open (file_path, 'wb') as file_obj:
+         #Write to a temporary file first so readers never see a half-written object
+         tmp_file_path = f'{file_path}.tmp'
+         with open (tmp_file_path, 'wb') as file_obj:
               pickle.dump(obj, file_obj)
+         os.replace(tmp_file_path, file_path)
         
     except Exception as e:
             custom_err = CustomException(e, sys)
@@ -98,4 +263,20 @@ def load_object(file_path:str)->None:
     except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
-            raise custom_err
\ No newline at end of file
+            raise custom_err
+
+def load_object_with_hash(file_path:str)->tuple:
+    '''
+        Loads object file from path and returns it together with the sha256 hash of the bytes it was loaded from.
+    '''
+    try:
+         if not os.path.exists(file_path):
+              raise Exception(f'The file: {file_path} does not exist!')
+         with open (file_path, 'rb') as file_obj:
+              data = file_obj.read()
+         return pickle.loads(data), hashlib.sha256(data).hexdigest()
+        
+    except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
@@ -1,52 +1,193 @@
 import os, sys
+import time
+import queue
+import threading
+from dataclasses import asdict
 from dotenv import load_dotenv
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
-from networksecurity.entity.config_entity import TrainingPipelineConfig, ModelTrainerConfig
 
-import mlflow
-import mlflow.sklearn
-import dagshub
-import joblib
+from networksecurity.constants.training_pipeline import (
+    MLFLOW_EXPERIMENT_NAME,
+    MLFLOW_RUN_NAME,
+    MLFLOW_FALLBACK_TRACKING_DIR,
+    MLFLOW_FLUSH_INTERVAL,
+)
 
+#Most entries the tracking server accepts in one log_batch call
+MAX_BATCH_METRICS = 1000
+MAX_BATCH_PARAMS = 100
+MAX_BATCH_TAGS = 100
 
-#Load credentials and uri for mlflow and dagshub
-load_dotenv()
-mlflow_tracking_uri = os.getenv("MLFLOW_TRACKING_URI")
-mlflow_username = os.getenv("MLFLOW_TRACKING_USERNAME")
-mlflow_password = os.getenv("MLFLOW_TRACKING_PASSWORD")
 
-os.environ["MLFLOW_TRACKING_URI"] = mlflow_tracking_uri
-os.environ["MLFLOW_TRACKING_USERNAME"] = mlflow_username
-os.environ["MLFLOW_TRACKING_PASSWORD"] = mlflow_password
+class MlflowTracker:
+    '''
+        Tracking sink for one training run. log_* calls only enqueue and return at once, training never waits
+        for the tracking server:
+        - a background thread creates the MLflow run and sends queued metrics, params and tags with one
+          log_batch call per flush (every flush_interval seconds)
+        - a second thread uploads artifacts, existing files are uploaded as they are, nothing is dumped again
+        The tracking URI is MLFLOW_TRACKING_URI (from the environment or .env); without one runs go to a local
+        file store in fallback_dir. mlflow is imported by the background thread. Tracking errors are logged as
+        warnings and never reach training.
+    '''
+    def __init__(self, tracking_uri:str=None, experiment_name:str=None, run_name:str=MLFLOW_RUN_NAME,
+                 fallback_dir:str=MLFLOW_FALLBACK_TRACKING_DIR, flush_interval:float=MLFLOW_FLUSH_INTERVAL):
+        try:
+            self.tracking_uri = tracking_uri
+            self.experiment_name = experiment_name
+            self.run_name = run_name
+            self.fallback_dir = fallback_dir
+            self.flush_interval = flush_interval
+            self.run_id = None
+            self._events = queue.Queue()
+            self._artifacts = queue.Queue()
+            self._run_ready = threading.Event()
+            self._logger = None
+            self._uploader = None
 
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
 
-def track_mlflow(best_model, classification_metric):
+    def start(self, tags:dict=None)->'MlflowTracker':
         '''
-        Tracks machine learning lifecycle using MLflow including metrics and models
+            Starts the background threads, the MLflow run is created by them. They are not daemons, so a process
+            that finishes training still delivers what was queued before it exits.
         '''
-        try:
-            with mlflow.start_run(run_name="model_tracking"):
+        if self._logger is None:
+            if tags:
+                self.set_tags(tags)
+            self._logger = threading.Thread(target=self._log_loop, name='mlflow-logger')
+            self._uploader = threading.Thread(target=self._upload_loop, name='mlflow-uploader')
+            self._logger.start()
+            self._uploader.start()
+        return self
+
+    def set_tags(self, tags:dict)->None:
+        self._events.put(('tags', {key: str(value) for key, value in tags.items()}))
+
+    def log_params(self, params:dict, prefix:str='')->None:
+        self._events.put(('params', {f'{prefix}{key}': str(value) for key, value in params.items()}))
+
+    def log_metrics(self, metrics:dict, prefix:str='')->None:
+        self._events.put(('metrics', {f'{prefix}{key}': float(value) for key, value in metrics.items()
+                                      if value is not None}))
+
+    def log_classification_metric(self, classification_metric, prefix:str='')->None:
+        self.log_metrics(asdict(classification_metric), prefix=prefix)
+
+    def log_candidates(self, model_report:dict, search_report:dict)->None:
+        '''
+            Logs every candidate model of evaluate_models: test f1, the search's best parameters, cv score,
+            fits and time, and the screening result (pruned models only have that).
+        '''
+        for model_name in dict.fromkeys(list(model_report) + list(search_report)):
+            entry = search_report.get(model_name, {})
+            prefix = f'{model_name}.'
+            self.log_metrics({'test_f1': model_report.get(model_name),
+                              'cv_score': entry.get('cv_score'),
+                              'n_fits': entry.get('n_fits'),
+                              'search_seconds': entry.get('seconds'),
+                              'screening_f1': entry.get('screening', {}).get('screening_f1')}, prefix=prefix)
+            self.log_params(entry.get('best_params', {}), prefix=prefix)
+            if entry.get('screening', {}).get('pruned'):
+                self.set_tags({f'{prefix}pruned': True})
 
-                # Optional: Log parameters or tags (for better organization)
-                mlflow.set_tags({"model_type": type(best_model).__name__})
+    def log_artifact(self, file_path:str, artifact_path:str=None)->None:
+        self._artifacts.put((file_path, artifact_path))
 
-                # Log metrics
-                mlflow.log_metric("f1_score", classification_metric.f1_score)
-                mlflow.log_metric("precision", classification_metric.precision_score)
-                mlflow.log_metric("recall_score", classification_metric.recall_score)
+    def close(self, wait:bool=False, timeout:float=None)->None:
+        '''
+            Ends the run once everything queued is sent. Returns at once unless wait is True.
+        '''
+        if self._logger is None:
+            return
+        self._events.put(None)
+        self._artifacts.put(None)
+        if wait:
+            self._logger.join(timeout)
+            self._uploader.join(timeout)
 
-                # Save model locally
-                training_pipeline_config = TrainingPipelineConfig()
-                model_trainer_config = ModelTrainerConfig(training_pipeline_config)
-                model_path = f"{model_trainer_config.model_trainer_dir}/mlflow_artifact/best_model.pkl"
-                os.makedirs(os.path.dirname(model_path), exist_ok=True)
-                joblib.dump(best_model, model_path)
+    def _client(self):
+        from mlflow.tracking import MlflowClient
+        load_dotenv()
+        tracking_uri = self.tracking_uri or os.getenv('MLFLOW_TRACKING_URI')
+        if not tracking_uri:
+            tracking_uri = f'file://{os.path.abspath(self.fallback_dir)}'
+            #Recent mlflow versions only write the file store after this opt-in
+            os.environ.setdefault('MLFLOW_ALLOW_FILE_STORE', 'true')
+            logging.info(f'MLFLOW_TRACKING_URI is not set, tracking to the local file store {tracking_uri}')
+        self.tracking_uri = tracking_uri
+        client = MlflowClient(tracking_uri=tracking_uri)
+        experiment_name = self.experiment_name or os.getenv('MLFLOW_EXPERIMENT_NAME') or MLFLOW_EXPERIMENT_NAME
+        experiment = client.get_experiment_by_name(experiment_name)
+        experiment_id = experiment.experiment_id if experiment else client.create_experiment(experiment_name)
+        self.run_id = client.create_run(experiment_id, run_name=self.run_name).info.run_id
+        return client
 
-                # Log as artifact instead of using model registry
-                mlflow.log_artifact(model_path, artifact_path="model")
+    def _send(self, client, metrics:dict, params:dict, tags:dict)->None:
+        from mlflow.entities import Metric, Param, RunTag
+        timestamp = int(time.time() * 1000)
+        metrics = [Metric(key, value, timestamp, 0) for key, value in metrics.items()]
+        params = [Param(key, value) for key, value in params.items()]
+        tags = [RunTag(key, value) for key, value in tags.items()]
+        while metrics or params or tags:
+            client.log_batch(self.run_id, metrics=metrics[:MAX_BATCH_METRICS], params=params[:MAX_BATCH_PARAMS],
+                             tags=tags[:MAX_BATCH_TAGS])
+            metrics, params, tags = metrics[MAX_BATCH_METRICS:], params[MAX_BATCH_PARAMS:], tags[MAX_BATCH_TAGS:]
 
+    def _log_loop(self)->None:
+        client, status = None, 'FINISHED'
+        try:
+            client = self._client()
         except Exception as e:
-            custom_err = CustomException(e, sys)
-            logging.error(custom_err)
-            raise custom_err
\ No newline at end of file
+            logging.warning(f'MLflow tracking disabled, the run could not be created: {e}')
+        finally:
+            self._run_ready.set()
+
+        closed = False
+        while not closed:
+            metrics, params, tags = {}, {}, {}
+            deadline = time.monotonic() + self.flush_interval
+            #Collect everything queued until the next flush into one batch
+            while True:
+                try:
+                    event = self._events.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    closed = True
+                    break
+                kind, values = event
+                {'metrics': metrics, 'params': params, 'tags': tags}[kind].update(values)
+            if client is None or not (metrics or params or tags):
+                continue
+            try:
+                self._send(client, metrics, params, tags)
+            except Exception as e:
+                status = 'FAILED'
+                logging.warning(f'Could not send {len(metrics)} metrics and {len(params)} params to MLflow: {e}')
+
+        self._uploader.join()
+        if client is not None:
+            try:
+                client.set_terminated(self.run_id, status=status)
+            except Exception as e:
+                logging.warning(f'Could not end MLflow run {self.run_id}: {e}')
+
+    def _upload_loop(self)->None:
+        self._run_ready.wait()
+        while True:
+            item = self._artifacts.get()
+            if item is None:
+                return
+            if self.run_id is None:
+                continue
+            file_path, artifact_path = item
+            try:
+                from mlflow.tracking import MlflowClient
+                MlflowClient(tracking_uri=self.tracking_uri).log_artifact(self.run_id, file_path, artifact_path)
+            except Exception as e:
+                logging.warning(f'Could not upload {file_path} to MLflow: {e}')
@@ -1,59 +1,161 @@
 import sys
-from datetime import datetime
 import os
 from networksecurity.logging_exception.exception import CustomException
 from networksecurity.logging_exception.logger import logging
 
 from networksecurity.entity.artifact_entity import ClassificationMetricArtifact
-from networksecurity.constants.training_pipeline import TRAINING_BUCKET_NAME
-from networksecurity.cloud.s3_syncer import S3Sync
 
-from sklearn.metrics import r2_score
+import numpy as np
 from sklearn.metrics import f1_score,precision_score,recall_score
-from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import train_test_split, ParameterGrid
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
 
+from networksecurity.utils.fit_scheduler import FitScheduler
+from networksecurity.utils.model_search import search_model
 
-def evaluate_models(X_train, y_train, X_test, y_test, models, param):
+
+def _f1(model, X, y)->float:
+    return get_classification_score(y_true=y, y_pred=model.predict(X)).f1_score
+
+
+def screen_models(X_train, y_train, models, param, screening_params:dict, expected_score:float,
+                  scheduler:FitScheduler)->tuple:
+    '''
+        Fits every model with default parameters on a small stratified subsample of the training rows and scores
+        it (f1) on another. Models more than margin behind the leader, or below expected_score, are pruned
+        before their hyperparameter search. The leader is never pruned. Returns (names of the surviving models, screening report per model).
+        The report of a pruned model estimates the time saved: its screening fit scaled to all training rows,
+        times the fits an exhaustive search of its grid would run (an upper bound for the other strategies).
+    '''
+    sample_size, validation_size = screening_params['sample_size'], screening_params['validation_size']
+    if len(y_train) <= sample_size + validation_size:
+        logging.info(f'Only {len(y_train)} training rows, no model screening.')
+        return list(models), {}
+    sample, validation = train_test_split(np.arange(len(y_train)), train_size=sample_size, test_size=validation_size,
+                                          stratify=np.asarray(y_train), random_state=42)
+    sample, validation = np.sort(sample), np.sort(validation)
+    futures = {model_name: scheduler.submit(model_fn(), {}, X_train, y_train, sample, validation, scoring='f1',
+                                            label={'model': model_name, 'fold': 'screening'})
+               for model_name, model_fn in models.items()}
+    scores = {model_name: future.result() for model_name, future in futures.items()}
+    seconds = {task['model']: task['seconds'] for task in scheduler.timeline()['tasks'] if task.get('fold') == 'screening'}
+
+    leader = max(scores, key=scores.get)
+    survivors, screening_report = [], {}
+    for model_name, score in scores.items():
+        gap = scores[leader] - score
+        pruned = model_name != leader and (gap > screening_params['margin'] or score < expected_score)
+        screening_report[model_name] = {'screening_f1': float(score), 'gap_to_leader': float(gap), 'pruned': bool(pruned)}
+        if not pruned:
+            survivors.append(model_name)
+            continue
+        n_fits = len(ParameterGrid(param.get(model_name, {}))) * screening_params.get('cv', 3) + 1
+        saved = seconds.get(model_name, 0.0) * len(y_train) / sample_size * n_fits
+        screening_report[model_name]['estimated_seconds_saved'] = round(saved, 2)
+        logging.info(f'Pruned {model_name}: screening f1 {score:.4f}, {gap:.4f} behind {leader} ({scores[leader]:.4f}), '
+                     f'search skipped, up to ~{saved:.1f}s saved')
+    logging.info(f'Model screening on {sample_size} rows kept {survivors}')
+    return survivors, screening_report
+
+
+def _search_one_model(model_name, model_fn, param_grid:dict, X_train, y_train, X_test, y_test,
+                      search_params:dict, baseline_strategy:str, scheduler:FitScheduler)->tuple:
+    '''
+        Tunes (or just fits, without a grid) one model on the shared scheduler and returns
+        (model, f1 test score, search report entry or None). model and score are None when the search was skipped.
+    '''
+    if not param_grid:
+        model = scheduler.submit(model_fn(), {}, X_train, y_train, label={'model': model_name, 'fold': 'refit'}).result()
+        return model, _f1(model, X_test, y_test), None
+
+    model, search_artifact = search_model(model_fn(), param_grid, X_train, y_train, **search_params,
+                                          scheduler=scheduler, label=model_name)
+    if model is None:
+        return None, None, asdict(search_artifact)
+    test_model_score = _f1(model, X_test, y_test)
+    entry = dict(asdict(search_artifact), test_score=float(test_model_score))
+    if baseline_strategy and baseline_strategy != search_params.get('strategy'):
+        baseline_params = dict(search_params, strategy=baseline_strategy, time_budget=None)
+        baseline_model, baseline_artifact = search_model(model_fn(), param_grid, X_train, y_train, **baseline_params,
+                                                         scheduler=scheduler, label=f'{model_name} ({baseline_strategy})')
+        baseline = dict(asdict(baseline_artifact), test_score=float(_f1(baseline_model, X_test, y_test)))
+        entry.update({
+            'baseline': baseline,
+            'test_score_delta': entry['test_score'] - baseline['test_score'],
+            'speedup': baseline['seconds'] / max(entry['seconds'], 1e-9),
+        })
+    return model, test_model_score, entry
+
+
+def evaluate_models(X_train, y_train, X_test, y_test, models, param, search_params:dict=None, baseline_strategy:str=None,
+                    scheduler:FitScheduler=None, screening_params:dict=None, expected_score:float=0.0):
     '''
         Evaluates multiple models with given hyperparameters and returns:
-        - a dictionary of test scores
+        - a dictionary of test scores (f1)
         - the best performing trained model
+        - a search report per model: the search strategy's results, and with baseline_strategy (e.g. "exhaustive")
+          the same search run with that strategy, for comparing score and time
+        Hyperparameters are searched with model_search.search_model, configured by search_params.
+        With screening_params, models are first screened on a subsample (see screen_models) and only the
+        survivors are searched; the screening result is in their search report entry.
+        Raises ValueError when no model was trained or the best test f1 is below expected_score.
+        All models are searched at the same time, their fits sharing the scheduler's cores (all cores when no
+        scheduler is given), so cheap models do not wait for the ensembles to finish.
     '''
+    own_scheduler = scheduler is None
     try:
         report = {}
+        search_report = {}
         best_model = None
         best_model_name = None
         best_score = float('-inf')  # Initialize to negative infinity
+        search_params = dict(search_params or {})
+        if own_scheduler:
+            scheduler = FitScheduler()
 
-        for model_name, model_fn in models.items():
-            model = model_fn()
-            param_grid = param.get(model_name, {})
-
-            if param_grid:
-                gs = GridSearchCV(model, param_grid, cv=3, n_jobs=-1)
-                gs.fit(X_train, y_train)
-                model = gs.best_estimator_
-            else:
-                model.fit(X_train, y_train)
+        if screening_params:
+            survivors, screening_report = screen_models(X_train, y_train, models, param, dict(screening_params, cv=search_params.get('cv', 3)),
+                                                        expected_score, scheduler)
+            search_report.update({model_name: {'screening': entry} for model_name, entry in screening_report.items()})
+            models = {model_name: model_fn for model_name, model_fn in models.items() if model_name in survivors}
 
-            y_test_pred = model.predict(X_test)
-            test_model_score = r2_score(y_test, y_test_pred)
+        #One thread per model only waits on its fits, the work runs in the scheduler's worker processes
+        with ThreadPoolExecutor(max_workers=max(1, len(models)), thread_name_prefix='model-search') as executor:
+            futures = {model_name: executor.submit(_search_one_model, model_name, model_fn, param.get(model_name, {}),
+                                                   X_train, y_train, X_test, y_test, search_params, baseline_strategy, scheduler)
+                       for model_name, model_fn in models.items()}
 
-            report[model_name] = test_model_score
+            for model_name, future in futures.items():
+                model, test_model_score, entry = future.result()
+                if entry is not None:
+                    search_report[model_name] = dict(search_report.get(model_name, {}), **entry)
+                if model is None:
+                    logging.warning(f'{model_name} was skipped, its search scored no candidate within the time budget')
+                    continue
+                report[model_name] = test_model_score
 
-            # Keep track of the best model
-            if test_model_score > best_score:
-                best_score = test_model_score
-                best_model = model
-                best_model_name = model_name
+                # Keep track of the best model
+                if test_model_score > best_score:
+                    best_score = test_model_score
+                    best_model = model
+                    best_model_name = model_name
 
-        return report, best_model, best_model_name, best_score
+        if best_model is None:
+            raise ValueError(f'No model was trained: every search was skipped within its time budget {search_report}')
+        if best_score < expected_score:
+            raise ValueError(f'No model met expected_score {expected_score}: best was {best_model_name} '
+                             f'with test f1 {best_score:.4f} {report}')
+        return report, best_model, best_model_name, best_score, search_report
 
     except Exception as e:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
-    
+    finally:
+        if own_scheduler and scheduler is not None:
+            scheduler.shutdown()
+
 
 def get_classification_score(y_true,y_pred)->ClassificationMetricArtifact:
     '''
@@ -98,22 +200,3 @@ class NetworkModel:
             custom_err = CustomException(e, sys)
             logging.error(custom_err)
             raise custom_err
-        
-
-def sync_prediction_dir_to_s3(df):
-        try:
-            # saving in local folder
-            save_location = f'prediction_output/{datetime.now().strftime("%Y%m%d%H%M%S")}'
-            os.makedirs(save_location,exist_ok=True)
-            df.to_csv(f'{save_location}/output.csv') 
-            
-            # saving in s3 bucket
-            s3_sync = S3Sync()
-            aws_bucket_url = f"s3://{TRAINING_BUCKET_NAME}/{save_location}"
-            s3_sync.sync_folder_to_s3(folder = save_location, aws_bucket_url=aws_bucket_url)
-            logging.info(f"Prediction output synced to s3 bucket: {aws_bucket_url}")
-        
-        except Exception as e:
-            custom_err = CustomException(e, sys)
-            logging.error(custom_err)
-            raise custom_err
\ No newline at end of file
@@ -0,0 +1,473 @@
+import os, sys
+import io
+import json
+import time
+import pickle
+import hashlib
+import threading
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import sklearn
+from sklearn.pipeline import Pipeline
+from sklearn.impute import KNNImputer, SimpleImputer
+from sklearn.linear_model import LogisticRegression
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.constants.training_pipeline import MODEL_BUNDLE_DATA_DIR_NAME, MODEL_BUNDLE_VERIFY_ON_LOAD
+from networksecurity.utils import main_utils
+from networksecurity.utils.imputer import PatternImputer
+from networksecurity.utils.ml_utils import NetworkModel
+from networksecurity.utils.compiled_model import CompiledTreeEnsemble
+
+BUNDLE_FORMAT = 'networksecurity-model-bundle'
+BUNDLE_FORMAT_VERSION = 1
+MMAP_MIN_BYTES = 4096 #smaller arrays (scalars, class labels) are read, mapping them would save nothing
+#Estimators stored as arrays and plain attributes and rebuilt without unpickling. A manifest can only name these
+SAFE_ESTIMATORS = {cls.__name__: cls for cls in (Pipeline, PatternImputer, KNNImputer, SimpleImputer, LogisticRegression)}
+
+
+def _sha256(data:bytes)->str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hash_file(file_path:str)->str:
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file_obj:
+        for block in iter(lambda: file_obj.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _write_data_file(data_dir:str, name:str, data:bytes)->None:
+    file_path = os.path.join(data_dir, name)
+    if os.path.exists(file_path): #content-addressed: an existing file has these bytes
+        return
+    tmp_file_path = f'{file_path}.tmp'
+    with open(tmp_file_path, 'wb') as file_obj:
+        file_obj.write(data)
+    os.replace(tmp_file_path, file_path)
+
+
+class _BundleWriter:
+    '''
+        Writes the arrays and pickles of one bundle into data_dir as <sha256>.npy / <sha256>.pkl.
+    '''
+    def __init__(self, data_dir:str):
+        self.data_dir = data_dir
+        self.files = {}
+
+    def put_array(self, array:np.ndarray)->str:
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        return self._put(buffer.getvalue(), '.npy')
+
+    def put_pickle(self, obj)->str:
+        return self._put(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), '.pkl')
+
+    def _put(self, data:bytes, extension:str)->str:
+        name = f'{_sha256(data)}{extension}'
+        _write_data_file(self.data_dir, name, data)
+        self.files[name] = len(data)
+        return name
+
+    def encode(self, value):
+        '''
+            JSON form of an attribute value: numeric arrays go to .npy files, everything else must be plain data.
+        '''
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.dtype):
+            return {'__dtype__': value.str}
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind in 'biuf':
+                return {'__array__': self.put_array(value)}
+            if value.ndim == 1 and all(isinstance(item, str) for item in value):
+                return {'__str_array__': value.tolist(), 'dtype': value.dtype.str if value.dtype.kind == 'U' else 'O'}
+        if isinstance(value, list):
+            return [self.encode(item) for item in value]
+        if isinstance(value, tuple):
+            return {'__tuple__': [self.encode(item) for item in value]}
+        if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+            return {'__dict__': {key: self.encode(item) for key, item in value.items()}}
+        raise TypeError(f'{type(value).__name__} cannot be stored in a model bundle')
+
+    def estimator_spec(self, estimator)->dict:
+        '''
+            Class name and encoded pickle state of an allowed estimator. Raises TypeError for anything else.
+        '''
+        class_name = type(estimator).__name__
+        if SAFE_ESTIMATORS.get(class_name) is not type(estimator):
+            raise TypeError(f'{class_name} is not stored as arrays')
+        state = dict(estimator.__getstate__())
+        if isinstance(estimator, Pipeline):
+            steps = [[name, self.estimator_spec(step)] for name, step in state.pop('steps')]
+            return {'class': class_name, 'steps': steps, 'state': self.encode(state)}
+        return {'class': class_name, 'state': self.encode(state)}
+
+
+class ModelBundle:
+    '''
+        NetworkModel loaded from a bundle. The preprocessor, the compiled tree ensemble and array-stored models are
+        rebuilt around memory-mapped arrays, so loading reads almost nothing and every worker shares the pages.
+        A model stored only as a pickle (tree ensembles keep one for large batches and incremental training)
+        is checked against its hash and unpickled the first time .model is used.
+        predict() returns what NetworkModel.predict returns.
+    '''
+    def __init__(self, file_path:str, manifest:dict, file_hash:str):
+        try:
+            self.file_path = file_path
+            self.data_dir = os.path.join(os.path.dirname(file_path), MODEL_BUNDLE_DATA_DIR_NAME)
+            self.manifest = manifest
+            self.file_hash = file_hash
+            self.model_type = manifest['model_type']
+            self._lock = threading.Lock()
+            self._model = self._build(manifest['model']) if manifest['model'] is not None else None
+            if manifest['preprocessor'] is not None:
+                self.preprocessor = self._build(manifest['preprocessor'])
+            else:
+                self.preprocessor = self._unpickle(manifest['pickles']['preprocessor'])
+            self.classes_ = self._decode(manifest['classes'])
+            self.compiled_model = None
+            compiled = manifest['compiled_model']
+            if compiled is not None:
+                arrays = {name: self._decode(value) for name, value in compiled['arrays'].items()}
+                self.compiled_model = CompiledTreeEnsemble(kind=compiled['kind'], arrays=arrays,
+                                                           classes=self.classes_, params=compiled['params'])
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def _array(self, name:str)->np.ndarray:
+        file_path = os.path.join(self.data_dir, name)
+        if os.path.getsize(file_path) < MMAP_MIN_BYTES:
+            return np.load(file_path, allow_pickle=False)
+        #Read-only view of the mapped file, plain ndarray so results of operations are not memmaps
+        return np.load(file_path, mmap_mode='r', allow_pickle=False).view(np.ndarray)
+
+    def _unpickle(self, name:str):
+        with open(os.path.join(self.data_dir, name), 'rb') as file_obj:
+            data = file_obj.read()
+        #Nothing is unpickled unless it is exactly what the manifest recorded
+        if f'{_sha256(data)}.pkl' != name:
+            raise ValueError(f'{name} in {self.data_dir} does not match its hash')
+        return pickle.loads(data)
+
+    def _decode(self, value):
+        if isinstance(value, list):
+            return [self._decode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if '__array__' in value:
+            return self._array(value['__array__'])
+        if '__str_array__' in value:
+            return np.array(value['__str_array__'], dtype=value['dtype'])
+        if '__dtype__' in value:
+            return np.dtype(value['__dtype__'])
+        if '__tuple__' in value:
+            return tuple(self._decode(item) for item in value['__tuple__'])
+        return {key: self._decode(item) for key, item in value['__dict__'].items()}
+
+    def _build(self, spec:dict):
+        #The class comes from the allowlist, its state is set the way unpickling would set it
+        estimator_class = SAFE_ESTIMATORS[spec['class']]
+        state = self._decode(spec['state'])
+        if 'steps' in spec:
+            state['steps'] = [(name, self._build(step)) for name, step in spec['steps']]
+        estimator = estimator_class.__new__(estimator_class)
+        estimator.__setstate__(state)
+        return estimator
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = self._unpickle(self.manifest['pickles']['model'])
+                    logging.info(f'Unpickled {self.model_type} of {self.file_path} in {time.perf_counter() - started:.2f}s')
+        return self._model
+
+    def predict(self, x):
+        try:
+            return self.model.predict(self.preprocessor.transform(x))
+
+        except Exception as e:
+            custom_err = CustomException(e, sys)
+            logging.error(custom_err)
+            raise custom_err
+
+    def to_network_model(self)->NetworkModel:
+        return NetworkModel(preprocessor=self.preprocessor, model=self.model)
+
+
+def _data_dir(file_path:str)->str:
+    return os.path.join(os.path.dirname(file_path), MODEL_BUNDLE_DATA_DIR_NAME)
+
+
+def _read_manifest(file_path:str)->tuple:
+    with open(file_path, 'rb') as file_obj:
+        data = file_obj.read()
+    manifest = json.loads(data)
+    if manifest.get('format') != BUNDLE_FORMAT or manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f'{file_path} is not a version {BUNDLE_FORMAT_VERSION} model bundle')
+    return manifest, _sha256(data)
+
+
+def _write_manifest(file_path:str, manifest:dict)->str:
+    data = json.dumps(manifest, indent=1, sort_keys=True).encode()
+    tmp_file_path = f'{file_path}.tmp'
+    with open(tmp_file_path, 'wb') as file_obj:
+        file_obj.write(data)
+    #Written after its data files, so a reader never finds a manifest whose arrays are missing
+    os.replace(tmp_file_path, file_path)
+    return _sha256(data)
+
+
+def _remove_unreferenced(data_dir:str, keep:set)->None:
+    '''
+        Deletes the data files no kept manifest refers to. Workers still serving a removed version keep their
+        mapping of the unlinked files; the previous version's files are kept so its lazy pickle stays loadable.
+    '''
+    for name in os.listdir(data_dir):
+        if name not in keep:
+            try:
+                os.remove(os.path.join(data_dir, name))
+            except OSError as e: #mapped files cannot be removed on Windows, they go with a later version
+                logging.warning(f'Could not remove {name} from {data_dir}: {e}')
+
+
+def _replace_manifest(file_path:str, manifest:dict)->str:
+    previous = set()
+    if os.path.exists(file_path):
+        try:
+            previous = set(_read_manifest(file_path)[0]['files'])
+        except Exception:
+            pass
+    file_hash = _write_manifest(file_path, manifest)
+    _remove_unreferenced(_data_dir(file_path), previous | set(manifest['files']))
+    return file_hash
+
+
+def save_model_bundle(file_path:str, network_model)->str:
+    '''
+        Saves the NetworkModel as a bundle: the manifest at file_path and its arrays and pickles in
+        MODEL_BUNDLE_DATA_DIR_NAME next to it, named by their sha256. Returns the manifest's sha256, the version.
+        - tree ensembles that compile are stored as CompiledTreeEnsemble node arrays, plus a pickle of the
+          estimator for large batches and incremental training
+        - allowed estimators (SAFE_ESTIMATORS) are stored as their arrays and attributes
+        - anything else is only pickled
+        The manifest is replaced atomically so serving workers hot-swap to it.
+    '''
+    try:
+        data_dir = _data_dir(file_path)
+        os.makedirs(data_dir, exist_ok=True)
+        writer = _BundleWriter(data_dir)
+        model = network_model.model
+        manifest = {
+            'format': BUNDLE_FORMAT,
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'sklearn_version': sklearn.__version__,
+            'model_type': type(model).__name__,
+            'classes': writer.encode(model.classes_),
+            'preprocessor': None,
+            'model': None,
+            'compiled_model': None,
+            'pickles': {},
+        }
+        try:
+            manifest['preprocessor'] = writer.estimator_spec(network_model.preprocessor)
+        except TypeError as e:
+            logging.info(f'Preprocessor is pickled in the bundle: {e}')
+            manifest['pickles']['preprocessor'] = writer.put_pickle(network_model.preprocessor)
+
+        compiled_model = CompiledTreeEnsemble.from_estimator(model)
+        if compiled_model is not None:
+            manifest['compiled_model'] = {'kind': compiled_model.kind, 'params': compiled_model.params,
+                                          'arrays': {name: writer.encode(array) for name, array in compiled_model.to_arrays().items()}}
+            manifest['pickles']['model'] = writer.put_pickle(model)
+        else:
+            try:
+                manifest['model'] = writer.estimator_spec(model)
+            except TypeError as e:
+                logging.info(f'Model is pickled in the bundle: {e}')
+                manifest['pickles']['model'] = writer.put_pickle(model)
+
+        manifest['files'] = writer.files
+        file_hash = _replace_manifest(file_path, manifest)
+        logging.info(f'Saved model bundle {file_path} version {file_hash[:12]}: {len(writer.files)} files, '
+                     f'{sum(writer.files.values())} bytes')
+        return file_hash
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+def copy_model_bundle(source_file_path:str, target_file_path:str)->bool:
+    '''
+        Makes target_file_path the same bundle as source_file_path without serializing it again: the data files
+        are hard-linked (copied where links are not possible) and then the manifest is replaced.
+        Returns False when the target already is this version.
+    '''
+    try:
+        manifest, file_hash = _read_manifest(source_file_path)
+        if os.path.exists(target_file_path):
+            try:
+                if _read_manifest(target_file_path)[1] == file_hash:
+                    return False
+            except Exception:
+                pass
+        source_data_dir, target_data_dir = _data_dir(source_file_path), _data_dir(target_file_path)
+        os.makedirs(target_data_dir, exist_ok=True)
+        for name in manifest['files']:
+            if not os.path.exists(os.path.join(target_data_dir, name)):
+                main_utils.link_or_copy(os.path.join(source_data_dir, name), os.path.join(target_data_dir, name))
+        _replace_manifest(target_file_path, manifest)
+        logging.info(f'{target_file_path} is now model bundle version {file_hash[:12]} from {source_file_path}')
+        return True
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+def verify_model_bundle(file_path:str)->list:
+    '''
+        Re-hashes every data file of the bundle and returns the names that are missing or do not match.
+    '''
+    manifest, _ = _read_manifest(file_path)
+    data_dir = _data_dir(file_path)
+    corrupted = []
+    for name, size in manifest['files'].items():
+        data_file_path = os.path.join(data_dir, name)
+        if not os.path.exists(data_file_path) or os.path.getsize(data_file_path) != size or \
+                f'{_hash_file(data_file_path)}{os.path.splitext(name)[1]}' != name:
+            corrupted.append(name)
+    return corrupted
+
+
+def load_model_with_hash(file_path:str, verify:bool=MODEL_BUNDLE_VERIFY_ON_LOAD)->tuple:
+    '''
+        Loads a model bundle (or a legacy .pkl model) and returns it with the sha256 of the file it was loaded from.
+        With verify, every data file is re-hashed first, which reads the whole bundle.
+    '''
+    try:
+        if file_path.endswith('.pkl'):
+            return main_utils.load_object_with_hash(file_path)
+        manifest, file_hash = _read_manifest(file_path)
+        if verify:
+            corrupted = verify_model_bundle(file_path)
+            if corrupted:
+                raise ValueError(f'Model bundle {file_path} has missing or corrupted files: {corrupted}')
+        return ModelBundle(file_path, manifest, file_hash), file_hash
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+def load_model(file_path:str, verify:bool=MODEL_BUNDLE_VERIFY_ON_LOAD):
+    return load_model_with_hash(file_path, verify=verify)[0]
+
+
+def model_file_hash(file_path:str)->str:
+    '''
+        Version of the model at file_path without loading it: the sha256 of the manifest (or legacy pickle).
+    '''
+    return _hash_file(file_path)
+
+
+def _memory_usage()->dict:
+    #RssAnon is private to the process, RssFile is page cache that other workers mapping the same files share
+    usage = {}
+    try:
+        with open('/proc/self/status') as file_obj:
+            for line in file_obj:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                    usage[key] = int(value.split()[0]) * 1024
+    except OSError:
+        import resource
+        usage['VmRSS'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return usage
+
+
+def _measure(file_path:str, csv_file_path:str, batch_size:int)->dict:
+    '''
+        Runs in a fresh interpreter: loads the model and scores one batch as a serving worker does.
+    '''
+    from networksecurity.utils.compiled_model import CompiledNetworkModel
+    from networksecurity.constants.training_pipeline import TARGET_COLUMN
+    batch = main_utils.read_csv_data(csv_file_path).drop(columns=[TARGET_COLUMN], errors='ignore').iloc[:batch_size]
+    before = _memory_usage()
+    started = time.perf_counter()
+    model = CompiledNetworkModel.from_network_model(load_model(file_path, verify=False))
+    load_seconds = time.perf_counter() - started
+    loaded = _memory_usage()
+    predictions = model.predict(batch)
+    first_batch_seconds = time.perf_counter() - started - load_seconds
+    served = _memory_usage()
+    return {
+        'load_seconds': load_seconds,
+        'first_batch_seconds': first_batch_seconds,
+        'rss_after_load': loaded['VmRSS'] - before['VmRSS'],
+        'rss_after_first_batch': served['VmRSS'] - before['VmRSS'],
+        'private_after_first_batch': served.get('RssAnon', served['VmRSS']) - before.get('RssAnon', before['VmRSS']),
+        'shared_after_first_batch': served.get('RssFile', 0) - before.get('RssFile', 0),
+        'predictions': predictions.tolist(),
+    }
+
+
+def benchmark_model_formats(pickle_file_path:str, bundle_file_path:str, csv_file_path:str, batch_size:int=64,
+                            repeats:int=3)->dict:
+    '''
+        Starts fresh interpreters that load the pickled NetworkModel or the bundle and score one batch of the csv,
+        and reports the best load time and the memory they added (private and shared pages).
+        Checks that both formats make identical predictions.
+    '''
+    try:
+        def measure(file_path):
+            runs = []
+            for _ in range(repeats):
+                output = subprocess.run([sys.executable, '-m', 'networksecurity.utils.model_bundle', '--measure',
+                                         file_path, csv_file_path, str(batch_size)],
+                                        capture_output=True, text=True, check=True).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            return min(runs, key=lambda run: run['load_seconds'])
+
+        pickled, bundled = measure(pickle_file_path), measure(bundle_file_path)
+        report = {'pickle_bytes': os.path.getsize(pickle_file_path),
+                  'bundle_bytes': os.path.getsize(bundle_file_path) + sum(_read_manifest(bundle_file_path)[0]['files'].values()),
+                  'identical_predictions': pickled.pop('predictions') == bundled.pop('predictions')}
+        for name, run in (('pickle', pickled), ('bundle', bundled)):
+            report.update({f'{name}_{key}': value for key, value in run.items()})
+        report['load_speedup'] = pickled['load_seconds'] / bundled['load_seconds']
+        return report
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+
+
+if __name__ == '__main__':
+    # Convert a pickled model: python -m networksecurity.utils.model_bundle model.pkl final_model/model.json
+    # Benchmark: python -m networksecurity.utils.model_bundle --benchmark model.pkl final_model/model.json Network_Data/phisingData.csv
+    if sys.argv[1] == '--measure':
+        print(json.dumps(_measure(sys.argv[2], sys.argv[3], int(sys.argv[4]))))
+    elif sys.argv[1] == '--benchmark':
+        print(benchmark_model_formats(sys.argv[2], sys.argv[3], sys.argv[4]))
+    else:
+        print(save_model_bundle(sys.argv[2], main_utils.load_object(sys.argv[1])))
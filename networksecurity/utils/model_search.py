@@ -0,0 +1,199 @@
+import sys
+import math
+import time
+import numpy as np
+from sklearn.model_selection import ParameterGrid, ParameterSampler, check_cv
+
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.logging_exception.logger import logging
+
+from networksecurity.entity.artifact_entity import ModelSearchArtifact
+from networksecurity.utils.fit_scheduler import FitScheduler, TimeBudget
+
+SEARCH_STRATEGIES = ('exhaustive', 'randomized', 'halving', 'early_stopping')
+#Smallest training subset a candidate is fitted on when successive halving uses rows as the resource
+HALVING_MIN_SAMPLES = 200
+#A candidate has to beat the best early-stopping score by more than this to count as an improvement
+EARLY_STOPPING_TOL = 1e-4
+
+
+class _CandidateEvaluator:
+    '''
+        Cross-validates candidates as (candidate, fold) fits on the shared FitScheduler. Fits not started before
+        the budget runs out are skipped.
+    '''
+    def __init__(self, estimator, X, y, splits:list, scheduler:FitScheduler, budget:TimeBudget, label:str):
+        self.estimator = estimator
+        self.X, self.y = X, y
+        self.splits = splits
+        self.scheduler = scheduler
+        self.batch_size = scheduler.n_cores
+        self.budget = budget
+        self.label = label
+        self.n_fits = 0
+        self.budget_exhausted = False
+
+    def out_of_time(self)->bool:
+        if self.budget.expired():
+            self.budget_exhausted = True
+        return self.budget_exhausted
+
+    def evaluate(self, candidates:list, n_samples:int=None)->np.ndarray:
+        '''
+            Returns the mean CV score of every candidate, -inf for those not reached within the budget.
+            With n_samples every fold trains on its first n_samples (shuffled) training rows only.
+        '''
+        if self.out_of_time():
+            return np.full(len(candidates), -np.inf)
+        futures = [[self.scheduler.submit(self.estimator, params, self.X, self.y,
+                                          train if n_samples is None else train[:n_samples], test,
+                                          budget=self.budget, label={'model': self.label, 'params': params, 'fold': fold})
+                    for fold, (train, test) in enumerate(self.splits)] for params in candidates]
+        scores = np.full(len(candidates), -np.inf)
+        for index, folds in enumerate(futures):
+            results = [future.result() for future in folds]
+            self.n_fits += sum(result is not None for result in results)
+            if any(result is None for result in results):
+                self.budget_exhausted = True
+            else:
+                scores[index] = np.mean(results)
+        return scores
+
+
+def _halving(evaluator:_CandidateEvaluator, estimator, param_grid:dict, factor:int)->tuple:
+    '''
+        Successive halving: every candidate gets a small resource, the best 1/factor of them get factor times
+        more, until the full resource. The resource is n_estimators when the grid tunes it, otherwise rows.
+    '''
+    if 'n_estimators' in param_grid and 'n_estimators' in estimator.get_params():
+        resource = 'n_estimators'
+        max_resource, min_resource = max(param_grid['n_estimators']), min(param_grid['n_estimators'])
+        candidates = list(ParameterGrid({key: value for key, value in param_grid.items() if key != 'n_estimators'}))
+    else:
+        resource = 'n_samples'
+        max_resource = min(len(train) for train, _ in evaluator.splits)
+        min_resource = min(HALVING_MIN_SAMPLES, max_resource)
+        candidates = list(ParameterGrid(param_grid))
+
+    n_rounds = 1 + math.ceil(math.log(len(candidates), factor)) if len(candidates) > 1 else 1
+    scores = None
+    for round_number in range(n_rounds):
+        amount = max(min_resource, int(max_resource / factor ** (n_rounds - 1 - round_number)))
+        if resource == 'n_estimators':
+            scores = evaluator.evaluate([dict(params, n_estimators=amount) for params in candidates])
+        else:
+            scores = evaluator.evaluate(candidates, n_samples=amount)
+        logging.info(f'Halving round {round_number + 1}/{n_rounds}: {len(candidates)} candidates with {resource}={amount}')
+        if evaluator.budget_exhausted or round_number == n_rounds - 1:
+            break
+        keep = np.argsort(-scores, kind='stable')[:max(1, math.ceil(len(candidates) / factor))]
+        candidates = [candidates[index] for index in keep]
+
+    best = int(np.argmax(scores))
+    best_params = dict(candidates[best], n_estimators=max_resource) if resource == 'n_estimators' else candidates[best]
+    return best_params, float(scores[best])
+
+
+def _early_stopping(evaluator:_CandidateEvaluator, estimator, param_grid:dict, patience:int,
+                    n_iter_no_change:int, random_state:int)->tuple:
+    '''
+        Evaluates the grid in random order and stops once patience candidates in a row brought no improvement.
+        Estimators with built-in early stopping (n_iter_no_change, e.g. GradientBoosting) train up to the largest
+        n_estimators of the grid and stop adding trees once the validation score stalls.
+    '''
+    fixed = {}
+    if 'n_iter_no_change' in estimator.get_params() and 'n_estimators' in param_grid:
+        fixed = {'n_estimators': max(param_grid['n_estimators']), 'n_iter_no_change': n_iter_no_change}
+        param_grid = {key: value for key, value in param_grid.items() if key != 'n_estimators'}
+    candidates = [dict(params, **fixed) for params in ParameterGrid(param_grid)]
+    order = np.random.default_rng(random_state).permutation(len(candidates))
+    candidates = [candidates[index] for index in order]
+
+    best_params, best_score, stale_candidates = None, -np.inf, 0
+    for start in range(0, len(candidates), evaluator.batch_size):
+        batch = candidates[start:start + evaluator.batch_size]
+        scores = evaluator.evaluate(batch)
+        if evaluator.budget_exhausted and not np.isfinite(scores).any():
+            break
+        best = int(np.argmax(scores))
+        if scores[best] > best_score + EARLY_STOPPING_TOL:
+            best_params, best_score, stale_candidates = batch[best], float(scores[best]), len(batch) - 1 - best
+        else:
+            stale_candidates += len(batch)
+        if stale_candidates >= patience or evaluator.budget_exhausted:
+            logging.info(f'Early stopping after {start + len(batch)} of {len(candidates)} candidates')
+            break
+    return best_params, best_score
+
+
+def search_model(estimator, param_grid:dict, X, y, strategy:str='exhaustive', cv:int=3, n_jobs:int=-1,
+                 n_iter:int=20, time_budget:float=None, halving_factor:int=3, patience:int=6,
+                 n_iter_no_change:int=10, random_state:int=42, scheduler:FitScheduler=None, label:str=None)->tuple:
+    '''
+        Tunes estimator over param_grid with cv-fold cross-validation (accuracy, like GridSearchCV's default)
+        and refits the best parameters on all of X. Returns (fitted estimator, ModelSearchArtifact).
+            exhaustive: every combination, what GridSearchCV does
+            randomized: n_iter combinations sampled from the grid
+            halving: successive halving on n_estimators (or rows when the grid has no n_estimators)
+            early_stopping: random order, stop after patience candidates in a row without improvement
+        time_budget (seconds) bounds the search, counted from its first fit on a worker: fits not started after it
+        has passed are skipped and the best candidate scored so far is used. When not even one candidate was
+        scored the search is reported as skipped (budget_exhausted) and no model is returned.
+        Fits run on scheduler, shared with other searches running at the same time, or on a FitScheduler of
+        n_jobs cores for this search only. label names the search in the scheduler's timeline.
+    '''
+    own_scheduler = scheduler is None
+    try:
+        if strategy not in SEARCH_STRATEGIES:
+            raise ValueError(f'Unknown search strategy {strategy}, expected one of {SEARCH_STRATEGIES}')
+        if own_scheduler:
+            scheduler = FitScheduler(n_jobs)
+        label = label or type(estimator).__name__
+        started = time.perf_counter()
+        splits = list(check_cv(cv, y, classifier=True).split(X, y))
+        #Rows of every training fold in a fixed random order, so a halving subset is a random sample
+        rng = np.random.default_rng(random_state)
+        splits = [(rng.permutation(train), test) for train, test in splits]
+        evaluator = _CandidateEvaluator(estimator, X, y, splits, scheduler, budget=TimeBudget(time_budget), label=label)
+        n_candidates = len(ParameterGrid(param_grid))
+        if strategy == 'exhaustive':
+            candidates = list(ParameterGrid(param_grid))
+        elif strategy == 'randomized':
+            candidates = list(ParameterSampler(param_grid, n_iter=min(n_iter, n_candidates), random_state=random_state))
+        if strategy in ('exhaustive', 'randomized'):
+            scores = evaluator.evaluate(candidates)
+            best = int(np.argmax(scores))
+            best_params, best_score = candidates[best], float(scores[best])
+        elif strategy == 'halving':
+            best_params, best_score = _halving(evaluator, estimator, param_grid, halving_factor)
+        else:
+            best_params, best_score = _early_stopping(evaluator, estimator, param_grid, patience,
+                                                      n_iter_no_change, random_state)
+
+        if best_params is None or not np.isfinite(best_score):
+            search_artifact = ModelSearchArtifact(strategy=strategy, best_params={}, cv_score=None, n_candidates=n_candidates,
+                                                  n_fits=evaluator.n_fits, seconds=time.perf_counter() - started,
+                                                  budget_exhausted=True, skipped=True)
+            logging.warning(f'{label} {strategy} search skipped: no candidate was evaluated within the {time_budget}s budget')
+            return None, search_artifact
+        model = scheduler.submit(estimator, best_params, X, y, label={'model': label, 'params': best_params, 'fold': 'refit'}).result()
+
+        search_artifact = ModelSearchArtifact(
+            strategy=strategy,
+            best_params=best_params,
+            cv_score=best_score,
+            n_candidates=n_candidates,
+            n_fits=evaluator.n_fits,
+            seconds=time.perf_counter() - started,
+            budget_exhausted=evaluator.budget_exhausted,
+        )
+        logging.info(f'{type(estimator).__name__} {strategy} search: {search_artifact}')
+        return model, search_artifact
+
+    except Exception as e:
+        custom_err = CustomException(e, sys)
+        logging.error(custom_err)
+        raise custom_err
+    finally:
+        if own_scheduler and scheduler is not None:
+            scheduler.shutdown()
@@ -0,0 +1,25 @@
+import os
+import pytest
+
+#Tests read Network_Data/ and data_schema/ relative to the repository root, as the pipeline does
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT_DIR)
+
+
+@pytest.fixture(autouse=True)
+def mongomock_bulk_sort():
+    '''
+        pymongo >= 4.9 passes sort= to add_update, which mongomock's bulk builder does not accept yet.
+        UpdateOne without sort passes None, so dropping it changes nothing.
+    '''
+    try:
+        from mongomock.collection import BulkOperationBuilder
+    except ImportError:
+        yield
+        return
+    add_update = BulkOperationBuilder.add_update
+    def patched(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+    BulkOperationBuilder.add_update = patched
+    yield
+    BulkOperationBuilder.add_update = add_update
@@ -0,0 +1,109 @@
+import os
+import json
+import stat
+
+import pytest
+
+from networksecurity.constants.training_pipeline import ARTIFACT_STORE_MANIFEST_FILE_NAME, STAGE_CACHE_RUN_STATE_FILE_NAME
+from networksecurity.pipeline import artifact_store
+from networksecurity.pipeline.artifact_store import ArtifactStore
+from networksecurity.pipeline.stage_cache import StageCache, hash_file
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(store_dir=str(tmp_path / 'Artifacts' / 'blobs'), artifact_dir=str(tmp_path / 'Artifacts'))
+
+
+def write_run(store, run_name, files, stages=None):
+    run_dir = os.path.join(store.artifact_dir, run_name)
+    for name, content in files.items():
+        file_path = os.path.join(run_dir, name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as file:
+            file.write(content)
+    if stages is not None:
+        with open(os.path.join(run_dir, STAGE_CACHE_RUN_STATE_FILE_NAME), 'w') as file:
+            json.dump({'stages': stages}, file)
+    return run_dir
+
+
+def disk_usage(directory):
+    #Bytes of the distinct data files under directory (manifests left out), hard links counted once
+    inodes = {}
+    for path, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            if file_name != ARTIFACT_STORE_MANIFEST_FILE_NAME:
+                file_stat = os.stat(os.path.join(path, file_name))
+                inodes[(file_stat.st_dev, file_stat.st_ino)] = file_stat.st_size
+    return sum(inodes.values())
+
+
+def test_unchanged_rerun_does_not_use_more_disk(store, monkeypatch):
+    monkeypatch.setattr(artifact_store, 'fcntl', None) #no reflinks, like ext4
+    files = {'data_ingestion/train.csv': os.urandom(4096), 'model_trainer/model.pkl': os.urandom(8192)}
+    store.commit(write_run(store, '01_01_2026_00_00_00', files))
+    usage = disk_usage(store.artifact_dir)
+
+    #A rerun without stage cache hits writes the same content to new files
+    run_dir = write_run(store, '01_02_2026_00_00_00', files)
+    manifest = store.commit(run_dir)
+
+    assert usage == disk_usage(store.artifact_dir) == sum(len(content) for content in files.values())
+    for name, content in files.items():
+        file_path = os.path.join(run_dir, name)
+        assert os.path.samefile(file_path, store.blob_path(manifest['files'][name]['sha256']))
+        assert open(file_path, 'rb').read() == content
+        assert not os.stat(file_path).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+def test_rewriting_a_detached_run_file_keeps_blob(store, monkeypatch):
+    monkeypatch.setattr(artifact_store, 'fcntl', None)
+    run_dir = write_run(store, '01_01_2026_00_00_00', {'data_ingestion/train.csv': b'a,b\n1,2\n'})
+    digest = store.commit(run_dir)['files']['data_ingestion/train.csv']['sha256']
+
+    store.detach(run_dir, [os.path.join(run_dir, 'data_ingestion', 'train.csv')])
+    with open(os.path.join(run_dir, 'data_ingestion', 'train.csv'), 'wb') as file:
+        file.write(b'a,b\n3,4\n')
+
+    assert hash_file(store.blob_path(digest)) == digest
+    manifest = store.commit(run_dir)
+    assert manifest['files']['data_ingestion/train.csv']['sha256'] == hash_file(os.path.join(run_dir, 'data_ingestion', 'train.csv'))
+
+
+def test_corrupted_blob_is_stored_again(store):
+    content = {'data_ingestion/train.csv': b'a,b\n1,2\n'}
+    digest = store.commit(write_run(store, '01_01_2026_00_00_00', content))['files']['data_ingestion/train.csv']['sha256']
+    blob_path = store.blob_path(digest)
+    os.chmod(blob_path, stat.S_IRUSR | stat.S_IWUSR)
+    with open(blob_path, 'wb') as file:
+        file.write(b'corrupted')
+
+    _, created = ArtifactStore(store.store_dir, store.artifact_dir).put(
+        os.path.join(write_run(store, '01_02_2026_00_00_00', content), 'data_ingestion', 'train.csv'))
+
+    assert created
+    assert hash_file(blob_path) == digest
+
+
+def test_gc_keeps_runs_referenced_by_kept_runs(store, tmp_path):
+    oldest = write_run(store, '01_01_2026_00_00_00', {'data_ingestion/train.csv': b'old'})
+    cached = write_run(store, '01_02_2026_00_00_00', {'data_ingestion/train.csv': b'cached'})
+    cached_file = os.path.join(cached, 'data_ingestion', 'train.csv')
+    latest = write_run(store, '01_03_2026_00_00_00', {'model_trainer/model.pkl': b'model'},
+                       stages={'data_ingestion': {'status': 'cached', 'files': [cached_file]}})
+    for run_dir in (oldest, cached, latest):
+        store.commit(run_dir)
+    stage_cache = StageCache(cache_dir=str(tmp_path / 'stage_cache'))
+    entry_dir = os.path.join(stage_cache.cache_dir, 'data_ingestion')
+    os.makedirs(entry_dir)
+    for name, file_path in (('old', os.path.join(oldest, 'data_ingestion', 'train.csv')), ('cached', cached_file)):
+        with open(os.path.join(entry_dir, f'{name}.json'), 'w') as file:
+            json.dump({'files': {file_path: os.path.getsize(file_path)}}, file)
+
+    report = store.gc(keep=1, stage_cache=stage_cache)
+
+    assert store.list_runs() == [cached, latest]
+    assert report['runs_removed'] == 1 and report['stage_cache_entries_removed'] == 1
+    assert os.listdir(entry_dir) == ['cached.json']
+    assert hash_file(store.blob_path(hash_file(cached_file))) == hash_file(cached_file)
@@ -0,0 +1,90 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+from sklearn.impute import KNNImputer
+from sklearn.ensemble import RandomForestClassifier
+
+from networksecurity.entity.config_entity import BatchPredictionConfig
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.pipeline.batch_prediction import BatchPredictionPipeline
+from networksecurity.utils import model_bundle
+from networksecurity.utils.ml_utils import NetworkModel
+
+DATA_FILE_PATH = 'Network_Data/phisingData.csv'
+TARGET_COLUMN = 'Result'
+
+
+def save_model(file_path, dataframe, random_state):
+    X, y = dataframe.drop(columns=[TARGET_COLUMN]), dataframe[TARGET_COLUMN]
+    preprocessor = Pipeline([('imputer', KNNImputer(n_neighbors=3))]).fit(X)
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=random_state).fit(preprocessor.transform(X), y)
+    network_model = NetworkModel(preprocessor=preprocessor, model=model)
+    model_bundle.save_model_bundle(file_path, network_model)
+    return network_model
+
+
+@pytest.fixture
+def batch(tmp_path):
+    dataframe = pd.read_csv(DATA_FILE_PATH).head(1000)
+    network_model = save_model(str(tmp_path / 'final_model' / 'model.json'), dataframe, random_state=0)
+    input_df = dataframe.tail(300).drop(columns=[TARGET_COLUMN]).reset_index(drop=True)
+    input_df.to_csv(tmp_path / 'input.csv', index=False)
+
+    config = BatchPredictionConfig(input_path=str(tmp_path / 'input.csv'), output_dir=str(tmp_path / 'output'))
+    config.model_file_path = str(tmp_path / 'final_model' / 'model.json')
+    config.shard_size, config.num_workers, config.output_format = 100, 1, 'csv'
+    return config, network_model, input_df
+
+
+def interrupt_after_first_shard(config):
+    #What a crash while the 2nd shard was being written leaves behind: shards 2 and 3 pending, a partial file
+    with open(config.manifest_file_path) as file:
+        manifest = json.load(file)
+    for shard_id in ('part-00001', 'part-00002'):
+        shard = manifest['shards'][shard_id]
+        os.remove(shard['output_path'])
+        manifest['shards'][shard_id] = {key: shard[key] for key in ('source', 'path', 'skiprows', 'nrows', 'shard_id')}
+        manifest['shards'][shard_id]['status'] = 'pending'
+    with open(os.path.join(config.output_dir, 'part-00001.csv.tmp'), 'w') as file:
+        file.write('partial')
+    with open(config.manifest_file_path, 'w') as file:
+        json.dump(manifest, file)
+    return manifest['shards']['part-00000']
+
+
+def read_output(config):
+    return pd.concat([pd.read_csv(os.path.join(config.output_dir, f'part-{index:05d}.csv')) for index in range(3)],
+                     ignore_index=True)
+
+
+def test_resume_scores_only_the_shards_not_completed(batch):
+    config, network_model, input_df = batch
+    BatchPredictionPipeline(config).run_pipeline()
+    first_shard = interrupt_after_first_shard(config)
+    first_output_stat = os.stat(first_shard['output_path'])
+
+    artifact = BatchPredictionPipeline(config).run_pipeline(resume=True)
+
+    assert (artifact.total_shards, artifact.completed_shards, artifact.total_rows) == (3, 3, 300)
+    with open(config.manifest_file_path) as file:
+        manifest = json.load(file)
+    assert manifest['shards']['part-00000'] == first_shard #not scored again
+    assert os.stat(first_shard['output_path']).st_mtime_ns == first_output_stat.st_mtime_ns
+    output = read_output(config)
+    pd.testing.assert_frame_equal(output.drop(columns=['predicted_column']), input_df, check_dtype=False)
+    np.testing.assert_array_equal(output['predicted_column'], network_model.predict(input_df))
+
+
+def test_resume_with_a_changed_model_is_rejected(batch):
+    config, _, _ = batch
+    BatchPredictionPipeline(config).run_pipeline()
+    interrupt_after_first_shard(config)
+    save_model(config.model_file_path, pd.read_csv(DATA_FILE_PATH).head(1000), random_state=1)
+
+    with pytest.raises(CustomException, match='final model changed'):
+        BatchPredictionPipeline(config).run_pipeline(resume=True)
+    assert not os.path.exists(os.path.join(config.output_dir, 'part-00001.csv'))
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+from sklearn.impute import KNNImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier
+
+from networksecurity.utils.compiled_model import CompiledNetworkModel
+from networksecurity.utils.ml_utils import NetworkModel
+
+DATA_FILE_PATH = 'Network_Data/phisingData.csv'
+TARGET_COLUMN = 'Result'
+
+ESTIMATORS = {
+    'random_forest': lambda: RandomForestClassifier(n_estimators=20, random_state=0),
+    'gradient_boosting': lambda: GradientBoostingClassifier(n_estimators=20, random_state=0),
+    'decision_tree': lambda: DecisionTreeClassifier(random_state=0),
+    'adaboost_stumps': lambda: AdaBoostClassifier(DecisionTreeClassifier(max_depth=1), n_estimators=20, random_state=0),
+}
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    dataframe = pd.read_csv(DATA_FILE_PATH).sample(n=3000, random_state=0)
+    return dataframe.drop(columns=[TARGET_COLUMN]), dataframe[TARGET_COLUMN]
+
+
+@pytest.fixture(scope='module')
+def rows(dataset):
+    X, _ = dataset
+    complete = X.tail(500).reset_index(drop=True)
+    with_nans = complete.copy()
+    mask = np.random.default_rng(0).random(with_nans.shape) < 0.1
+    with_nans = with_nans.mask(mask)
+    return complete, with_nans
+
+
+def make_network_model(dataset, estimator):
+    X, y = dataset
+    preprocessor = Pipeline([('imputer', KNNImputer(n_neighbors=3))]).fit(X)
+    return NetworkModel(preprocessor=preprocessor, model=estimator.fit(preprocessor.transform(X), y))
+
+
+@pytest.mark.filterwarnings('ignore:X does not have valid feature names')
+@pytest.mark.parametrize('name', sorted(ESTIMATORS))
+@pytest.mark.parametrize('compiled_max_rows', [10000, 0]) #compiled ensemble, estimator's own predict
+def test_compiled_model_predicts_like_network_model(dataset, rows, name, compiled_max_rows):
+    network_model = make_network_model(dataset, ESTIMATORS[name]())
+    compiled = CompiledNetworkModel.from_network_model(network_model, compiled_max_rows=compiled_max_rows)
+    assert compiled.compiled_model is not None
+
+    for x in rows:
+        expected = network_model.predict(x)
+        np.testing.assert_array_equal(compiled.predict(x), expected) #cold lookup table
+        np.testing.assert_array_equal(compiled.predict(x), expected) #warm lookup table
+        np.testing.assert_array_equal(compiled.predict(x.to_numpy()), expected)
+    assert compiled.lookup_table_size_used() > 0
+
+
+def test_compiled_model_matches_on_non_ternary_rows(dataset, rows):
+    network_model = make_network_model(dataset, ESTIMATORS['gradient_boosting']())
+    compiled = CompiledNetworkModel.from_network_model(network_model)
+    complete, _ = rows
+    x = complete.astype(np.float64) * 0.5
+
+    np.testing.assert_array_equal(compiled.predict(x), network_model.predict(x))
+    assert compiled.lookup_table_size_used() == 0
+
+
+def test_estimator_that_cannot_be_compiled_falls_back_to_its_own_predict(dataset, rows):
+    network_model = make_network_model(dataset, LogisticRegression(max_iter=1000))
+    compiled = CompiledNetworkModel.from_network_model(network_model)
+
+    assert compiled.compiled_model is None
+    for x in rows:
+        np.testing.assert_array_equal(compiled.predict(x), network_model.predict(x))
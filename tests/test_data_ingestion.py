@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from networksecurity.components.data_ingestion import DataIngestion
+from networksecurity.entity.config_entity import DataIngestionConfig, TrainingPipelineConfig
+from networksecurity.utils.feature_store import ColumnarFeatureStore
+from networksecurity.utils.main_utils import read_yaml_file
+
+DATA_FILE_PATH = 'Network_Data/phisingData.csv'
+
+
+@pytest.fixture
+def dataset():
+    return pd.read_csv(DATA_FILE_PATH).head(2500)
+
+
+def make_ingestion(tmp_path, collection, **settings):
+    config = DataIngestionConfig(TrainingPipelineConfig())
+    config.incremental_store_dir = str(tmp_path / 'incremental')
+    for name, value in settings.items():
+        setattr(config, name, value)
+    data_ingestion = DataIngestion(config, mongo_client=collection.database.client)
+    config.database_name, config.collection_name = collection.database.name, collection.name
+    return data_ingestion
+
+
+def insert(collection, dataframe):
+    collection.insert_many(dataframe.to_dict(orient='records'))
+
+
+def test_export_streams_chunks_into_the_feature_store(tmp_path, dataset):
+    collection = mongomock.MongoClient()['db']['NetworkData']
+    records = dataset.to_dict(orient='records')
+    records[3]['URL_Length'] = 'na'
+    collection.insert_many(records)
+    data_ingestion = make_ingestion(tmp_path, collection, mongo_batch_size=300, export_chunk_size=1000)
+    feature_store_file_path = str(tmp_path / 'feature_store' / 'phisingData.csv')
+
+    dataframe = data_ingestion.export_collection_as_df(feature_store_file_path=feature_store_file_path)
+
+    assert dataframe.shape == dataset.shape
+    assert np.isnan(dataframe['URL_Length'][3])
+    assert dataframe['Result'].dtype == np.int8
+    expected = dataset.astype(np.float32)
+    expected.loc[3, 'URL_Length'] = np.nan
+    pd.testing.assert_frame_equal(dataframe.astype(np.float32), expected[dataframe.columns])
+    pd.testing.assert_frame_equal(pd.read_csv(feature_store_file_path).astype(np.float32), expected[dataframe.columns])
+
+
+def test_export_honours_row_limit(tmp_path, dataset):
+    collection = mongomock.MongoClient()['db']['NetworkData']
+    insert(collection, dataset)
+    data_ingestion = make_ingestion(tmp_path, collection, mongo_batch_size=300, row_limit=700)
+
+    assert len(data_ingestion.export_collection_as_df()) == 700
+
+
+def test_fingerprint_falls_back_to_count_and_last_id(tmp_path, dataset):
+    collection = mongomock.MongoClient()['db']['NetworkData']
+    insert(collection, dataset)
+    data_ingestion = make_ingestion(tmp_path, collection)
+
+    fingerprint = data_ingestion.get_collection_fingerprint()
+
+    assert fingerprint['count'] == len(dataset)
+    assert fingerprint['last_id'] == str(collection.find_one(sort=[('_id', -1)])['_id'])
+
+
+def test_incremental_export_fetches_only_rows_above_the_high_water_mark(tmp_path, dataset):
+    collection = mongomock.MongoClient()['db']['NetworkData']
+    insert(collection, dataset.head(2000))
+    data_ingestion = make_ingestion(tmp_path, collection, mongo_batch_size=300, incremental_mode='object_id')
+
+    first = data_ingestion.export_collection_incrementally()
+    assert len(first) == 2000
+
+    insert(collection, dataset.tail(500))
+    fetched = []
+    fetch_new_documents = data_ingestion.fetch_new_documents
+    def counting_fetch(*args):
+        fetched.append(fetch_new_documents(*args))
+        return fetched[-1]
+    data_ingestion.fetch_new_documents = counting_fetch
+    second = data_ingestion.export_collection_incrementally()
+
+    assert fetched == [500]
+    last_id = collection.find_one(sort=[('_id', -1)])['_id']
+    store = ColumnarFeatureStore(data_ingestion.data_ingestion_config.incremental_store_dir, list(dataset.columns))
+    assert store.state['last_id'] == str(last_id) and store.state['rows'] == 2500
+    pd.testing.assert_frame_equal(second.astype(np.float32), dataset.astype(np.float32)[second.columns])
+
+
+def test_export_benchmark_writes_both_paths_to_the_report(tmp_path, dataset):
+    collection = mongomock.MongoClient()['db']['NetworkData']
+    insert(collection, dataset)
+    data_ingestion = make_ingestion(tmp_path, collection, mongo_batch_size=300)
+    data_ingestion.data_ingestion_config.export_benchmark_file_path = str(tmp_path / 'export_benchmark' / 'report.yaml')
+
+    report = data_ingestion.benchmark_export()
+
+    assert report == read_yaml_file(str(tmp_path / 'export_benchmark' / 'report.yaml'))
+    for name in ('streaming', 'find'):
+        assert report[name]['rows'] == len(dataset)
+        assert report[name]['seconds'] > 0 and report[name]['peak_traced_mb'] > 0
+    assert report['streaming']['dataframe_mb'] < report['find']['dataframe_mb']
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'export_benchmark' / 'streaming' / 'feature_store.csv'),
+                                  pd.read_csv(tmp_path / 'export_benchmark' / 'find' / 'feature_store.csv'))
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from networksecurity.constants.training_pipeline import DATA_VALIDATION_DRIFT_THRESHOLDS
+from networksecurity.utils import drift
+
+
+def ternary(n_rows, shares, seed):
+    return np.random.default_rng(seed).choice([-1, 0, 1], size=n_rows, p=shares).astype(np.float32)
+
+
+def exact(n_rows, shares):
+    return np.repeat(np.array([-1, 0, 1], dtype=np.float32), np.round(np.array(shares) * n_rows).astype(int))
+
+
+def test_ternary_columns_get_one_bin_per_value():
+    values = np.array([[-1, 0.0, 1], [0, 2.5, 1], [1, np.nan, -1], [1, 7.25, 0]], dtype=np.float32)
+    values = np.vstack([values, np.column_stack([ternary(200, [0.2, 0.3, 0.5], 0), np.linspace(0, 10, 200),
+                                                 ternary(200, [0.5, 0.0, 0.5], 1)]).astype(np.float32)])
+
+    bin_edges = drift.compute_bin_edges(values, max_bins=8)
+    histograms = drift.column_histograms(values, bin_edges)
+
+    np.testing.assert_array_equal(bin_edges[0][np.isfinite(bin_edges[0])], [-0.5, 0.5])
+    np.testing.assert_array_equal(bin_edges[2][np.isfinite(bin_edges[2])], [-0.5, 0.5])
+    assert np.isfinite(bin_edges[1]).sum() == 7 #quantile bins for the continuous column
+    for column in (0, 2):
+        expected = [np.sum(values[:, column] == value) for value in (-1, 0, 1)]
+        np.testing.assert_array_equal(histograms[column][:3], expected)
+        assert histograms[column][3:].sum() == 0
+    assert histograms[1].sum() == len(values) - 1 #the missing value is not counted
+    #int8 artifacts are counted as they are, with the same result
+    np.testing.assert_array_equal(drift.column_histograms(values[:, [0, 2]].astype(np.int8), bin_edges[[0, 2]]),
+                                  histograms[[0, 2]])
+
+
+@pytest.mark.parametrize('test', drift.DRIFT_TESTS)
+def test_identical_distributions_are_not_drifted(test):
+    #Same value shares in different row orders and sample sizes
+    rng = np.random.default_rng(0)
+    base = np.column_stack([rng.permutation(exact(5000, [0.3, 0.2, 0.5])) for _ in range(5)])
+    current = np.column_stack([rng.permutation(exact(2000, [0.3, 0.2, 0.5])) for _ in range(5)])
+    bin_edges = drift.compute_bin_edges(base, current)
+
+    scores, p_values = drift.drift_statistics(drift.column_histograms(base, bin_edges),
+                                              drift.column_histograms(current, bin_edges), test=test)
+
+    assert not drift.is_drifted(scores, p_values, test, DATA_VALIDATION_DRIFT_THRESHOLDS[test]).any()
+    np.testing.assert_allclose(scores, 0.0, atol=1e-12)
+
+
+@pytest.mark.parametrize('test', drift.DRIFT_TESTS)
+def test_shifted_distribution_is_drifted(test):
+    base = np.column_stack([exact(5000, [0.3, 0.2, 0.5]), ternary(5000, [0.3, 0.2, 0.5], 0)])
+    current = np.column_stack([exact(2000, [0.3, 0.2, 0.5]), ternary(2000, [0.7, 0.2, 0.1], 1)])
+    bin_edges = drift.compute_bin_edges(base, current)
+
+    scores, p_values = drift.drift_statistics(drift.column_histograms(base, bin_edges),
+                                              drift.column_histograms(current, bin_edges), test=test)
+
+    np.testing.assert_array_equal(drift.is_drifted(scores, p_values, test, DATA_VALIDATION_DRIFT_THRESHOLDS[test]),
+                                  [False, True])
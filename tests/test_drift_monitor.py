@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from networksecurity.serving.drift_monitor import DriftMonitor
+from networksecurity.utils import drift, main_utils
+
+COLUMNS = ['having_IP_Address', 'URL_Length', 'SSLfinal_State']
+SHARES = [0.3, 0.2, 0.5]
+SHIFTED_SHARES = [0.7, 0.2, 0.1]
+
+
+def batch(n_rows, shifted_column=None, seed=0):
+    #Every column has exactly the given value shares, in a random row order
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for column in COLUMNS:
+        shares = SHIFTED_SHARES if column == shifted_column else SHARES
+        values = np.repeat([-1.0, 0.0, 1.0], np.round(np.array(shares) * n_rows).astype(int))
+        columns[column] = rng.permutation(values)
+    return pd.DataFrame(columns)
+
+
+def make_monitor(tmp_path, **settings):
+    sketch_file_path = str(tmp_path / 'reference_sketch.yaml')
+    reference = batch(5000)
+    main_utils.write_yaml_file(sketch_file_path, drift.build_reference_sketch(reference.to_numpy(), COLUMNS))
+    return DriftMonitor(sketch_file_path=sketch_file_path, **dict(dict(window_size=1000, n_buckets=4, min_rows=200), **settings))
+
+
+def test_report_flags_shifted_batches_once_they_fill_the_window(tmp_path):
+    monitor = make_monitor(tmp_path)
+    for seed in range(4):
+        monitor.observe(batch(250, seed=seed))
+    report = monitor.report()
+    assert report['available'] and report['window_rows'] == 1000
+    assert not report['drift_detected']
+
+    #Shifted traffic replaces the window bucket by bucket
+    for seed in range(4):
+        monitor.observe(batch(250, shifted_column='URL_Length', seed=seed))
+    report = monitor.report()
+
+    assert report['window_rows'] == 1000 and report['drift_detected']
+    assert [column for column, entry in report['columns'].items() if entry['drift_status']] == ['URL_Length']
+    assert report['columns']['URL_Length']['p-value'] < report['threshold']
+    assert report['columns']['SSLfinal_State']['statistic'] == 0.0
+
+
+def test_report_waits_for_min_rows_and_counts_missing_features(tmp_path):
+    monitor = make_monitor(tmp_path, test='psi')
+    shifted = batch(100, shifted_column='URL_Length').drop(columns=['SSLfinal_State'])
+    monitor.observe(shifted)
+
+    report = monitor.report()
+
+    assert not report['enough_rows'] and not report['drift_detected']
+    assert report['columns']['URL_Length']['statistic'] > report['threshold']
+    assert not report['columns']['URL_Length']['drift_status']
+    assert report['columns']['SSLfinal_State']['missing_rate'] == 1.0
+
+    #The same rows as an array named by its columns
+    monitor.observe(shifted.to_numpy(), columns=list(shifted.columns))
+    monitor.observe(batch(100, shifted_column='URL_Length').to_numpy())
+    report = monitor.report()
+    assert report['enough_rows'] and report['drift_detected']
+    assert report['columns']['URL_Length']['drift_status']
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+from networksecurity.utils.fit_scheduler import FitScheduler, TimeBudget
+
+X = np.zeros((10, 2))
+y = np.array([0, 1] * 5)
+
+
+class SleepingClassifier(ClassifierMixin, BaseEstimator):
+    def __init__(self, seconds=0.0, n_estimators=1):
+        self.seconds = seconds
+        self.n_estimators = n_estimators
+
+    def fit(self, X, y):
+        time.sleep(self.seconds)
+        self.classes_ = np.unique(y)
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.classes_[0])
+
+
+def submit_all(scheduler, fits):
+    #Queued while the dispatcher waits for the lock, so it picks among all of them from the first fit on
+    with scheduler._condition:
+        return [scheduler.submit(SleepingClassifier(), params, X, y, test=np.arange(len(X)), budget=budget,
+                                 label={'model': model, 'fit': name})
+                for model, name, params, budget in fits]
+
+
+def test_free_core_goes_to_the_search_with_least_core_time():
+    with FitScheduler(n_cores=1) as scheduler:
+        futures = submit_all(scheduler, [
+            ('ensemble', 'small', {'seconds': 0.2, 'n_estimators': 10}, None),
+            ('ensemble', 'large', {'seconds': 0.2, 'n_estimators': 30}, None),
+            ('ensemble', 'medium', {'seconds': 0.2, 'n_estimators': 20}, None),
+            ('linear', 'a', {'seconds': 0.01}, None),
+            ('linear', 'b', {'seconds': 0.01, 'n_estimators': 2}, None),
+        ])
+        assert all(future.result(timeout=30) == 0.5 for future in futures)
+
+    order = [(task['model'], task['fit']) for task in scheduler.timeline()['tasks']]
+    #The ensemble search goes first (it was queued first) with its longest fit; the cheap search then catches up
+    assert order == [('ensemble', 'large'), ('linear', 'b'), ('linear', 'a'),
+                     ('ensemble', 'medium'), ('ensemble', 'small')]
+
+
+def test_fits_queued_after_the_time_budget_are_skipped():
+    budget = TimeBudget(seconds=0.5)
+    with FitScheduler(n_cores=1) as scheduler:
+        futures = submit_all(scheduler, [('long', 'only', {'seconds': 0.6}, None)] +
+                             [('budgeted', str(index), {'seconds': 0.2}, budget) for index in range(4)])
+        results = [future.result(timeout=30) for future in futures]
+
+    #The budget starts with the search's first fit, not while it waits behind the long fit: three fits start
+    #within 0.5s of it, the fourth would start after 0.6s and is skipped
+    assert results == [0.5, 0.5, 0.5, 0.5, None]
+    timeline = scheduler.timeline()
+    assert [task['model'] for task in timeline['tasks']] == ['long', 'budgeted', 'budgeted', 'budgeted']
+    assert timeline['n_tasks'] == 4
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+from sklearn.impute import KNNImputer
+from sklearn.ensemble import RandomForestClassifier
+
+from networksecurity.components import model_trainer
+from networksecurity.components.model_trainer import ModelTrainer
+from networksecurity.entity.artifact_entity import DataTransformationArtifact
+from networksecurity.entity.config_entity import ModelTrainerConfig, TrainingPipelineConfig
+from networksecurity.utils import drift, incremental, main_utils, ml_flow, model_bundle
+from networksecurity.utils.ml_utils import NetworkModel
+
+DATA_FILE_PATH = 'Network_Data/phisingData.csv'
+TARGET_COLUMN = 'Result'
+N_TRAINED, N_NEW = 2000, 100
+
+
+class NullTracker:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+
+@pytest.fixture
+def trainer(tmp_path, monkeypatch):
+    final_dir = tmp_path / 'final_model'
+    monkeypatch.setattr(model_trainer, 'FINAL_MODEL_FILE_PATH', str(final_dir / 'model.json'))
+    monkeypatch.setattr(model_trainer, 'FINAL_REFERENCE_SKETCH_FILE_PATH', str(final_dir / 'reference_sketch.yaml'))
+    monkeypatch.setattr(model_trainer, 'FINAL_TRAIN_ROW_HASHES_FILE_PATH', str(final_dir / 'train_row_hashes.npy'))
+    monkeypatch.setattr(ml_flow, 'MlflowTracker', NullTracker)
+
+    dataframe = pd.read_csv(DATA_FILE_PATH).head(N_TRAINED + N_NEW + 1000)
+    X, y = dataframe.drop(columns=[TARGET_COLUMN]), dataframe[TARGET_COLUMN].to_numpy()
+    preprocessor = Pipeline([('imputer', KNNImputer(n_neighbors=3))]).fit(X)
+    main_utils.save_object(str(tmp_path / 'preprocessing.pkl'), preprocessor)
+    main_utils.write_yaml_file(str(tmp_path / 'reference_sketch.yaml'),
+                               drift.build_reference_sketch(X.to_numpy(), list(X.columns)))
+    artifact = DataTransformationArtifact(str(tmp_path / 'preprocessing.pkl'), None, None, None, None,
+                                          str(tmp_path / 'reference_sketch.yaml'))
+    config = ModelTrainerConfig(TrainingPipelineConfig())
+    config.trained_model_file_path = str(tmp_path / 'trained_model' / 'model.json')
+    config.reference_sketch_file_path = str(tmp_path / 'trained_model' / 'reference_sketch.yaml')
+    config.train_row_hashes_file_path = str(tmp_path / 'trained_model' / 'train_row_hashes.npy')
+    config.incremental_min_improvement = -1.0 #always promote, so the re-run sees the new rows as trained
+    trainer = ModelTrainer(artifact, config)
+
+    X = preprocessor.transform(X).astype(np.float32)
+    trained = slice(0, N_TRAINED)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X[trained], y[trained])
+    trainer.save_model(NetworkModel(preprocessor=preprocessor, model=model), incremental.row_hashes(X[trained], y[trained]))
+    return trainer, model, X, y
+
+
+def test_only_unseen_rows_are_trained_on_and_a_rerun_is_a_no_op(trainer, monkeypatch):
+    trainer, previous_model, X, y = trainer
+    X_train, y_train = X[:N_TRAINED + N_NEW], y[:N_TRAINED + N_NEW]
+    X_test, y_test = X[-1000:], y[-1000:]
+    #The features are ternary, so many appended rows repeat trained ones: only the others are new
+    trained_hashes = incremental.row_hashes(X[:N_TRAINED], y[:N_TRAINED])
+    unseen = ~np.isin(incremental.row_hashes(X_train, y_train), trained_hashes)
+    n_new = int(unseen.sum())
+    assert 0 < n_new < N_NEW
+    trained_on = []
+    continue_training = incremental.continue_training
+    def recording_continue_training(model, X, y, growth):
+        trained_on.append(incremental.row_hashes(X, y))
+        return continue_training(model, X, y, growth)
+    monkeypatch.setattr(incremental, 'continue_training', recording_continue_training)
+
+    artifact = trainer.incremental_train(X_train, y_train, X_test, y_test)
+
+    assert artifact.training_mode == 'incremental' and artifact.new_rows == n_new and artifact.promoted
+    (hashes,) = trained_on
+    #Every new row once plus as many replayed trained rows (replay ratio 1), nothing else
+    assert len(hashes) == 2 * n_new
+    assert (~np.isin(hashes, trained_hashes)).sum() == n_new
+    assert set(incremental.row_hashes(X_train[unseen], y_train[unseen])) <= set(hashes)
+    continued = model_bundle.load_model(model_trainer.FINAL_MODEL_FILE_PATH).model
+    assert len(continued.estimators_) == 11 #10 trees grown by the share of new rows, at least one
+    for previous_tree, tree in zip(previous_model.estimators_, continued.estimators_):
+        np.testing.assert_array_equal(previous_tree.tree_.threshold, tree.tree_.threshold)
+    final_hash = model_bundle.model_file_hash(model_trainer.FINAL_MODEL_FILE_PATH)
+
+    rerun = trainer.incremental_train(X_train, y_train, X_test, y_test)
+
+    assert rerun.new_rows == 0 and not rerun.promoted
+    assert len(trained_on) == 1 #no training at all
+    assert model_bundle.model_file_hash(model_trainer.FINAL_MODEL_FILE_PATH) == final_hash
@@ -0,0 +1,27 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from networksecurity.constants.training_pipeline import SCHEMA_FILE_PATH
+from networksecurity.utils import main_utils
+
+DATA_FILE_PATH = 'Network_Data/phisingData.csv'
+
+
+def test_benchmark_artifact_formats_reports_every_format(tmp_path):
+    dataframe = pd.read_csv(DATA_FILE_PATH)
+    schema_columns = main_utils.read_yaml_file(SCHEMA_FILE_PATH)['columns']
+    report_file_path = str(tmp_path / 'report.yaml')
+
+    report = main_utils.benchmark_artifact_formats(dataframe, str(tmp_path), schema_columns)
+    main_utils.write_yaml_file(report_file_path, report)
+
+    assert main_utils.read_yaml_file(report_file_path) == report
+    assert sorted(report) == ['csv', 'feather', 'parquet']
+    for file_format, timings in report.items():
+        assert timings['total_seconds'] > 0
+        assert timings['size_bytes'] == os.path.getsize(tmp_path / 'ingested' / f'data.{file_format}')
+        handed_over = main_utils.read_dataframe(str(tmp_path / 'validated' / f'data.{file_format}'))
+        np.testing.assert_array_equal(handed_over.to_numpy(dtype=np.float64), dataframe.to_numpy(dtype=np.float64))
+    assert report['feather']['size_bytes'] < report['csv']['size_bytes']
@@ -0,0 +1,104 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+from sklearn.impute import KNNImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier
+
+from networksecurity.constants.training_pipeline import MODEL_BUNDLE_DATA_DIR_NAME
+from networksecurity.logging_exception.exception import CustomException
+from networksecurity.utils import model_bundle
+from networksecurity.utils.ml_utils import NetworkModel
+
+DATA_FILE_PATH = 'Network_Data/phisingData.csv'
+TARGET_COLUMN = 'Result'
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    dataframe = pd.read_csv(DATA_FILE_PATH).sample(n=2000, random_state=0)
+    X = dataframe.drop(columns=[TARGET_COLUMN])
+    X = X.mask(np.random.default_rng(0).random(X.shape) < 0.05) #some rows go through the imputer
+    return X, dataframe[TARGET_COLUMN]
+
+
+def make_network_model(dataset, estimator):
+    X, y = dataset
+    preprocessor = Pipeline([('imputer', KNNImputer(n_neighbors=3))]).fit(X)
+    return NetworkModel(preprocessor=preprocessor, model=estimator.fit(preprocessor.transform(X), y))
+
+
+@pytest.mark.parametrize('estimator', [lambda: RandomForestClassifier(n_estimators=10, random_state=0),
+                                       lambda: LogisticRegression(max_iter=1000)])
+def test_saved_bundle_predicts_like_the_model(tmp_path, dataset, estimator):
+    network_model = make_network_model(dataset, estimator())
+    file_path = str(tmp_path / 'model.json')
+
+    file_hash = model_bundle.save_model_bundle(file_path, network_model)
+    bundle, loaded_hash = model_bundle.load_model_with_hash(file_path, verify=True)
+
+    assert loaded_hash == file_hash == model_bundle.model_file_hash(file_path)
+    assert model_bundle.verify_model_bundle(file_path) == []
+    np.testing.assert_array_equal(bundle.predict(dataset[0]), network_model.predict(dataset[0]))
+
+
+def test_tampered_data_file_fails_verification(tmp_path, dataset):
+    file_path = str(tmp_path / 'model.json')
+    model_bundle.save_model_bundle(file_path, make_network_model(dataset, RandomForestClassifier(n_estimators=10, random_state=0)))
+    manifest = json.loads(open(file_path).read())
+    data_dir = tmp_path / MODEL_BUNDLE_DATA_DIR_NAME
+    array_name = next(name for name in manifest['files'] if name.endswith('.npy'))
+    pickle_name = manifest['pickles']['model']
+    for name in (array_name, pickle_name):
+        data = bytearray((data_dir / name).read_bytes())
+        data[-1] ^= 0xFF #same size, different content
+        (data_dir / name).write_bytes(bytes(data))
+
+    assert sorted(model_bundle.verify_model_bundle(file_path)) == sorted([array_name, pickle_name])
+    with pytest.raises(CustomException, match='missing or corrupted'):
+        model_bundle.load_model(file_path, verify=True)
+    #Without verification the pickle is still checked against its hash before it is unpickled
+    with pytest.raises(ValueError, match='does not match its hash'):
+        model_bundle.load_model(file_path, verify=False).model
+
+
+def test_estimator_outside_safe_estimators_is_refused(tmp_path, dataset):
+    file_path = str(tmp_path / 'model.json')
+    model_bundle.save_model_bundle(file_path, make_network_model(dataset, LogisticRegression(max_iter=1000)))
+    manifest = json.loads(open(file_path).read())
+    assert manifest['model']['class'] == 'LogisticRegression'
+
+    manifest['model']['class'] = 'RandomForestClassifier'
+    with open(file_path, 'w') as file:
+        json.dump(manifest, file)
+
+    with pytest.raises(CustomException, match='RandomForestClassifier'):
+        model_bundle.load_model(file_path, verify=True)
+    #Saving never stores an estimator outside the allowlist as arrays either
+    writer = model_bundle._BundleWriter(str(tmp_path / 'data'))
+    with pytest.raises(TypeError, match='not stored as arrays'):
+        writer.estimator_spec(RandomForestClassifier())
+
+
+def test_copy_does_not_clobber_a_live_bundle(tmp_path, dataset):
+    old_model = make_network_model(dataset, RandomForestClassifier(n_estimators=10, random_state=0))
+    new_model = make_network_model(dataset, RandomForestClassifier(n_estimators=10, max_depth=3, random_state=1))
+    live_file_path = str(tmp_path / 'final_model' / 'model.json')
+    model_bundle.save_model_bundle(live_file_path, old_model)
+    new_file_path = str(tmp_path / 'run' / 'model.json')
+    new_hash = model_bundle.save_model_bundle(new_file_path, new_model)
+    live = model_bundle.load_model(live_file_path) #a serving worker still on the old version, .model not used yet
+    X = dataset[0]
+
+    assert model_bundle.copy_model_bundle(new_file_path, live_file_path)
+    assert not model_bundle.copy_model_bundle(new_file_path, live_file_path)
+
+    np.testing.assert_array_equal(live.predict(X), old_model.predict(X))
+    swapped, swapped_hash = model_bundle.load_model_with_hash(live_file_path, verify=True)
+    assert swapped_hash == new_hash
+    np.testing.assert_array_equal(swapped.predict(X), new_model.predict(X))
+    #The source bundle is untouched by the copy
+    assert model_bundle.verify_model_bundle(new_file_path) == []
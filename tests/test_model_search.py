@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.model_selection import ParameterGrid
+
+from networksecurity.utils.model_search import search_model
+
+DATA_FILE_PATH = 'Network_Data/phisingData.csv'
+TARGET_COLUMN = 'Result'
+CV = 3
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    dataframe = pd.read_csv(DATA_FILE_PATH).sample(n=600, random_state=0)
+    return dataframe.drop(columns=[TARGET_COLUMN]).to_numpy(dtype=np.float32), dataframe[TARGET_COLUMN].to_numpy()
+
+
+class ConstantScoreClassifier(ClassifierMixin, BaseEstimator):
+    #Scores what its parameters say, so the order early stopping sees the scores in is known
+    def __init__(self, accuracy=0.0, candidate=0):
+        self.accuracy = accuracy
+        self.candidate = candidate
+
+    def fit(self, X, y):
+        self.classes_ = np.unique(y)
+        return self
+
+    def score(self, X, y):
+        return self.accuracy
+
+
+def test_randomized_search_fits_only_the_sampled_candidates(dataset):
+    X, y = dataset
+    param_grid = {'C': [0.01, 0.1, 1.0, 10.0], 'fit_intercept': [True, False], 'tol': [1e-4, 1e-3]}
+
+    model, artifact = search_model(LogisticRegression(max_iter=500), param_grid, X, y, strategy='randomized',
+                                   cv=CV, n_jobs=1, n_iter=5)
+
+    assert (artifact.n_candidates, artifact.n_fits) == (16, 5 * CV)
+    assert artifact.best_params in list(ParameterGrid(param_grid))
+    assert model.get_params()['C'] == artifact.best_params['C'] and hasattr(model, 'coef_')
+
+
+def test_halving_on_n_estimators_keeps_the_best_third_per_round(dataset):
+    X, y = dataset
+    param_grid = {'n_estimators': [10, 30, 90], 'max_depth': [2, 4, 8]}
+
+    model, artifact = search_model(RandomForestClassifier(random_state=0), param_grid, X, y, strategy='halving',
+                                   cv=CV, n_jobs=1, halving_factor=3)
+
+    #Round 1: the 3 max_depth candidates with 30 trees, round 2: the best one with the full 90 trees
+    assert (artifact.n_candidates, artifact.n_fits) == (9, (3 + 1) * CV)
+    assert artifact.best_params['n_estimators'] == 90 and len(model.estimators_) == 90
+
+
+def test_halving_on_rows_without_n_estimators(dataset):
+    X, y = dataset
+    param_grid = {'C': [0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0]}
+
+    _, artifact = search_model(LogisticRegression(max_iter=500), param_grid, X, y, strategy='halving',
+                               cv=CV, n_jobs=1, halving_factor=3)
+
+    assert artifact.n_fits == (9 + 3 + 1) * CV
+    assert not artifact.budget_exhausted
+
+
+def test_early_stopping_stops_after_patience_candidates_without_improvement(dataset):
+    X, y = dataset
+    param_grid = {'accuracy': [0.5], 'candidate': list(range(10))}
+
+    _, artifact = search_model(ConstantScoreClassifier(), param_grid, X, y, strategy='early_stopping',
+                               cv=CV, n_jobs=1, patience=3)
+
+    #The first candidate sets the best score, the next three do not beat it
+    assert (artifact.n_candidates, artifact.n_fits) == (10, (1 + 3) * CV)
+    assert artifact.cv_score == 0.5
+
+
+def test_early_stopping_uses_built_in_early_stopping_for_boosting(dataset):
+    X, y = dataset
+    param_grid = {'n_estimators': [8, 16], 'learning_rate': [0.1, 0.5]}
+
+    model, artifact = search_model(GradientBoostingClassifier(random_state=0), param_grid, X, y,
+                                   strategy='early_stopping', cv=CV, n_jobs=1, n_iter_no_change=2)
+
+    assert artifact.n_fits == 2 * CV #the learning rates only, trees are added until validation stalls
+    assert artifact.best_params['n_estimators'] == 16 and artifact.best_params['n_iter_no_change'] == 2
+    assert model.n_estimators_ <= 16
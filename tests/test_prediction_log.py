@@ -0,0 +1,108 @@
+import os
+import sys
+import gzip
+import json
+import time
+import subprocess
+
+import pandas as pd
+
+from networksecurity.serving.prediction_log import PredictionLog
+
+
+class StubS3Sync:
+    '''
+        Keeps uploaded objects in memory; fails the first `failures` uploads.
+    '''
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.objects = {}
+
+    def upload_file(self, file_path, aws_object_url):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('S3 unavailable')
+        with gzip.open(file_path, 'rb') as file:
+            self.objects[aws_object_url] = [json.loads(line) for line in file]
+        return os.path.getsize(file_path)
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def make_log(root_dir, s3_sync, **settings):
+    return PredictionLog(root_dir=str(root_dir), bucket_name='bucket', s3_prefix='prediction-log', s3_sync=s3_sync,
+                         **dict(dict(max_segment_seconds=60, upload_retries=0, retry_backoff=0.01), **settings))
+
+
+def files_in(directory):
+    return [name for _, _, names in os.walk(directory) for name in names]
+
+
+def test_full_segment_is_rotated_and_uploaded(tmp_path):
+    s3_sync = StubS3Sync()
+    prediction_log = make_log(tmp_path, s3_sync, max_segment_bytes=1000)
+    prediction_log.start()
+    try:
+        first = prediction_log.append(pd.DataFrame({'URL_Length': [1, -1], 'predicted_column': [1.0, 0.0]}))
+        assert prediction_log.stats()['open_segment']['rows'] == 2 and not s3_sync.objects
+        second = prediction_log.append(pd.DataFrame({'URL_Length': [0] * 20, 'predicted_column': [1.0] * 20}))
+
+        assert wait_for(lambda: prediction_log.segments_uploaded == 1)
+    finally:
+        prediction_log.close()
+
+    (url, rows), = s3_sync.objects.items()
+    assert url.startswith('s3://bucket/prediction-log/') and url.endswith('.jsonl.gz')
+    assert [row['batch_id'] for row in rows] == [first] * 2 + [second] * 20
+    assert rows[0]['URL_Length'] == 1 and rows[0]['predicted_column'] == 1.0 and 'predicted_at' in rows[0]
+    assert files_in(tmp_path / 'wal') == files_in(tmp_path / 'pending') == []
+    assert len(files_in(tmp_path / 'uploaded')) == 1
+
+
+def test_segment_of_a_crashed_process_is_replayed_on_restart(tmp_path):
+    #A worker appends and dies before its segment is sealed
+    subprocess.run([sys.executable, '-c', 'import os, sys, pandas as pd; '
+                    'from networksecurity.serving.prediction_log import PredictionLog; '
+                    'prediction_log = PredictionLog(root_dir=sys.argv[1]); prediction_log.start(); '
+                    'prediction_log.append(pd.DataFrame({"URL_Length": [1, 0, -1]}), batch_id="crashed"); '
+                    'os._exit(1)', str(tmp_path)], check=False, timeout=120)
+    assert len(files_in(tmp_path / 'wal')) == 1
+
+    s3_sync = StubS3Sync()
+    prediction_log = make_log(tmp_path, s3_sync)
+    prediction_log.start()
+    try:
+        assert wait_for(lambda: prediction_log.segments_uploaded == 1)
+    finally:
+        prediction_log.close()
+
+    (rows,) = s3_sync.objects.values()
+    assert [(row['URL_Length'], row['batch_id']) for row in rows] == [(1, 'crashed'), (0, 'crashed'), (-1, 'crashed')]
+    assert files_in(tmp_path / 'wal') == files_in(tmp_path / 'pending') == []
+
+
+def test_segment_whose_upload_failed_is_uploaded_on_restart(tmp_path):
+    prediction_log = make_log(tmp_path, StubS3Sync(failures=1))
+    prediction_log.start()
+    prediction_log.append(pd.DataFrame({'URL_Length': [1]}), batch_id='unsent')
+    prediction_log.close()
+    assert prediction_log.upload_failures == 1 and len(files_in(tmp_path / 'pending')) == 1
+
+    s3_sync = StubS3Sync()
+    prediction_log = make_log(tmp_path, s3_sync)
+    prediction_log.start()
+    try:
+        assert wait_for(lambda: prediction_log.segments_uploaded == 1)
+    finally:
+        prediction_log.close()
+
+    (rows,) = s3_sync.objects.values()
+    assert [row['batch_id'] for row in rows] == ['unsent']
+    assert files_in(tmp_path / 'pending') == []
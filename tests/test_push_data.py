@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from ETL_pipeline.push_data import NetworkDataExtract, ROW_HASH_FIELD
+
+DATA_FILE_PATH = 'Network_Data/phisingData.csv'
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    #A slice of the dataset keeps its identical rows, which get numbered row_hashes
+    file_path = tmp_path / 'data.csv'
+    pd.read_csv(DATA_FILE_PATH).head(1500).to_csv(file_path, index=False)
+    return str(file_path)
+
+
+def test_load_is_idempotent(csv_file):
+    client = mongomock.MongoClient()
+    extract = NetworkDataExtract(mongo_client=client)
+
+    first = extract.load_csv_to_mongoDB(csv_file, 'db', 'NetworkData', batch_size=400)
+    second = extract.load_csv_to_mongoDB(csv_file, 'db', 'NetworkData', batch_size=400)
+
+    assert first['inserted'] == 1500
+    assert second['inserted'] == 0 and second['existing'] == 1500
+    assert client['db']['NetworkData'].count_documents({}) == 1500
+
+
+def test_load_into_collection_filled_by_insert_many(csv_file):
+    #The collection as the original loader left it: documents without row_hash
+    client = mongomock.MongoClient()
+    collection = client['db']['NetworkData']
+    collection.insert_many(pd.read_csv(csv_file).to_dict(orient='records'))
+
+    summary = NetworkDataExtract(mongo_client=client).load_csv_to_mongoDB(csv_file, 'db', 'NetworkData', batch_size=400)
+
+    assert summary['inserted'] == 0
+    assert collection.count_documents({}) == 1500
+    assert collection.count_documents({ROW_HASH_FIELD: {'$exists': False}}) == 0
+    assert len(collection.distinct(ROW_HASH_FIELD)) == 1500
+
+
+def test_load_adds_only_new_rows_after_backfill(csv_file, tmp_path):
+    client = mongomock.MongoClient()
+    collection = client['db']['NetworkData']
+    collection.insert_many(pd.read_csv(csv_file).head(1000).to_dict(orient='records'))
+
+    summary = NetworkDataExtract(mongo_client=client).load_csv_to_mongoDB(csv_file, 'db', 'NetworkData', batch_size=400)
+
+    assert summary['inserted'] == 500
+    assert collection.count_documents({}) == 1500
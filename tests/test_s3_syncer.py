@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+moto = pytest.importorskip('moto')
+boto3 = pytest.importorskip('boto3')
+
+from networksecurity.cloud.s3_syncer import S3Sync
+
+BUCKET_URL = 's3://artifacts/runs/latest'
+MULTIPART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def s3_sync(monkeypatch):
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='artifacts')
+        yield S3Sync(client=client, multipart_threshold=MULTIPART_SIZE, multipart_chunksize=MULTIPART_SIZE)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    files = {'model.json': b'{"model": 1}', 'data/arrays.npy': os.urandom(1024),
+             'data/large.bin': os.urandom(MULTIPART_SIZE + 1024)} #multipart upload, ETag of the parts
+    for name, content in files.items():
+        file_path = tmp_path / 'run' / name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(content)
+    return tmp_path / 'run', files
+
+
+def test_upload_skips_unchanged_files(s3_sync, folder):
+    folder_path, files = folder
+
+    first = s3_sync.sync_folder_to_s3(str(folder_path), BUCKET_URL)
+    second = s3_sync.sync_folder_to_s3(str(folder_path), BUCKET_URL)
+    (folder_path / 'model.json').write_bytes(b'{"model": 2}')
+    third = s3_sync.sync_folder_to_s3(str(folder_path), BUCKET_URL)
+
+    assert (first.files_transferred, first.files_skipped, first.errors) == (3, 0, [])
+    assert (second.files_transferred, second.files_skipped) == (0, 3)
+    assert (third.files_transferred, third.files_skipped) == (1, 2)
+    assert sorted(s3_sync.list_objects('artifacts', 'runs/latest')) == sorted(files)
+
+
+def test_download_restores_the_folder_and_skips_unchanged_files(s3_sync, folder, tmp_path):
+    folder_path, files = folder
+    s3_sync.sync_folder_to_s3(str(folder_path), BUCKET_URL)
+    download_path = tmp_path / 'download'
+
+    first = s3_sync.sync_folder_from_s3(str(download_path), BUCKET_URL)
+    second = s3_sync.sync_folder_from_s3(str(download_path), BUCKET_URL)
+
+    assert (first.files_transferred, first.errors) == (3, [])
+    assert (second.files_transferred, second.files_skipped) == (0, 3)
+    for name, content in files.items():
+        assert (download_path / name).read_bytes() == content
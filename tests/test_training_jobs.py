@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import subprocess
+
+from networksecurity.pipeline.training_jobs import TrainingJobManager, _now, _pid_alive, _read_job, _write_job
+
+
+def wait_for(condition, timeout=60):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def test_job_cancelled_while_queued_never_starts(tmp_path):
+    manager = TrainingJobManager(job_dir=str(tmp_path))
+    job_file_path = os.path.join(str(tmp_path), 'job.json')
+    _write_job(job_file_path, {'job_id': 'job', 'status': 'queued', 'created_at': _now(), 'started_at': None,
+                               'finished_at': None, 'pid': None, 'current_stage': None, 'stages': {}})
+    assert manager.cancel('job')['status'] == 'cancelled'
+
+    #The worker starts only after the cancellation, so its queued -> running compare-and-set must fail
+    worker = subprocess.run([sys.executable, '-c', 'import sys; from networksecurity.pipeline.training_jobs import '
+                             'run_training_job; run_training_job("job", sys.argv[1])', str(tmp_path)], timeout=120)
+
+    assert worker.returncode == 0
+    job = manager.get_job('job')
+    assert job['status'] == 'cancelled'
+    assert job['started_at'] is None and job['pid'] is None and 'artifact_dir' not in job
+    assert not manager._run_in_progress()
+
+
+def test_cancel_stops_the_worker_process_group(tmp_path):
+    #A worker in its own session with a child of its own, like the training worker and its loky workers
+    worker = subprocess.Popen([sys.executable, '-c', 'import subprocess, time; '
+                               'print(subprocess.Popen(["sleep", "60"]).pid, flush=True); time.sleep(60)'],
+                              stdout=subprocess.PIPE, text=True, start_new_session=True)
+    child_pid = int(worker.stdout.readline())
+    manager = TrainingJobManager(job_dir=str(tmp_path))
+    job_file_path = os.path.join(str(tmp_path), 'job.json')
+    _write_job(job_file_path, {'job_id': 'job', 'status': 'running', 'created_at': '2026-01-01T00:00:00',
+                               'pid': worker.pid, 'current_stage': 'model_trainer', 'stages': {'model_trainer': 'running'}})
+
+    job = manager.cancel('job')
+
+    assert job['status'] == 'cancelled' and job['stages']['model_trainer'] == 'cancelled'
+    worker.wait(timeout=10)
+    assert wait_for(lambda: not _pid_alive(child_pid) or
+                    open(f'/proc/{child_pid}/stat').read().split()[2] == 'Z', timeout=10)
+    assert _read_job(job_file_path)['status'] == 'cancelled'